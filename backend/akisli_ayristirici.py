@@ -0,0 +1,183 @@
+"""Akışlı JSON Ayrıştırıcı
+
+LLM yanıtı parça parça gelirken düz (tek seviyeli) bir JSON nesnesinin
+alanlarını artımlı olarak çözer. Sayısal alanlar tamamlanır tamamlanmaz,
+metin alanları ise geldikçe parça parça olay olarak üretilir. Yanıtın
+başındaki ```json gibi ekler atlanır; tek ve çift tırnaklı metinler
+desteklenir. `tahmin_ayristirici._metin_sonu` ile aynı kural geçerlidir:
+tırnak, ardından (boşluklardan sonra) `:,}]` gelirse metni kapatır; bu
+yüzden aday kapanış tırnağı sonraki boşluk olmayan karakter gelene kadar
+bekletilir. HTML özniteliklerindeki tırnaklar ve kesme işaretleri akan
+parçaları bölmez.
+"""
+
+from typing import List, Optional, Tuple
+
+# (olay_tipi, alan, deger) -> olay_tipi: "alan" (tamamlanmış değer) ya da "parca" (metin parçası)
+Olay = Tuple[str, str, object]
+
+# Bir metnin kapanış tırnağından sonra gelebilecek yapısal karakterler
+_YAPISAL = ":,}]"
+
+_KACIS = {'"': '"', "'": "'", "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class AkisliJsonAyristirici:
+    """`besle` ile gelen metin parçalarını işleyip alan olaylarını döndürür."""
+
+    def __init__(self, akisli_alanlar: Tuple[str, ...] = ("rapor", "pazar_analizi")):
+        self.akisli_alanlar = akisli_alanlar
+        self.degerler = {}
+        self._durum = "baslangic"
+        self._tirnak = '"'
+        self._kacis: Optional[str] = None
+        # Kapanış olup olmadığı henüz bilinmeyen tırnak ve ardından gelen boşluklar
+        self._aday: Optional[List[str]] = None
+        self._anahtar = ""
+        self._tampon: List[str] = []
+        self._derinlik = 0
+        self._ic_tirnak: Optional[str] = None
+
+    @property
+    def tamamlandi(self) -> bool:
+        return self._durum == "bitti"
+
+    def besle(self, parca: str) -> List[Olay]:
+        olaylar: List[Olay] = []
+        akis_tamponu: List[str] = []
+
+        i = 0
+        while i < len(parca):
+            karakter = parca[i]
+            i += 1
+            durum = self._durum
+            if durum == "baslangic":
+                if karakter == "{":
+                    self._durum = "anahtar_bekle"
+            elif durum == "anahtar_bekle":
+                if karakter in "\"'":
+                    self._tirnak, self._tampon = karakter, []
+                    self._durum = "anahtar"
+                elif karakter == "}":
+                    self._durum = "bitti"
+            elif durum == "anahtar":
+                if self._metin_karakteri(karakter):
+                    self._anahtar = "".join(self._tampon)
+                    self._durum = "iki_nokta"
+                    # Metni kapatan yapısal karakter yeni durumda işlenir
+                    i -= 1
+            elif durum == "iki_nokta":
+                if karakter == ":":
+                    self._durum = "deger_bekle"
+            elif durum == "deger_bekle":
+                if karakter in "\"'":
+                    self._tirnak, self._tampon = karakter, []
+                    self._durum = "metin_deger"
+                elif karakter in "{[":
+                    self._derinlik, self._ic_tirnak = 1, None
+                    self._durum = "ic_ice"
+                elif not karakter.isspace():
+                    self._tampon = [karakter]
+                    self._durum = "ilkel_deger"
+            elif durum == "metin_deger":
+                onceki_uzunluk = len(self._tampon)
+                if self._metin_karakteri(karakter):
+                    if akis_tamponu:
+                        olaylar.append(("parca", self._anahtar, "".join(akis_tamponu)))
+                        akis_tamponu = []
+                    self._alan_tamamla("".join(self._tampon), olaylar)
+                    self._durum = "virgul_bekle"
+                    i -= 1
+                elif self._anahtar in self.akisli_alanlar and len(self._tampon) > onceki_uzunluk:
+                    akis_tamponu.extend(self._tampon[onceki_uzunluk:])
+            elif durum == "ilkel_deger":
+                if karakter in ",}" or karakter.isspace():
+                    self._alan_tamamla(self._ilkel_coz("".join(self._tampon)), olaylar)
+                    self._durum = "bitti" if karakter == "}" else ("anahtar_bekle" if karakter == "," else "virgul_bekle")
+                else:
+                    self._tampon.append(karakter)
+            elif durum == "ic_ice":
+                self._ic_ice_ilerle(karakter)
+            elif durum == "virgul_bekle":
+                if karakter == ",":
+                    self._durum = "anahtar_bekle"
+                elif karakter == "}":
+                    self._durum = "bitti"
+
+        if akis_tamponu:
+            olaylar.append(("parca", self._anahtar, "".join(akis_tamponu)))
+        return olaylar
+
+    def _metin_karakteri(self, karakter: str) -> bool:
+        """Metin içindeki bir karakteri tampona ekler; metin kapandıysa True döner.
+
+        Kapanış, aday tırnaktan sonraki yapısal karakterde anlaşılır; o
+        karakter tüketilmez, çağıran onu yeni durumda yeniden işler.
+        """
+        if self._aday is not None:
+            if karakter.isspace():
+                self._aday.append(karakter)
+                return False
+            if karakter in _YAPISAL:
+                self._aday = None
+                return True
+            # Tırnak metnin parçasıymış
+            self._tampon.extend(self._aday)
+            self._aday = None
+        if self._kacis is not None:
+            self._kacis += karakter
+            if self._kacis.startswith("u"):
+                if len(self._kacis) == 5:
+                    try:
+                        self._tampon.append(chr(int(self._kacis[1:], 16)))
+                    except ValueError:
+                        self._tampon.append("\\" + self._kacis)
+                    self._kacis = None
+            else:
+                self._tampon.append(_KACIS.get(self._kacis, self._kacis))
+                self._kacis = None
+            return False
+        if karakter == "\\":
+            self._kacis = ""
+            return False
+        if karakter == self._tirnak:
+            self._aday = [karakter]
+            return False
+        self._tampon.append(karakter)
+        return False
+
+    def _ic_ice_ilerle(self, karakter: str) -> None:
+        if self._ic_tirnak is not None:
+            if karakter == "\\":
+                self._kacis = ""
+            elif self._kacis is not None:
+                self._kacis = None
+            elif karakter == self._ic_tirnak:
+                self._ic_tirnak = None
+        elif karakter in "\"'":
+            self._ic_tirnak = karakter
+        elif karakter in "{[":
+            self._derinlik += 1
+        elif karakter in "}]":
+            self._derinlik -= 1
+            if self._derinlik == 0:
+                self._durum = "virgul_bekle"
+
+    @staticmethod
+    def _ilkel_coz(metin: str) -> object:
+        metin = metin.strip()
+        if metin in ("true", "false"):
+            return metin == "true"
+        if metin == "null":
+            return None
+        try:
+            return int(metin)
+        except ValueError:
+            try:
+                return int(float(metin))
+            except ValueError:
+                return metin
+
+    def _alan_tamamla(self, deger: object, olaylar: List[Olay]) -> None:
+        self.degerler[self._anahtar] = deger
+        olaylar.append(("alan", self._anahtar, deger))
@@ -0,0 +1,8 @@
+"""Offline performance benchmarks for the FiyatIQ backend.
+
+Run from the backend directory, e.g. ``python -m benchmarks.depreciation_batch``.
+``python -m benchmarks.run_all`` runs the whole suite (import time,
+micro-benchmarks, prompt sizes, the valuation grid, LLM circuit-breaker recovery, hedged LLM calls, queued detailed-estimate jobs, the fake-LLM load test, the
+scraping pipeline against recorded pages, the market-data bulk upsert and the depreciation benchmarks) and writes one JSON file; ``python -m benchmarks.compare old.json new.json`` diffs two runs
+and exits non-zero on regressions.
+"""
@@ -0,0 +1,127 @@
+"""
+Circuit breaker recovery in the LLM pool after calls that end without a result
+Opens the breaker of a single fake client, lets it cool down to half-open and
+then ends the probe call without a success or a failure: cancelled by a
+timeout, refused by the rate limit before it starts, or a stream the consumer
+stops reading. After each the next call must be let through and close the
+breaker again. Also checks that a profile whose breakers are all open fails
+with DevrelerAcik. Exits non-zero if any check fails
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from benchmarks import report
+
+
+def make_pool(cooldown: float):
+    from llm_havuzu import LLMAyarlari, LLMHavuzu, SahteLLM
+
+    settings = LLMAyarlari(
+        anahtarlar=['sahte'],
+        profiller={'hizli': ['sahte']},
+        zaman_asimlari={'hizli': 5},
+        geri_cekilme_tabani=0,
+        devre_esigi=1,
+        devre_suresi=cooldown,
+        dakika_basina_istek=0,
+    )
+    pool = LLMHavuzu(settings, lambda model, key: SahteLLM(model, key))
+    slot = pool.yuvalar['sahte'][0]
+    return pool, slot, slot.istemci
+
+
+async def open_breaker(pool, client, cooldown: float):
+    """One failed call opens the breaker (threshold 1); waits until it is half-open"""
+    from llm_havuzu import LLMKullanilamiyor
+
+    client.hata_orani = 1.0
+    try:
+        await pool.cagir('hizli', 'istem')
+    except LLMKullanilamiyor:
+        pass
+    client.hata_orani = 0.0
+    await asyncio.sleep(cooldown)
+
+
+async def recovers(pool, slot) -> bool:
+    """The next call is let through as the probe and closes the breaker"""
+    try:
+        await pool.cagir('hizli', 'istem')
+    except Exception:
+        return False
+    return slot.devre.durum == 'kapali'
+
+
+async def run_checks(args) -> tuple:
+    from llm_havuzu import DevrelerAcik, LLMKullanilamiyor, TokenKovasi
+
+    checks = {}
+    results = {}
+
+    # The half-open probe is cancelled mid-call (hedge loser, per-item timeout, client disconnect)
+    pool, slot, client = make_pool(args.cooldown)
+    await open_breaker(pool, client, args.cooldown)
+    client.gecikme = 10
+    try:
+        await asyncio.wait_for(pool.cagir('hizli', 'istem'), args.cooldown)
+    except asyncio.TimeoutError:
+        pass
+    client.gecikme = 0
+    start = time.perf_counter()
+    checks['cancelled_probe'] = await recovers(pool, slot)
+    results['cancelled_probe.recovery_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+    # The rate limit refuses the probe before it is sent
+    pool, slot, client = make_pool(args.cooldown)
+    await open_breaker(pool, client, args.cooldown)
+    bucket = slot.kova
+    slot.kova = TokenKovasi(1, kapasite=1)
+    slot.kova.jeton = 0
+    try:
+        await pool.cagir('hizli', 'istem', zaman_asimi=args.cooldown)
+        refused = False
+    except LLMKullanilamiyor:
+        refused = True
+    slot.kova = bucket
+    checks['rate_limited_probe'] = refused and await recovers(pool, slot)
+
+    # The consumer stops reading the probe's stream after the first chunk
+    pool, slot, client = make_pool(args.cooldown)
+    await open_breaker(pool, client, args.cooldown)
+    stream = pool.akis('hizli', 'istem')
+    await stream.__anext__()
+    await stream.aclose()
+    checks['abandoned_stream'] = await recovers(pool, slot)
+
+    # Every breaker open: a dedicated error instead of a message built from no error
+    pool, slot, client = make_pool(60)
+    await open_breaker(pool, client, 0)
+    try:
+        await pool.cagir('hizli', 'istem')
+        checks['all_open'] = False
+    except DevrelerAcik as e:
+        checks['all_open'] = 'NoneType' not in str(e)
+    return checks, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cooldown', type=float, default=0.05, help='breaker cool-down in seconds')
+    report.add_json_argument(parser)
+    args = parser.parse_args()
+
+    checks, results = asyncio.run(run_checks(args))
+    for name, passed in checks.items():
+        print(f"{name:22s} {'ok' if passed else 'FAILED'}")
+    results['mismatches'] = sum(not passed for passed in checks.values())
+    if args.json:
+        report.write(args.json, report.document('circuit_breaker', args, results))
+    if results['mismatches']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
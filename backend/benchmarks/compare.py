@@ -0,0 +1,75 @@
+"""
+Compares two benchmark JSON files and flags regressions
+Metrics ending in _per_s are better when higher; metrics ending in _ms,
+_us_per_op, _tokens or named errors/local_fallbacks are better when lower. Exits
+with status 1 when any metric regresses by more than --threshold percent,
+so it can gate a release
+"""
+
+import argparse
+import json
+import sys
+
+HIGHER_IS_BETTER = ('_per_s',)
+LOWER_IS_BETTER = ('_ms', '_us_per_op', 'us_per_op', '_tokens', 'errors', 'local_fallbacks', 'mismatches',
+                   '_rel_error', '.seconds', '.bytes', '.rejected', '.failed_jobs')
+
+
+def flatten(payload: dict) -> dict:
+    documents = payload.get('benchmarks', [payload])
+    return {
+        f"{document['benchmark']}.{name}": value
+        for document in documents
+        for name, value in document['results'].items()
+        if isinstance(value, (int, float))
+    }
+
+
+def direction(name: str) -> int:
+    """+1 when higher is better, -1 when lower is better, 0 for informational metrics"""
+    if name.endswith(HIGHER_IS_BETTER):
+        return 1
+    if name.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(baseline: dict, candidate: dict, threshold: float):
+    rows, regressions = [], []
+    for name in sorted(set(baseline) & set(candidate)):
+        old, new = baseline[name], candidate[name]
+        change = (new - old) / old * 100 if old else (0.0 if new == old else float('inf'))
+        sign = direction(name)
+        regressed = sign != 0 and -sign * change > threshold
+        rows.append((name, old, new, change, regressed))
+        if regressed:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=10.0, help='allowed regression in percent')
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = flatten(json.load(f))
+    with open(args.candidate, encoding='utf-8') as f:
+        candidate = flatten(json.load(f))
+
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    for name, old, new, change, regressed in rows:
+        marker = '  REGRESSION' if regressed else ''
+        print(f"{name:48s} {old:14.2f} -> {new:14.2f}  {change:+7.1f}%{marker}")
+    for name in sorted(set(baseline) ^ set(candidate)):
+        print(f"{name:48s} only in {'baseline' if name in baseline else 'candidate'}")
+
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed by more than {args.threshold}%")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Compares DepreciationCalculator.calculate_depreciation (scalar loop) with
+calculate_depreciation_batch (NumPy) on a synthetic portfolio and checks
+that both paths give identical prices
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks import report
+from web_scraper import DepreciationCalculator
+
+
+def make_portfolio(calculator: DepreciationCalculator, rows: int, max_damages: int, seed: int):
+    rng = random.Random(seed)
+    parts = list(calculator.part_impact_factors)
+    levels = list(calculator.damage_multipliers)
+    types = list(calculator.type_multipliers)
+    damage_rows = [
+        [
+            {
+                'part': rng.choice(parts),
+                'damage_level': rng.choice(levels),
+                'damage_type': rng.choice(types)
+            }
+            for _ in range(rng.randint(0, max_damages))
+        ]
+        for _ in range(rows)
+    ]
+    base_prices = [rng.randint(200_000, 4_000_000) for _ in range(rows)]
+    return base_prices, damage_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--max-damages', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=42)
+    report.add_json_argument(parser)
+    args = parser.parse_args()
+
+    calculator = DepreciationCalculator()
+    base_prices, damage_rows = make_portfolio(calculator, args.rows, args.max_damages, args.seed)
+
+    start = time.perf_counter()
+    scalar = [calculator.calculate_depreciation(p, d) for p, d in zip(base_prices, damage_rows)]
+    scalar_seconds = time.perf_counter() - start
+
+    encoded = calculator.encode_damages(damage_rows)
+    start = time.perf_counter()
+    batch = calculator.calculate_depreciation_batch(base_prices, *encoded)
+    batch_seconds = time.perf_counter() - start
+
+    mismatches = sum(
+        1 for i, s in enumerate(scalar)
+        if s['final_estimated_price'] != batch.final_estimated_price[i]
+        or s['total_depreciation_rate'] != batch.total_depreciation_rate[i]
+    )
+
+    print(f"rows={args.rows} damages={len(encoded.row_index)}")
+    print(f"scalar: {scalar_seconds:.3f}s")
+    print(f"batch:  {batch_seconds:.3f}s (encoding excluded)")
+    print(f"speedup: {scalar_seconds / batch_seconds:.1f}x, mismatches: {mismatches}")
+    if args.json:
+        report.write(args.json, report.document('depreciation_batch', args, {
+            'scalar_rows_per_s': round(args.rows / scalar_seconds, 1),
+            'batch_rows_per_s': round(args.rows / batch_seconds, 1),
+            'speedup': round(scalar_seconds / batch_seconds, 2),
+            'mismatches': mismatches
+        }))
+
+
+if __name__ == '__main__':
+    main()
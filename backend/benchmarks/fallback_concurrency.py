@@ -0,0 +1,77 @@
+"""
+Load test for CarMarketScraper.get_depreciation_data_by_damage comparing
+the happy path with the error fallback path at the same concurrency.
+The fallback runs inline in the caller's event loop, so both paths should
+complete every request with comparable throughput.
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks import report
+from web_scraper import CarMarketScraper
+
+MODELS = [('Toyota', 'Corolla'), ('Volkswagen', 'Golf'), ('Fiat', 'Egea'), ('Renault', 'Clio'), ('Kia', 'Ceed')]
+
+
+class FailingScraper(CarMarketScraper):
+    """Fails on every live lookup, forcing the estimated-data fallback"""
+
+    def __init__(self):
+        super().__init__()
+        self.scraping_enabled = True
+
+    async def _get_scraped_market_data(self, marka, model, yil):
+        raise ConnectionError("simulated marketplace outage")
+
+
+async def run(scraper: CarMarketScraper, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        marka, model = MODELS[i % len(MODELS)]
+        async with semaphore:
+            try:
+                await scraper.get_depreciation_data_by_damage(marka, model, 2010 + i % 14)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    return elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=20_000)
+    parser.add_argument('--concurrency', type=int, default=500)
+    report.add_json_argument(parser)
+    args = parser.parse_args()
+
+    # Silence the per-request fallback log line during the run
+    import builtins
+    original_print = builtins.print
+    builtins.print = lambda *a, **k: None
+    try:
+        happy = asyncio.run(run(CarMarketScraper(), args.requests, args.concurrency))
+        fallback = asyncio.run(run(FailingScraper(), args.requests, args.concurrency))
+    finally:
+        builtins.print = original_print
+
+    for name, (elapsed, errors) in (('happy', happy), ('fallback', fallback)):
+        print(f"{name:8s} {args.requests / elapsed:10.0f} req/s  errors={errors}  "
+              f"concurrency={args.concurrency}")
+    if args.json:
+        results = {}
+        for name, (elapsed, errors) in (('happy', happy), ('fallback', fallback)):
+            results[f'{name}.requests_per_s'] = round(args.requests / elapsed, 1)
+            results[f'{name}.errors'] = errors
+        report.write(args.json, report.document('fallback_concurrency', args, results))
+
+
+if __name__ == '__main__':
+    main()
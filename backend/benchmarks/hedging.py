@@ -0,0 +1,99 @@
+"""
+Hedged LLM calls against a fake LLM with a long-tailed latency distribution
+Drives LLMHavuzu.cagir on the quick profile at a fixed rate, once without
+hedging and once with the hedge policy, and reports latency percentiles,
+the share of calls that sent a second request and how often it won. Most
+calls take --latency seconds and --tail-rate of them take --tail-latency.
+A last hedged run with a single key and model checks that no second request
+is sent when there is no other client to send it to
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks import offline, report
+from benchmarks.load_test import percentile
+
+
+async def drive(pool, rps: float, total: int) -> list:
+    latencies = []
+
+    async def one(scheduled: float):
+        await pool.cagir('hizli', 'istem')
+        latencies.append(time.perf_counter() - scheduled)
+
+    start = time.perf_counter()
+    tasks = []
+    for i in range(total):
+        scheduled = start + i / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(scheduled)))
+    await asyncio.gather(*tasks)
+    return sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--rps', type=float, default=200)
+    parser.add_argument('--keys', type=int, default=2, help='fake API keys the hedge can switch to')
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--jitter', type=float, default=0.005)
+    parser.add_argument('--tail-rate', type=float, default=0.03)
+    parser.add_argument('--tail-latency', type=float, default=0.5)
+    parser.add_argument('--percentile', type=float, default=95)
+    parser.add_argument('--budget', type=float, default=0.1, help='max share of calls that may hedge')
+    report.add_json_argument(parser)
+    args = parser.parse_args()
+
+    offline.configure(latency=args.latency, jitter=args.jitter,
+                      tail_rate=args.tail_rate, tail_latency=args.tail_latency)
+    from llm_havuzu import LLMAyarlari, LLMHavuzu, sahte_istemci_fabrikasi
+
+    results = {}
+    runs = (('unhedged', [], args.keys, args.requests), ('hedged', ['hizli'], args.keys, args.requests),
+            ('single_slot', ['hizli'], 1, args.requests // 4))
+    for name, profiles, keys, total in runs:
+        settings = LLMAyarlari(
+            anahtarlar=[f'sahte{i}' for i in range(keys)],
+            profiller={'hizli': ['sahte']},
+            zaman_asimlari={'hizli': 15},
+            geri_cekilme_tabani=0,
+            dakika_basina_istek=0,
+            hedge_profilleri=profiles,
+            hedge_yuzdelik=args.percentile,
+            hedge_butcesi=args.budget,
+        )
+        pool = LLMHavuzu(settings, sahte_istemci_fabrikasi)
+        latencies = asyncio.run(drive(pool, args.rps, total))
+        results.update({
+            f'{name}.p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            f'{name}.p90_ms': round(percentile(latencies, 0.90) * 1000, 2),
+            f'{name}.p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            f'{name}.max_ms': round(latencies[-1] * 1000, 2),
+        })
+        if profiles:
+            stats = pool.istatistikler()['hedge']['hizli']
+            results[f'{name}.hedge_rate'] = stats['oran']
+            results[f'{name}.hedge_wins'] = stats['kazanan']
+            results[f'{name}.threshold_ms'] = round((stats['esik_sn'] or 0) * 1000, 2)
+            results[f'{name}.no_other_slot'] = stats['yuva_yok']
+
+    for name in ('unhedged', 'hedged'):
+        line = (f"{name:9s} p50={results[name + '.p50_ms']:.1f}ms  p90={results[name + '.p90_ms']:.1f}ms  "
+                f"p99={results[name + '.p99_ms']:.1f}ms  max={results[name + '.max_ms']:.1f}ms")
+        if name == 'hedged':
+            line += (f"  hedged {results['hedged.hedge_rate'] * 100:.1f}% of calls "
+                     f"(threshold {results['hedged.threshold_ms']:.1f}ms, {results['hedged.hedge_wins']} wins)")
+        print(line)
+    print(f"single slot: {results['single_slot.hedge_rate'] * 100:.1f}% hedged, "
+          f"{results['single_slot.no_other_slot']} skipped for lack of another client")
+    if args.json:
+        report.write(args.json, report.document('hedging', args, results))
+
+
+if __name__ == '__main__':
+    main()
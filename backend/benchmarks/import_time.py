@@ -0,0 +1,87 @@
+"""
+Cold-start cost of the API module
+Imports main in a fresh interpreter several times and reports the wall time
+of the import and of the chain construction that is deferred to first use.
+Fails when the import pulls in LangChain or the Gemini client, or when the
+median import time exceeds --budget-ms, so a heavy top-level import shows up
+as a failed run instead of a slower cold start
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks import offline, report
+
+# Must stay out of the import path; they load on the first LLM call
+DEFERRED_MODULES = ('langchain_core', 'langchain', 'langchain_google_genai', 'google.generativeai')
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+loaded = sorted(name for name in %r if name in sys.modules)
+main._zincirleri_kur()
+built = time.perf_counter()
+print(json.dumps({
+    'import_s': imported - start,
+    'chains_s': built - imported,
+    'loaded': loaded,
+}))
+"""
+
+
+def probe(backend_dir: str) -> dict:
+    source = PROBE % (DEFERRED_MODULES,)
+    # Chain construction is timed explicitly, so keep startup from warming it in the background
+    env = dict(os.environ, LLM_BASLATMA='ilk_kullanim')
+    completed = subprocess.run(
+        [sys.executable, '-c', source], cwd=backend_dir, env=env,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters to start')
+    parser.add_argument('--budget-ms', type=float, default=1500.0, help='allowed median import time')
+    report.add_json_argument(parser)
+    args = parser.parse_args()
+
+    offline.configure(latency=0)
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    runs = [probe(backend_dir) for _ in range(args.repeat)]
+
+    import_ms = sorted(run['import_s'] * 1000 for run in runs)
+    chains_ms = sorted(run['chains_s'] * 1000 for run in runs)
+    loaded = sorted({name for run in runs for name in run['loaded']})
+    results = {
+        'import.median_ms': round(statistics.median(import_ms), 2),
+        'import.max_ms': round(import_ms[-1], 2),
+        'chains.median_ms': round(statistics.median(chains_ms), 2),
+        'deferred_modules_loaded': len(loaded),
+    }
+
+    print(f"import main      {results['import.median_ms']:8.1f} ms median  {results['import.max_ms']:8.1f} ms max")
+    print(f"build chains     {results['chains.median_ms']:8.1f} ms median")
+    if args.json:
+        report.write(args.json, report.document('import_time', args, results))
+
+    problems = []
+    if loaded:
+        problems.append(f"import main loaded {', '.join(loaded)}")
+    if results['import.median_ms'] > args.budget_ms:
+        problems.append(f"median import time above the {args.budget_ms:.0f} ms budget")
+    for problem in problems:
+        print(problem)
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
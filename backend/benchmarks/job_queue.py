@@ -0,0 +1,165 @@
+"""
+Detailed estimates as queued jobs against the synchronous endpoint
+Sends the same burst of detailed requests once to /detayli-tahmin and once
+to /detayli-tahmin/is with a webhook pointing at a local receiver, and
+reports how long clients wait, how many estimates run at once and how the
+queue drains. In job mode the submit returns straight away and at most
+--workers estimates are in flight, however many requests arrive
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+from aiohttp import web
+
+from benchmarks import offline, report
+from benchmarks.load_test import percentile
+
+
+async def start_receiver(arrivals: dict):
+    """Local webhook receiver; records when each job's callback arrived"""
+    async def hook(request):
+        body = await request.json()
+        arrivals[body['is_id']] = (time.perf_counter(), body['durum'])
+        return web.Response(text='ok')
+
+    app = web.Application()
+    app.router.add_post('/hook', hook)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f'http://127.0.0.1:{port}/hook'
+
+
+async def burst(client, rps: float, bodies: list, request_for):
+    """Fires one request per body at a fixed rate; returns (scheduled, latency, response) and peak open requests"""
+    results = []
+    open_requests = peak = 0
+
+    async def one(body, scheduled):
+        nonlocal open_requests, peak
+        open_requests += 1
+        peak = max(peak, open_requests)
+        try:
+            url, payload = request_for(body)
+            response = await client.post(url, json=payload)
+        finally:
+            open_requests -= 1
+        results.append((scheduled, time.perf_counter() - scheduled, response))
+
+    start = time.perf_counter()
+    tasks = []
+    for i, body in enumerate(bodies):
+        scheduled = start + i / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(body, scheduled)))
+    await asyncio.gather(*tasks)
+    return results, peak
+
+
+async def run(args) -> dict:
+    os.environ.update({
+        'IS_KUYRUGU_ISCI_SAYISI': str(args.workers),
+        'IS_KUYRUGU_MAX_BEKLEYEN': str(args.max_pending),
+        'IS_WEBHOOK_DENEME': '1',
+        # The receiver is on loopback, which is rejected unless allow-listed
+        'IS_WEBHOOK_IZINLI_HOSTLAR': '127.0.0.1',
+    })
+    main = offline.load_app(latency=args.latency, jitter=args.jitter)
+    bodies = offline.vehicles(args.requests, detailed=True, seed=args.seed)
+    arrivals = {}
+    receiver, hook_url = await start_receiver(arrivals)
+    results = {}
+    try:
+        async with main.app.router.lifespan_context(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+                sync, peak = await burst(client, args.rps, bodies, lambda body: ('/detayli-tahmin', body))
+                latencies = sorted(latency for _, latency, _ in sync)
+                results.update({
+                    'sync.errors': sum(r.status_code != 200 for _, _, r in sync),
+                    'sync.p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+                    'sync.p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+                    'sync.peak_open_requests': peak,
+                })
+
+                queue = main.is_kuyrugu
+                samples = []
+
+                async def sample():
+                    while True:
+                        stats = queue.istatistikler()
+                        samples.append((stats['derinlik'], stats['mesgul_isci']))
+                        await asyncio.sleep(0.005)
+
+                sampler = asyncio.create_task(sample())
+                submitted, peak = await burst(
+                    client, args.rps, bodies,
+                    lambda body: ('/detayli-tahmin/is', {'arac': body, 'webhook_url': hook_url}),
+                )
+                accepted = {r.json()['is_id']: scheduled for scheduled, _, r in submitted if r.status_code == 202}
+                deadline = time.perf_counter() + args.drain_timeout
+                while len(arrivals) < len(accepted) and time.perf_counter() < deadline:
+                    await asyncio.sleep(0.01)
+                sampler.cancel()
+
+                # The webhook and polling report the same final state
+                polled = await client.get(f'/isler/{next(iter(accepted))}') if accepted else None
+                submit = sorted(latency for _, latency, r in submitted if r.status_code == 202)
+                completion = sorted(arrivals[job][0] - scheduled for job, scheduled in accepted.items() if job in arrivals)
+                stats = queue.istatistikler()
+                results.update({
+                    'queued.rejected': sum(r.status_code == 503 for _, _, r in submitted),
+                    'queued.errors': sum(r.status_code not in (202, 503) for _, _, r in submitted),
+                    'queued.submit_p50_ms': round(percentile(submit, 0.50) * 1000, 2),
+                    'queued.submit_p99_ms': round(percentile(submit, 0.99) * 1000, 2),
+                    'queued.completion_p50_ms': round(percentile(completion, 0.50) * 1000, 2),
+                    'queued.completion_p99_ms': round(percentile(completion, 0.99) * 1000, 2),
+                    'queued.peak_open_requests': peak,
+                    'queued.peak_busy_workers': max(busy for _, busy in samples),
+                    'queued.max_depth': max(depth for depth, _ in samples),
+                    'queued.webhooks': len(arrivals),
+                    'queued.failed_jobs': sum(state != 'tamamlandi' for _, state in arrivals.values()),
+                    'queued.polled_ok': int(polled is not None and polled.json()['durum'] == 'tamamlandi'),
+                    'queued.worker_utilization': stats['kullanim'],
+                })
+    finally:
+        await receiver.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--rps', type=float, default=200)
+    parser.add_argument('--workers', type=int, default=8, help='queue workers, i.e. max estimates in flight')
+    parser.add_argument('--max-pending', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--drain-timeout', type=float, default=60)
+    parser.add_argument('--seed', type=int, default=42)
+    report.add_json_argument(parser)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"sync    p50={results['sync.p50_ms']:.1f}ms  p99={results['sync.p99_ms']:.1f}ms  "
+          f"peak open requests={results['sync.peak_open_requests']}  errors={results['sync.errors']}")
+    print(f"queued  submit p50={results['queued.submit_p50_ms']:.1f}ms  p99={results['queued.submit_p99_ms']:.1f}ms  "
+          f"peak open requests={results['queued.peak_open_requests']}  rejected={results['queued.rejected']}")
+    print(f"        completion p50={results['queued.completion_p50_ms']:.1f}ms  "
+          f"p99={results['queued.completion_p99_ms']:.1f}ms  peak busy workers={results['queued.peak_busy_workers']}  "
+          f"max depth={results['queued.max_depth']}  utilization={results['queued.worker_utilization'] * 100:.1f}%  "
+          f"webhooks={results['queued.webhooks']}")
+    if args.json:
+        report.write(args.json, report.document('job_queue', args, results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Open-loop load generator for the estimation endpoints against the fake LLM
+Sends requests to /hizli-tahmin, /detayli-tahmin and /toplu-tahmin at a
+fixed target rate through httpx's in-process ASGI transport and reports
+throughput and latency percentiles. Latency is measured from each request's
+scheduled send time, so a saturated server shows up as growing latency
+instead of a silently lower send rate
+"""
+
+import argparse
+import asyncio
+import builtins
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks import offline, report
+
+SCENARIOS = ('hizli', 'detayli', 'toplu')
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def drive(client: httpx.AsyncClient, rps: float, duration: float, request_for) -> dict:
+    """Fires request_for(i) at a fixed rate for duration seconds and collects latencies"""
+    total = max(1, int(rps * duration))
+    interval = 1.0 / rps
+    latencies = []
+    statuses = Counter()
+    sources = Counter()
+
+    async def one(i: int, scheduled: float):
+        method, url, body = request_for(i)
+        try:
+            response = await client.request(method, url, json=body)
+            statuses[response.status_code] += 1
+            if response.status_code == 200:
+                data = response.json()
+                items = [item.get('sonuc') or {} for item in data['sonuclar']] if 'sonuclar' in data else [data]
+                sources.update(item.get('tahmin_kaynagi') or 'hata' for item in items)
+        except Exception as e:
+            statuses[type(e).__name__] += 1
+        latencies.append(time.perf_counter() - scheduled)
+
+    start = time.perf_counter()
+    tasks = []
+    for i in range(total):
+        scheduled = start + i * interval
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(i, scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    ok = statuses.get(200, 0)
+    return {
+        'requests': total,
+        'ok': ok,
+        'errors': total - ok,
+        'achieved_per_s': round(ok / elapsed, 2),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p90_ms': round(percentile(latencies, 0.90) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2),
+        'local_fallbacks': sources.get('yerel', 0),
+    }
+
+
+async def run(args) -> dict:
+    app_module = offline.load_app(
+        latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, malformed_rate=args.malformed_rate
+    )
+    app = app_module.app
+    quick = offline.vehicles(args.unique_vehicles, detailed=False, seed=args.seed)
+    detailed = offline.vehicles(args.unique_vehicles, detailed=True, seed=args.seed)
+
+    requests = {
+        'hizli': lambda i: ('POST', '/hizli-tahmin', quick[i % len(quick)]),
+        'detayli': lambda i: ('POST', '/detayli-tahmin', detailed[i % len(detailed)]),
+        'toplu': lambda i: ('POST', '/toplu-tahmin', {
+            'araclar': [quick[(i * args.batch_size + j) % len(quick)] for j in range(args.batch_size)]
+        }),
+    }
+
+    results = {}
+    # ASGITransport does not send lifespan events, so run startup/shutdown explicitly
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+            for scenario in args.scenarios:
+                rps = args.batch_rps if scenario == 'toplu' else args.rps
+                stats = await drive(client, rps, args.duration, requests[scenario])
+                if scenario == 'toplu':
+                    stats['vehicles_per_s'] = round(stats['achieved_per_s'] * args.batch_size, 2)
+                results.update({f'{scenario}.{name}': value for name, value in stats.items()})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--rps', type=float, default=200, help='target rate for single-vehicle endpoints')
+    parser.add_argument('--batch-rps', type=float, default=5, help='target rate for /toplu-tahmin')
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10, help='seconds per scenario')
+    parser.add_argument('--unique-vehicles', type=int, default=500,
+                        help='distinct vehicles cycled through; lower means more cache hits')
+    parser.add_argument('--latency', type=float, default=0.05, help='fake LLM latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.02, help='fake LLM latency jitter in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--malformed-rate', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=42)
+    report.add_json_argument(parser)
+    args = parser.parse_args()
+
+    # The app logs every fallback; keep the output to the summary
+    original_print = builtins.print
+    builtins.print = lambda *a, **k: None
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        builtins.print = original_print
+
+    for scenario in args.scenarios:
+        r = {key.split('.', 1)[1]: value for key, value in results.items() if key.startswith(scenario + '.')}
+        print(f"{scenario:8s} {r['achieved_per_s']:8.1f} req/s  p50={r['p50_ms']:.1f}ms  "
+              f"p90={r['p90_ms']:.1f}ms  p99={r['p99_ms']:.1f}ms  errors={r['errors']}  "
+              f"fallbacks={r['local_fallbacks']}")
+    if args.json:
+        report.write(args.json, report.document('load_test', args, results))
+
+
+if __name__ == '__main__':
+    main()
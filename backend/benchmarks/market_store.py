@@ -0,0 +1,155 @@
+"""
+Market data snapshots: bulk upsert and the latest-snapshot table on SQLite
+Writes random snapshot batches with bulk_upsert_market_data through both
+write paths (ON CONFLICT and the row-by-row merge used for other databases)
+and checks that re-upserting a batch changes nothing, that the latest table
+only moves forward, that a snapshot turned inactive hands over to the newest
+older active one and that rebuild_latest_market_data yields the same latest
+table. Reports upsert throughput; exits non-zero if any check fails
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import offline, report
+
+SOURCES = ['sahibinden', 'arabam', 'otoplus']
+
+
+def make_snapshots(count: int, seed: int, inactive_rate: float) -> list:
+    """Snapshots over a few cars and sources, each at a distinct time so the newest is unambiguous"""
+    from web_scraper import PRICE_INDEX
+
+    rng = random.Random(seed)
+    cars = [(marka, model, yil) for marka, model in sorted(set(PRICE_INDEX.canonical_names.values()))[:10]
+            for yil in (2015, 2019, 2023)]
+    start = datetime(2024, 1, 1)
+    rows = []
+    for second in rng.sample(range(count * 20), count):
+        marka, model, yil = rng.choice(cars)
+        price = rng.randrange(300_000, 3_000_000, 1000)
+        rows.append({
+            'kaynak': rng.choice(SOURCES), 'marka': marka, 'model': model, 'yil': yil,
+            'veri_tarihi': start + timedelta(seconds=second),
+            'ortalama_fiyat': price, 'minimum_fiyat': int(price * 0.9), 'maksimum_fiyat': int(price * 1.1),
+            'ilan_sayisi': rng.randint(1, 50), 'aktif': rng.random() >= inactive_rate,
+        })
+    return rows
+
+
+def latest_price(db):
+    """Price get_latest_market_data returns for the inactive-row scenario's car, None if nothing"""
+    from web_scraper import get_latest_market_data
+
+    row = get_latest_market_data(db, 'Renault', 'Clio', 2019)
+    return row.ortalama_fiyat if row is not None else None
+
+
+def latest_table(db) -> dict:
+    from database import GuncelPazarVerisi
+
+    db.expire_all()
+    return {(r.marka, r.model, r.yil): (r.kaynak, r.veri_tarihi, r.ortalama_fiyat, r.aktif)
+            for r in db.query(GuncelPazarVerisi)}
+
+
+def history_count(db) -> int:
+    from database import PazarVerisi
+
+    return db.query(PazarVerisi).count()
+
+
+def reset():
+    from database import Base, engine
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+
+def run_checks(args, path: str) -> tuple:
+    from database import SessionLocal, bulk_upsert_market_data, rebuild_latest_market_data
+
+    checks = {}
+    results = {}
+    reset()
+    rows = make_snapshots(args.rows, args.seed, args.inactive_rate)
+    with SessionLocal() as db:
+        # Idempotent: the same batch again leaves history and the latest table as they were
+        start = time.perf_counter()
+        bulk_upsert_market_data(db, rows)
+        elapsed = time.perf_counter() - start
+        results[f'{path}.upsert_ms'] = round(elapsed * 1000, 2)
+        results[f'{path}.rows_per_s'] = round(len(rows) / elapsed)
+        count, latest = history_count(db), latest_table(db)
+        bulk_upsert_market_data(db, rows)
+        checks[f'{path}.idempotent'] = history_count(db) == count == len(rows) and latest_table(db) == latest
+
+        # Rebuild parity: rebuilding from history gives the table the incremental path kept
+        rebuild_latest_market_data(db)
+        checks[f'{path}.rebuild_parity'] = latest_table(db) == latest
+
+        # Forward only: an older snapshot does not replace the latest one, a newer one does
+        key = next(iter(latest))
+        current = latest[key][1]
+        car = {'kaynak': 'arabam', 'marka': key[0], 'model': key[1], 'yil': key[2], 'ilan_sayisi': 5}
+        bulk_upsert_market_data(db, [{**car, 'veri_tarihi': current - timedelta(days=1), 'ortalama_fiyat': 1}])
+        unchanged = latest_table(db)[key] == latest[key]
+        bulk_upsert_market_data(db, [{**car, 'veri_tarihi': current + timedelta(days=1), 'ortalama_fiyat': 2}])
+        checks[f'{path}.forward_only'] = unchanged and latest_table(db)[key][2] == 2
+
+    # Inactive rows: turning the newest snapshot inactive falls back to the newest active one
+    reset()
+    with SessionLocal() as db:
+        car = {'kaynak': 'arabam', 'marka': 'renault', 'model': 'clio', 'yil': 2019, 'ilan_sayisi': 5}
+        older, newer = datetime(2024, 1, 1), datetime(2024, 2, 1)
+        bulk_upsert_market_data(db, [{**car, 'veri_tarihi': older, 'ortalama_fiyat': 101},
+                                     {**car, 'veri_tarihi': newer, 'ortalama_fiyat': 999}])
+        newest_active = latest_price(db)
+        bulk_upsert_market_data(db, [{**car, 'veri_tarihi': newer, 'ortalama_fiyat': 999, 'aktif': False}])
+        fallback = latest_price(db)
+        fell_back = latest_table(db)
+        rebuild_latest_market_data(db)
+        parity = latest_table(db) == fell_back
+        bulk_upsert_market_data(db, [{**car, 'veri_tarihi': older, 'ortalama_fiyat': 101, 'aktif': False}])
+        checks[f'{path}.inactive'] = (newest_active, fallback, parity, latest_price(db)) == (999, 101, True, None)
+    return checks, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--inactive-rate', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=42)
+    report.add_json_argument(parser)
+    args = parser.parse_args()
+
+    offline.configure(latency=0)
+    import database
+
+    checks, results = {}, {}
+    on_conflict = database._insert_fonksiyonu
+    for path, insert in (('on_conflict', on_conflict), ('merge', lambda db: None)):
+        # The merge path is what databases without ON CONFLICT use; forced here on SQLite
+        database._insert_fonksiyonu = insert
+        path_checks, path_results = run_checks(args, path)
+        checks.update(path_checks)
+        results.update(path_results)
+    database._insert_fonksiyonu = on_conflict
+
+    for name, passed in checks.items():
+        print(f"{name:28s} {'ok' if passed else 'FAILED'}")
+    for path in ('on_conflict', 'merge'):
+        print(f"{path:12s} upsert of {args.rows} rows: {results[path + '.upsert_ms']:.1f}ms "
+              f"({results[path + '.rows_per_s']} rows/s)")
+    results['mismatches'] = sum(not passed for passed in checks.values())
+    if args.json:
+        report.write(args.json, report.document('market_store', args, results))
+    if results['mismatches']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
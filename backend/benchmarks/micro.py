@@ -0,0 +1,106 @@
+"""
+Micro-benchmarks for the hot per-request helpers
+Times FiyatTahminParser.parse on clean and malformed model output,
+DepreciationCalculator.calculate_depreciation and the base price lookup
+(both the sync core and the async _get_base_price wrapper)
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks import offline, report
+
+DAMAGES = [
+    {'part': 'kaput', 'damage_level': 'orta', 'damage_type': 'boyali'},
+    {'part': 'sol_on_kapi', 'damage_level': 'hafif', 'damage_type': 'degisen'},
+    {'part': 'tavan', 'damage_level': 'agir', 'damage_type': 'hasarli'},
+]
+
+
+def measure(func, min_time: float) -> dict:
+    """Calls func in growing batches until a batch takes min_time, then reports that batch"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed * 10 < min_time else 10
+    return {'us_per_op': round(elapsed / number * 1e6, 3), 'ops_per_s': round(number / elapsed, 1)}
+
+
+def measure_async(coroutine_factory, min_time: float) -> dict:
+    """Like measure, awaiting coroutine_factory() inside a single event loop"""
+    async def batch(number):
+        start = time.perf_counter()
+        for _ in range(number):
+            await coroutine_factory()
+        return time.perf_counter() - start
+
+    async def run():
+        number = 1
+        while True:
+            elapsed = await batch(number)
+            if elapsed >= min_time:
+                return number, elapsed
+            number *= 2 if elapsed * 10 < min_time else 10
+
+    number, elapsed = asyncio.run(run())
+    return {'us_per_op': round(elapsed / number * 1e6, 3), 'ops_per_s': round(number / elapsed, 1)}
+
+
+def benchmarks():
+    from llm_havuzu import SahteLLM
+    from tahmin_zincirleri import FiyatTahminParser
+    from web_scraper import depreciation_calculator, scraper
+
+    parser = FiyatTahminParser()
+    clean, repaired, fenced, truncated, prose = (SahteLLM.YANIT,) + SahteLLM.BOZUK_YANITLAR
+    return {
+        'parse.clean': lambda: parser.parse(clean),
+        'parse.fenced': lambda: parser.parse(fenced),
+        'parse.repaired': lambda: parser.parse(repaired),
+        'parse.truncated': lambda: parser.parse(truncated),
+        'parse.failed': lambda: parser.parse(prose),
+        'depreciation.three_damages': lambda: depreciation_calculator.calculate_depreciation(1_000_000, DAMAGES),
+        'depreciation.no_damage': lambda: depreciation_calculator.calculate_depreciation(1_000_000, []),
+        'base_price.known_model': lambda: scraper.base_price('Toyota', 'Corolla', 2018),
+        'base_price.alias': lambda: scraper.base_price('VW', 'Golf', 2018),
+        'base_price.unknown_model': lambda: scraper.estimate_price('Tofaş', 'Şahin', 1995),
+    }, {
+        'get_base_price.async': lambda: scraper._get_base_price('Toyota', 'Corolla', 2018),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--min-time', type=float, default=0.5, help='seconds per measurement')
+    parser.add_argument('--only', nargs='*', help='run benchmarks whose name starts with one of these')
+    report.add_json_argument(parser)
+    args = parser.parse_args()
+
+    offline.load_app(latency=0)
+    sync_benchmarks, async_benchmarks = benchmarks()
+    selected = lambda name: not args.only or any(name.startswith(prefix) for prefix in args.only)
+
+    results = {}
+    for name, func in sync_benchmarks.items():
+        if selected(name):
+            results.update({f'{name}.{k}': v for k, v in measure(func, args.min_time).items()})
+    for name, factory in async_benchmarks.items():
+        if selected(name):
+            results.update({f'{name}.{k}': v for k, v in measure_async(factory, args.min_time).items()})
+
+    for key, value in results.items():
+        if key.endswith('.us_per_op'):
+            name = key[:-len('.us_per_op')]
+            print(f"{name:32s} {value:10.2f} us/op  {results[name + '.ops_per_s']:12.0f} ops/s")
+    if args.json:
+        report.write(args.json, report.document('micro', args, results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Offline app setup shared by the benchmarks
+Points the API at the local fake LLM and a throwaway SQLite database before
+main is imported, so runs need no network access or API key
+"""
+
+import os
+import random
+import tempfile
+
+FUELS = ['Benzin', 'Dizel', 'LPG', 'Hibrit']
+GEARBOXES = ['Manuel', 'Otomatik']
+CITIES = ['İstanbul', 'Ankara', 'İzmir', 'Bursa', 'Antalya']
+PARTS = ['kaput', 'sol_on_camurluk', 'sag_on_kapi', 'bagaj', 'tavan']
+STATES = ['boyali', 'lokal_boyali', 'degisen', 'hasarli']
+
+
+def configure(latency: float = 0.05, jitter: float = 0.0, error_rate: float = 0.0,
+              malformed_rate: float = 0.0, db_path: str = None, tail_rate: float = 0.0,
+              tail_latency: float = 0.0):
+    """Sets the environment main reads at import time; call before importing main"""
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='fiyatiq-bench-'), 'bench.db')
+    os.environ.update({
+        'MOCK_AI_RESPONSES': 'true',
+        'MOCK_AI_GECIKME': str(latency),
+        'MOCK_AI_SAPMA': str(jitter),
+        'MOCK_AI_HATA_ORANI': str(error_rate),
+        'MOCK_AI_BOZUK_ORANI': str(malformed_rate),
+        'MOCK_AI_KUYRUK_ORANI': str(tail_rate),
+        'MOCK_AI_KUYRUK_GECIKMESI': str(tail_latency),
+        # Backoff and quota would otherwise dominate the measurement
+        'LLM_GERI_CEKILME_TABANI': '0',
+        'GEMINI_RATE_LIMIT_PER_MINUTE': '0',
+        'DATABASE_URL': f'sqlite:///{db_path}',
+        'SCRAPING_ENABLED': 'false',
+        'MARKET_WARMUP_TOP_N': '0',
+        'METRIK_YAVAS_ISTEK_DOSYASI': '',
+        # Build the LLM chains during startup so warm-up does not count as local fallbacks
+        'LLM_BASLATMA': 'hemen',
+    })
+    return db_path
+
+
+def load_app(**kwargs):
+    """Configures the offline environment and returns the imported main module"""
+    configure(**kwargs)
+    import main
+    return main
+
+
+def vehicles(count: int, detailed: bool, seed: int = 42) -> list:
+    """Deterministic request bodies for /hizli-tahmin or /detayli-tahmin"""
+    # Imported lazily: web_scraper pulls in the database module, which reads DATABASE_URL
+    from web_scraper import PRICE_INDEX
+
+    rng = random.Random(seed)
+    models = sorted(set(PRICE_INDEX.canonical_names.values()))
+    bodies = []
+    for _ in range(count):
+        marka, model = rng.choice(models)
+        body = {
+            'marka': marka,
+            'model': model,
+            'yil': rng.randint(2008, 2024),
+            'kilometre': rng.randrange(0, 300_000, 1000),
+            'yakit_tipi': rng.choice(FUELS),
+            'vites_tipi': rng.choice(GEARBOXES),
+            'il': rng.choice(CITIES),
+        }
+        if detailed:
+            body['renk'] = rng.choice(['Beyaz', 'Siyah', 'Gri', 'Kırmızı'])
+            body['hasar_detaylari'] = [
+                {'parca': rng.choice(PARTS), 'durum': rng.choice(STATES)}
+                for _ in range(rng.randint(0, 3))
+            ]
+        bodies.append(body)
+    return bodies
@@ -0,0 +1,78 @@
+"""
+Prompt size per estimate for each prompt mode
+Renders the quick and detailed prompts for a sample of vehicles in the
+classic mode and in the structured mode (system message, inline instruction
+and cached instruction) and reports what is sent per call. The variable part
+excludes the system instruction, which is identical on every call and is
+the part a context cache can serve. Token counts are approximate
+(characters / 4); real counts per request are in the token_kullanimi field
+of every estimate response
+"""
+
+import argparse
+import statistics
+
+from benchmarks import offline, report
+
+CHARS_PER_TOKEN = 4
+MODES = (('klasik', 'mesaj'), ('yapisal', 'mesaj'), ('yapisal', 'istem'), ('yapisal', 'onbellek'))
+
+
+def rendered(prompt, values: dict) -> tuple:
+    """(system characters, per-call characters) of a rendered prompt"""
+    messages = prompt.invoke(values).to_messages()
+    system = sum(len(m.content) for m in messages if m.type == 'system')
+    return system, sum(len(m.content) for m in messages) - system
+
+
+def detailed_values(body: dict, reference: int) -> dict:
+    damages = ', '.join(f"{d['parca']}: {d['durum']}" for d in body['hasar_detaylari']) or 'Hasar yok'
+    return {**body, 'motor_hacmi': None, 'motor_gucu': None, 'ekstra_bilgiler': None,
+            'referans_fiyat': f'{reference:,}', 'hasar_listesi': damages}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--vehicles', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    report.add_json_argument(parser)
+    args = parser.parse_args()
+
+    offline.configure(latency=0)
+    import tahmin_zincirleri as chains
+
+    quick = [{**body, 'motor_hacmi': None, 'motor_gucu': None}
+             for body in offline.vehicles(args.vehicles, detailed=False, seed=args.seed)]
+    detailed = [detailed_values(body, 1_000_000) for body in offline.vehicles(args.vehicles, detailed=True, seed=args.seed)]
+
+    results = {}
+    for mode, instruction in MODES:
+        name = mode if mode == 'klasik' else f'{mode}_{instruction}'
+        for profile, values in (('hizli', quick), ('detayli', detailed)):
+            if mode == 'klasik':
+                template = chains.HIZLI_TAHMIN_SABLONU if profile == 'hizli' else chains.DETAYLI_TAHMIN_SABLONU
+                prompt = chains.PromptTemplate.from_template(template)
+            else:
+                template = chains.HIZLI_YAPISAL_SABLONU if profile == 'hizli' else chains.DETAYLI_YAPISAL_SABLONU
+                prompt = chains.yapisal_istem(template, instruction)
+            sizes = [rendered(prompt, v) for v in values]
+            system = statistics.mean(s for s, _ in sizes)
+            per_call = statistics.mean(c for _, c in sizes)
+            results[f'{name}.{profile}.sent_tokens'] = round((system + per_call) / CHARS_PER_TOKEN, 1)
+            results[f'{name}.{profile}.variable_tokens'] = round(per_call / CHARS_PER_TOKEN, 1)
+
+    baseline = results['klasik.hizli.sent_tokens'] + results['klasik.detayli.sent_tokens']
+    print(f"{'mode':20s} {'profile':8s} {'sent':>8s} {'variable':>9s}   (approx. tokens per call)")
+    for mode, instruction in MODES:
+        name = mode if mode == 'klasik' else f'{mode}_{instruction}'
+        for profile in ('hizli', 'detayli'):
+            print(f"{name:20s} {profile:8s} {results[f'{name}.{profile}.sent_tokens']:8.0f} "
+                  f"{results[f'{name}.{profile}.variable_tokens']:9.0f}")
+        total = results[f'{name}.hizli.variable_tokens'] + results[f'{name}.detayli.variable_tokens']
+        print(f"{'':20s} {'':8s} variable input vs klasik: {total / baseline * 100:5.1f}%")
+    if args.json:
+        report.write(args.json, report.document('prompt_tokens', args, results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Machine-readable benchmark output
+Every benchmark writes {"benchmark", "environment", "args", "results"} where
+results is a flat mapping of metric name to number, so runs from different
+releases can be compared with benchmarks.compare
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+
+def environment() -> dict:
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        revision = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_revision': revision,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def document(name: str, args, results: dict) -> dict:
+    return {
+        'benchmark': name,
+        'environment': environment(),
+        'args': {key: value for key, value in vars(args).items() if key != 'json'},
+        'results': results,
+    }
+
+
+def write(path: str, documents) -> None:
+    """Writes one document, or {"benchmarks": [...]} for several, to path ('-' for stdout)"""
+    payload = documents if isinstance(documents, dict) else {'benchmarks': list(documents)}
+    text = json.dumps(payload, indent=2, ensure_ascii=False)
+    if path == '-':
+        sys.stdout.write(text + '\n')
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text + '\n')
+
+
+def add_json_argument(parser) -> None:
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON ('-' for stdout)")
@@ -0,0 +1,66 @@
+"""
+Runs the whole offline benchmark suite and writes one combined JSON file
+Each benchmark runs in its own interpreter so environment set-up and
+module-level state cannot leak between them. Compare two runs with
+``python -m benchmarks.compare baseline.json candidate.json``
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks import report
+
+# (module, arguments for the default and the --quick run)
+SUITE = [
+    ('import_time', [], ['--repeat', '3']),
+    ('micro', [], ['--min-time', '0.1']),
+    ('prompt_tokens', [], ['--vehicles', '50']),
+    ('valuation_grid', [], ['--vehicles', '500', '--min-time', '0.1']),
+    ('depreciation_batch', [], ['--rows', '20000']),
+    ('scraper_fixtures', [], ['--min-time', '0.05']),
+    ('market_store', [], ['--rows', '1000']),
+    ('fallback_concurrency', [], ['--requests', '2000']),
+    ('circuit_breaker', [], []),
+    ('hedging', [], ['--requests', '600']),
+    ('job_queue', [], ['--requests', '100']),
+    ('load_test', [], ['--duration', '3', '--rps', '100', '--batch-rps', '2']),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--quick', action='store_true', help='smaller runs for a fast smoke check')
+    parser.add_argument('--only', nargs='*', choices=[name for name, _, _ in SUITE])
+    parser.add_argument('--json', metavar='PATH', default='benchmark-results.json')
+    args = parser.parse_args()
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    documents = []
+    failed = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, default_args, quick_args in SUITE:
+            if args.only and name not in args.only:
+                continue
+            output = os.path.join(tmp, f'{name}.json')
+            command = [sys.executable, '-m', f'benchmarks.{name}', '--json', output]
+            command += quick_args if args.quick else default_args
+            print(f"== {name}", flush=True)
+            if subprocess.run(command, cwd=backend_dir).returncode != 0:
+                failed.append(name)
+                continue
+            with open(output, encoding='utf-8') as f:
+                documents.append(json.load(f))
+
+    report.write(args.json, documents)
+    print(f"results written to {args.json}")
+    if failed:
+        print(f"failed: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
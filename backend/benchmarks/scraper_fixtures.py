@@ -0,0 +1,251 @@
+"""
+Marketplace scraping pipeline against recorded pages served by a local stub
+Serves the sahibinden, arabam and otoplus pages in benchmarks/fixtures/scraper
+from an aiohttp stub server and runs MarketFetcher and CarMarketScraper
+against it: parsing with the configured selectors, 429 with Retry-After
+(and a capped, day-long Retry-After), ETag revalidation answered with 304, a failing source being skipped and the
+damage-group aggregation. Exits non-zero if any check fails. --record
+refreshes the pages (and expected.json) from the live sites
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import hashlib
+import json
+import os
+import sys
+import time
+
+from aiohttp import web
+
+from benchmarks import offline, report
+from benchmarks.micro import measure
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'scraper')
+
+
+def load_expected() -> dict:
+    with open(os.path.join(FIXTURES, 'expected.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_page(name: str) -> str:
+    with open(os.path.join(FIXTURES, f'{name}.html'), encoding='utf-8') as f:
+        return f.read()
+
+
+class StubServer:
+    """Serves one fixture page per source under /<source>/...
+
+    modes[source] is 'ok', 'fail' (always 500) or 'throttle' (429 with
+    Retry-After on the first request to each URL, then the page)
+    """
+
+    def __init__(self, pages: dict, retry_after: int):
+        self.pages = pages
+        self.retry_after = retry_after
+        self.modes = {name: 'ok' for name in pages}
+        self.log = []
+        self._throttled = set()
+
+    async def handle(self, request):
+        name = request.match_info['source']
+        body = self.pages.get(name)
+        if body is None:
+            return web.Response(status=404)
+        mode = self.modes[name]
+        if mode == 'fail':
+            status = 500
+        elif mode == 'throttle' and request.path_qs not in self._throttled:
+            self._throttled.add(request.path_qs)
+            status = 429
+        else:
+            etag = '"%s"' % hashlib.sha1(body.encode()).hexdigest()
+            status = 304 if request.headers.get('If-None-Match') == etag else 200
+        self.log.append((name, status, request.headers.get('If-None-Match')))
+        if status == 200:
+            return web.Response(text=body, content_type='text/html', headers={'ETag': etag})
+        if status == 304:
+            return web.Response(status=304, headers={'ETag': etag})
+        if status == 429:
+            return web.Response(status=429, headers={'Retry-After': str(self.retry_after)})
+        return web.Response(status=status)
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get('/{source}/{tail:.*}', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        return f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    def requests_to(self, name: str) -> list:
+        return [entry for entry in self.log if entry[0] == name]
+
+
+def expected_market_data(expected: dict, sources: list) -> dict:
+    """The aggregate CarMarketScraper should report, computed from expected.json"""
+    from web_scraper import DAMAGE_PRICE_FACTORS
+
+    rows = [(price, damage) for name in sources
+            for price, damage in zip(expected['sources'][name]['prices'], expected['sources'][name]['damage'])]
+    prices = [price for price, _ in rows]
+    data = {
+        'ortalama_fiyat': int(sum(prices) / len(prices)),
+        'minimum_fiyat': min(prices),
+        'maksimum_fiyat': max(prices),
+        'ilan_sayisi': len(prices),
+    }
+    for damage in DAMAGE_PRICE_FACTORS:
+        group = [price for price, d in rows if d == damage]
+        data[f'{damage}_ortalama'] = int(sum(group) / len(group)) if group else None
+    reference = data['hasarsiz_ortalama'] or data['ortalama_fiyat']
+    for damage, factor in DAMAGE_PRICE_FACTORS.items():
+        if data[f'{damage}_ortalama'] is None:
+            data[f'{damage}_ortalama'] = int(reference * factor)
+    return data
+
+
+async def run_checks(args, expected: dict) -> tuple:
+    from market_fetcher import DEFAULT_SOURCES, MarketFetcher, parse_listings
+    from web_scraper import CarMarketScraper
+
+    names = list(expected['sources'])
+    pages = {name: load_page(name) for name in names}
+    query = expected['query']
+    checks = {}
+    results = {}
+
+    # Parsing with the production selectors
+    for name in names:
+        listings = parse_listings(pages[name], DEFAULT_SOURCES[name])
+        want = expected['sources'][name]
+        checks[f'parse.{name}'] = ([l.price for l in listings] == want['prices']
+                                   and [l.damage for l in listings] == want['damage'])
+        timing = measure(lambda: parse_listings(pages[name], DEFAULT_SOURCES[name]), args.min_time)
+        results[f'parse.{name}.us_per_op'] = timing['us_per_op']
+
+    stub = StubServer(pages, args.retry_after)
+    base = await stub.start()
+    sources = {name: dataclasses.replace(DEFAULT_SOURCES[name], base_url=f'{base}/{name}') for name in names}
+
+    def fetcher():
+        return MarketFetcher(sources=sources)
+
+    try:
+        # 429 with Retry-After: the retry waits for the advertised delay, then succeeds
+        client = fetcher()
+        stub.modes['sahibinden'] = 'throttle'
+        url = client.search_url(sources['sahibinden'], query['marka'], query['model'], query['yil'])
+        start = time.perf_counter()
+        body = await client.fetch(url)
+        waited = time.perf_counter() - start
+        statuses = [status for _, status, _ in stub.requests_to('sahibinden')]
+        checks['retry_after'] = body == pages['sahibinden'] and statuses == [429, 200] and waited >= args.retry_after
+        results['retry_after.waited_ms'] = round(waited * 1000, 2)
+        stub.modes['sahibinden'] = 'ok'
+
+        # A day-long Retry-After is capped at max_retry_after instead of stalling the fetch
+        capped = fetcher()
+        capped.max_retry_after = args.retry_after
+        stub.modes['arabam'] = 'throttle'
+        stub.retry_after = 86400
+        start = time.perf_counter()
+        body = await capped.fetch(capped.search_url(sources['arabam'], query['marka'], query['model'], query['yil']))
+        waited = time.perf_counter() - start
+        checks['retry_after_cap'] = body == pages['arabam'] and args.retry_after <= waited < args.retry_after + 2
+        results['retry_after_cap.waited_ms'] = round(waited * 1000, 2)
+        stub.retry_after = args.retry_after
+        stub.modes['arabam'] = 'ok'
+        await capped.close()
+
+        # Revalidation: the second fetch sends If-None-Match and reuses the cached body on 304
+        body = await client.fetch(url)
+        last = stub.requests_to('sahibinden')[-1]
+        checks['revalidation'] = body == pages['sahibinden'] and last[1] == 304 and last[2] is not None
+        await client.close()
+
+        # All sources up: every listing is aggregated into the damage groups
+        scraper = CarMarketScraper(fetcher())
+        scraper.min_listings = 1
+        data = await scraper._get_scraped_market_data(query['marka'], query['model'], query['yil'])
+        want = expected_market_data(expected, names)
+        checks['aggregation'] = data is not None and all(data[key] == value for key, value in want.items())
+        await scraper.close()
+
+        # A source that keeps failing is retried, then skipped; groups it alone covered are derived
+        failing = names[-1]
+        stub.modes[failing] = 'fail'
+        stub.log.clear()
+        scraper = CarMarketScraper(fetcher())
+        scraper.min_listings = 1
+        start = time.perf_counter()
+        data = await scraper._get_scraped_market_data(query['marka'], query['model'], query['yil'])
+        results['failing_source.ms'] = round((time.perf_counter() - start) * 1000, 2)
+        want = expected_market_data(expected, names[:-1])
+        checks['failing_source'] = (
+            data is not None and all(data[key] == value for key, value in want.items())
+            and len(stub.requests_to(failing)) == scraper.fetcher.max_retries + 1
+        )
+        await scraper.close()
+    finally:
+        await stub.stop()
+    return checks, results
+
+
+async def record(expected: dict):
+    """Fetches the live search pages for expected.json's query and rewrites the fixtures"""
+    from market_fetcher import MarketFetcher, parse_listings
+
+    client = MarketFetcher()
+    query = expected['query']
+    try:
+        for name, source in client.sources.items():
+            html = await client.fetch(client.search_url(source, query['marka'], query['model'], query['yil']))
+            with open(os.path.join(FIXTURES, f'{name}.html'), 'w', encoding='utf-8') as f:
+                f.write(html)
+            listings = parse_listings(html, source)
+            expected['sources'][name] = {'prices': [l.price for l in listings],
+                                         'damage': [l.damage for l in listings]}
+            print(f"recorded {name}: {len(listings)} listings")
+    finally:
+        await client.close()
+    with open(os.path.join(FIXTURES, 'expected.json'), 'w', encoding='utf-8') as f:
+        json.dump(expected, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--retry-after', type=int, default=1, help='seconds the stub asks the client to wait on 429')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per parse measurement')
+    parser.add_argument('--record', action='store_true', help='fetch live pages into the fixtures (network access)')
+    report.add_json_argument(parser)
+    args = parser.parse_args()
+
+    offline.configure(latency=0)
+    # Fast retries against the stub; the Retry-After delay is still honoured
+    os.environ.update({'SCRAPING_MAX_RETRIES': '2', 'SCRAPING_BACKOFF_BASE': '0.01',
+                       'SCRAPING_RATE_LIMIT': '1000/second'})
+    expected = load_expected()
+    if args.record:
+        asyncio.run(record(expected))
+        return
+
+    checks, results = asyncio.run(run_checks(args, expected))
+    for name, passed in checks.items():
+        print(f"{name:22s} {'ok' if passed else 'FAILED'}")
+    results['mismatches'] = sum(not passed for passed in checks.values())
+    if args.json:
+        report.write(args.json, report.document('scraper_fixtures', args, results))
+    if results['mismatches']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
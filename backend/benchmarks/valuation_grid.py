@@ -0,0 +1,73 @@
+"""
+Precomputed valuation grid against the local engine it is built from
+Builds the grid into a temporary file, then reports the build time and file
+size, the lookup cost of FiyatIzgarasi.ara next to YerelFiyatMotoru.hizli,
+the share of sample vehicles the grid covers and how far the kilometre
+interpolation drifts from the engine's own answer
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from types import SimpleNamespace
+
+from benchmarks import offline, report
+from benchmarks.micro import measure
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--vehicles', type=int, default=2000)
+    parser.add_argument('--min-time', type=float, default=0.5, help='seconds per latency measurement')
+    parser.add_argument('--seed', type=int, default=42)
+    report.add_json_argument(parser)
+    args = parser.parse_args()
+
+    offline.configure(latency=0)
+    from fiyat_izgarasi import FiyatIzgarasi, izgara_olustur, yerel_kaynak
+    from yerel_tahmin import yerel_motor
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'grid.bin')
+        start = time.perf_counter()
+        points = asyncio.run(izgara_olustur(path, yerel_kaynak, 'yerel'))
+        results = {
+            'build.seconds': round(time.perf_counter() - start, 3),
+            'build.points': points,
+            'build.bytes': os.path.getsize(path),
+        }
+        grid = FiyatIzgarasi.yukle(path)
+
+        bodies = offline.vehicles(args.vehicles, detailed=False, seed=args.seed)
+        errors = []
+        for body in bodies:
+            prices = grid.ara(**body)
+            if prices is not None:
+                expected = yerel_motor.hizli(SimpleNamespace(**body))['ortalama_fiyat']
+                errors.append(abs(prices[1] - expected) / expected)
+        results['coverage'] = round(len(errors) / len(bodies), 4)
+        results['interpolation.mean_rel_error'] = round(statistics.mean(errors), 6) if errors else 0.0
+        results['interpolation.max_rel_error'] = round(max(errors), 6) if errors else 0.0
+
+        body = bodies[0]
+        vehicle = SimpleNamespace(**body)
+        for name, func in (('lookup.grid', lambda: grid.ara(**body)),
+                           ('lookup.local_engine', lambda: yerel_motor.hizli(vehicle))):
+            results.update({f'{name}.{k}': v for k, v in measure(func, args.min_time).items()})
+
+    print(f"build: {results['build.points']} points, {results['build.bytes']} bytes, "
+          f"{results['build.seconds']:.2f} s")
+    print(f"coverage: {results['coverage'] * 100:.1f}% of {len(bodies)} sample vehicles")
+    print(f"interpolation error vs engine: mean {results['interpolation.mean_rel_error'] * 100:.3f}%, "
+          f"max {results['interpolation.max_rel_error'] * 100:.3f}%")
+    for name in ('lookup.grid', 'lookup.local_engine'):
+        print(f"{name:20s} {results[name + '.us_per_op']:10.2f} us/op")
+    if args.json:
+        report.write(args.json, report.document('valuation_grid', args, results))
+
+
+if __name__ == '__main__':
+    main()
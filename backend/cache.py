@@ -0,0 +1,155 @@
+"""Tahmin Önbelleği
+
+LLM zincirlerinin önüne konan, süre (TTL) ve LRU tahliyesi olan
+bellek içi yanıt önbelleği. Anahtar olarak araç bilgilerinin
+normalize edilmiş "parmak izi" kullanılır; böylece kilometresi birkaç
+yüz km farklı olan aynı araçlar tek bir kayıt üzerinden yanıtlanır.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+def _normalize_metin(deger: Any) -> Any:
+    """Metin alanlarını küçük harfe çevirip boşlukları temizler."""
+    if isinstance(deger, str):
+        return " ".join(deger.replace("İ", "i").lower().split())
+    return deger
+
+
+def arac_parmak_izi(arac: Any, km_aralik: int = 5000, ek_alanlar: Tuple[str, ...] = ()) -> Tuple:
+    """Araç bilgilerinden önbellek anahtarı olarak kullanılacak parmak izini üretir.
+
+    Marka ve model küçük harfe çevrilir, kilometre `km_aralik` genişliğindeki
+    dilimlere yuvarlanır, diğer alanlar olduğu gibi alınır. `ek_alanlar`
+    ile detaylı tahmin gibi ek alan içeren istekler ayrıştırılır.
+    """
+    veri = arac.dict() if hasattr(arac, "dict") else dict(arac)
+    km_dilimi = int(veri["kilometre"]) // km_aralik if km_aralik > 0 else int(veri["kilometre"])
+    anahtar = (
+        _normalize_metin(veri["marka"]),
+        _normalize_metin(veri["model"]),
+        veri["yil"],
+        km_dilimi,
+        veri.get("yakit_tipi"),
+        veri.get("vites_tipi"),
+        veri.get("il"),
+        veri.get("motor_hacmi"),
+        veri.get("motor_gucu"),
+    )
+    for alan in ek_alanlar:
+        deger = veri.get(alan)
+        if isinstance(deger, list):
+            deger = tuple(
+                tuple(sorted(oge.items())) if isinstance(oge, dict) else oge
+                for oge in deger
+            )
+        anahtar += (deger,)
+    return anahtar
+
+
+def yaklasik_boyut(deger: Any) -> int:
+    """Bir önbellek değerinin bellekte kapladığı yaklaşık bayt miktarı."""
+    if isinstance(deger, dict):
+        return sys.getsizeof(deger) + sum(
+            yaklasik_boyut(k) + yaklasik_boyut(v) for k, v in deger.items()
+        )
+    if isinstance(deger, (list, tuple)):
+        return sys.getsizeof(deger) + sum(yaklasik_boyut(v) for v in deger)
+    return sys.getsizeof(deger)
+
+
+class TTLLRUCache:
+    """Süre sınırlı, LRU tahliyeli ve bellek sınırlı önbellek.
+
+    Kayıtlar `ttl` saniye sonra geçersiz olur. Kayıt sayısı `max_kayit`
+    ya da toplam yaklaşık boyut `max_bayt` aşıldığında en uzun süredir
+    kullanılmayan kayıtlar atılır.
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[float] = 1800,
+        max_kayit: int = 10000,
+        max_bayt: int = 64 * 1024 * 1024,
+        boyut_fonksiyonu: Callable[[Any], int] = yaklasik_boyut,
+        saat: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.max_kayit = max_kayit
+        self.max_bayt = max_bayt
+        self._boyut_fonksiyonu = boyut_fonksiyonu
+        self._saat = saat
+        self._kayitlar: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self._toplam_bayt = 0
+        self._kilit = threading.Lock()
+        self.isabet = 0
+        self.iska = 0
+        self.tahliye = 0
+
+    def __len__(self) -> int:
+        return len(self._kayitlar)
+
+    def get(self, anahtar: Hashable, varsayilan: Any = None) -> Any:
+        """Kaydı döndürür; süresi dolmuşsa siler ve ıska sayar."""
+        with self._kilit:
+            kayit = self._kayitlar.get(anahtar)
+            if kayit is None:
+                self.iska += 1
+                return varsayilan
+            if self.ttl is not None and self._saat() - kayit[1] > self.ttl:
+                self._sil(anahtar)
+                self.iska += 1
+                return varsayilan
+            self._kayitlar.move_to_end(anahtar)
+            self.isabet += 1
+            return kayit[0]
+
+    def set(self, anahtar: Hashable, deger: Any) -> None:
+        """Kaydı ekler ya da günceller, gerekirse eski kayıtları tahliye eder."""
+        boyut = self._boyut_fonksiyonu(deger)
+        with self._kilit:
+            if anahtar in self._kayitlar:
+                self._sil(anahtar)
+            if boyut > self.max_bayt:
+                return
+            self._kayitlar[anahtar] = (deger, self._saat(), boyut)
+            self._toplam_bayt += boyut
+            while self._kayitlar and (
+                len(self._kayitlar) > self.max_kayit or self._toplam_bayt > self.max_bayt
+            ):
+                eski_anahtar = next(iter(self._kayitlar))
+                self._sil(eski_anahtar)
+                self.tahliye += 1
+
+    def pop(self, anahtar: Hashable, varsayilan: Any = None) -> Any:
+        with self._kilit:
+            kayit = self._kayitlar.get(anahtar)
+            if kayit is None:
+                return varsayilan
+            self._sil(anahtar)
+            return kayit[0]
+
+    def clear(self) -> None:
+        with self._kilit:
+            self._kayitlar.clear()
+            self._toplam_bayt = 0
+
+    def _sil(self, anahtar: Hashable) -> None:
+        _, _, boyut = self._kayitlar.pop(anahtar)
+        self._toplam_bayt -= boyut
+
+    def istatistikler(self) -> Dict[str, Any]:
+        """İsabet/ıska sayaçları ve doluluk bilgisi."""
+        toplam = self.isabet + self.iska
+        return {
+            "kayit_sayisi": len(self._kayitlar),
+            "yaklasik_bayt": self._toplam_bayt,
+            "isabet": self.isabet,
+            "iska": self.iska,
+            "tahliye": self.tahliye,
+            "isabet_orani": round(self.isabet / toplam, 4) if toplam else 0.0,
+        }
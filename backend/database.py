@@ -0,0 +1,296 @@
+"""Veritabanı Katmanı
+
+Pazar verisi anlık görüntülerini (PazarVerisi), her araç için en güncel
+görüntüyü tutan tabloyu (GuncelPazarVerisi) ve kuyruğa alınan detaylı
+tahmin işlerini (TahminIsi) tanımlar. Varsayılan olarak
+yerel SQLite kullanılır; DATABASE_URL ile PostgreSQL vb. seçilebilir.
+"""
+
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import (Boolean, Column, DateTime, Index, Integer, String, Text,
+                        UniqueConstraint, create_engine, event, select, text)
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./fiyatiq.db")
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+
+if DATABASE_URL.startswith("sqlite"):
+    engine = create_engine(DATABASE_URL, echo=DB_ECHO, connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def _sqlite_ayarla(dbapi_baglanti, _kayit):
+        # WAL, okuyucuların toplu yazımlar sırasında beklememesini sağlar
+        imlec = dbapi_baglanti.cursor()
+        imlec.execute("PRAGMA journal_mode=WAL")
+        imlec.execute("PRAGMA synchronous=NORMAL")
+        imlec.close()
+else:
+    engine = create_engine(
+        DATABASE_URL,
+        echo=DB_ECHO,
+        pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        pool_pre_ping=True,
+    )
+
+SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+Base = declarative_base()
+
+# Anlık görüntülerde güncellenen değer sütunları
+DEGER_SUTUNLARI = (
+    "ortalama_fiyat", "minimum_fiyat", "maksimum_fiyat", "ilan_sayisi",
+    "hasarsiz_ortalama", "boyali_ortalama", "degisen_ortalama", "hasarli_ortalama",
+)
+
+
+class PazarVerisi(Base):
+    """Bir kaynaktan belirli bir anda toplanan pazar verisi (geçmiş kaydı)."""
+    __tablename__ = "pazar_verileri"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kaynak = Column(String(50), nullable=False, default="unknown")
+    marka = Column(String(100), nullable=False)
+    model = Column(String(100), nullable=False)
+    yil = Column(Integer, nullable=False)
+    ortalama_fiyat = Column(Integer)
+    minimum_fiyat = Column(Integer)
+    maksimum_fiyat = Column(Integer)
+    ilan_sayisi = Column(Integer, default=0)
+    hasarsiz_ortalama = Column(Integer)
+    boyali_ortalama = Column(Integer)
+    degisen_ortalama = Column(Integer)
+    hasarli_ortalama = Column(Integer)
+    veri_tarihi = Column(DateTime, nullable=False, default=datetime.utcnow)
+    aktif = Column(Boolean, nullable=False, default=True)
+
+    __table_args__ = (
+        # (marka, model, yil) için en yeni kayıtları tarih sıralı okumayı destekler
+        Index("ix_pazar_verileri_arac_tarih", "marka", "model", "yil", veri_tarihi.desc()),
+        # Aynı anlık görüntünün tekrar yüklenmesi yeni satır yerine güncelleme yapar
+        UniqueConstraint("kaynak", "marka", "model", "yil", "veri_tarihi", name="uq_pazar_verileri_anlik"),
+    )
+
+
+class GuncelPazarVerisi(Base):
+    """Her (marka, model, yil) için en güncel pazar verisi; toplu yazımda güncel tutulur."""
+    __tablename__ = "guncel_pazar_verileri"
+
+    marka = Column(String(100), primary_key=True)
+    model = Column(String(100), primary_key=True)
+    yil = Column(Integer, primary_key=True)
+    kaynak = Column(String(50), nullable=False, default="unknown")
+    ortalama_fiyat = Column(Integer)
+    minimum_fiyat = Column(Integer)
+    maksimum_fiyat = Column(Integer)
+    ilan_sayisi = Column(Integer, default=0)
+    hasarsiz_ortalama = Column(Integer)
+    boyali_ortalama = Column(Integer)
+    degisen_ortalama = Column(Integer)
+    hasarli_ortalama = Column(Integer)
+    veri_tarihi = Column(DateTime, nullable=False)
+    aktif = Column(Boolean, nullable=False, default=True)
+
+
+class TahminIsi(Base):
+    """Kuyruktaki bir detaylı tahmin işi; sonuç ve webhook teslim durumu burada tutulur."""
+    __tablename__ = "tahmin_isleri"
+
+    id = Column(String(32), primary_key=True)
+    # bekliyor -> calisiyor -> tamamlandi | basarisiz
+    durum = Column(String(20), nullable=False, default="bekliyor")
+    oncelik = Column(Integer, nullable=False, default=0)
+    yuk = Column(Text, nullable=False)
+    sonuc = Column(Text)
+    hata = Column(Text)
+    deneme = Column(Integer, nullable=False, default=0)
+    webhook_url = Column(String(2000))
+    webhook_durumu = Column(String(20))
+    olusturma = Column(DateTime, nullable=False, default=datetime.utcnow)
+    baslama = Column(DateTime)
+    bitis = Column(DateTime)
+    # Çalışan işi alan işçinin kirası; süresi dolarsa (işçi çöktüyse) iş yeniden alınabilir
+    kira_bitis = Column(DateTime)
+
+    __table_args__ = (
+        # Sıradaki işi (en yüksek öncelik, en eski) indeksle bulur
+        Index("ix_tahmin_isleri_kuyruk", "durum", oncelik.desc(), "olusturma"),
+    )
+
+
+def init_db() -> None:
+    """Tabloları ve indeksleri (yoksa) oluşturur."""
+    Base.metadata.create_all(bind=engine)
+
+
+def get_db():
+    """İstek başına bir oturum açıp kapatan bağımlılık."""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _satir_hazirla(veri: Dict) -> Dict:
+    satir = {
+        "kaynak": veri.get("kaynak", "unknown"),
+        "marka": veri["marka"],
+        "model": veri["model"],
+        "yil": veri["yil"],
+        "veri_tarihi": veri.get("veri_tarihi") or datetime.utcnow(),
+        "aktif": veri.get("aktif", True),
+    }
+    for sutun in DEGER_SUTUNLARI:
+        satir[sutun] = veri.get(sutun)
+    if satir["ilan_sayisi"] is None:
+        satir["ilan_sayisi"] = 0
+    return satir
+
+
+def _insert_fonksiyonu(db: Session):
+    lehce = db.get_bind().dialect.name
+    if lehce == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif lehce == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
+
+
+# Geçmiş tablosundaki benzersiz anlık görüntü anahtarı
+ANLIK_ANAHTAR = ("kaynak", "marka", "model", "yil", "veri_tarihi")
+
+
+def _tekillestir(satirlar: Iterable[Dict]) -> List[Dict]:
+    """Aynı anlık görüntü bir toplu yazımda birden fazla kez varsa sonuncusunu bırakır."""
+    return list({tuple(satir[s] for s in ANLIK_ANAHTAR): satir for satir in satirlar}.values())
+
+
+def _en_yeniler(satirlar: Iterable[Dict]) -> List[Dict]:
+    """Aynı araç için birden fazla satır varsa yalnızca en yenisini bırakır."""
+    en_yeni: Dict[Tuple[str, str, int], Dict] = {}
+    for satir in satirlar:
+        anahtar = (satir["marka"], satir["model"], satir["yil"])
+        mevcut = en_yeni.get(anahtar)
+        if mevcut is None or satir["veri_tarihi"] >= mevcut["veri_tarihi"]:
+            en_yeni[anahtar] = satir
+    return list(en_yeni.values())
+
+
+def _guncel_yeniden_hesapla(db: Session, anahtarlar: Iterable[Tuple[str, str, int]]) -> None:
+    """Verilen araçların güncel satırını geçmişteki en yeni aktif görüntüden kurar;
+    aktif görüntü kalmadıysa güncel satırı siler (`rebuild_latest_market_data` ile aynı seçim)."""
+    for marka, model, yil in anahtarlar:
+        en_yeni = db.scalars(
+            select(PazarVerisi)
+            .where(PazarVerisi.marka == marka, PazarVerisi.model == model, PazarVerisi.yil == yil,
+                   PazarVerisi.aktif.is_(True))
+            .order_by(PazarVerisi.veri_tarihi.desc(), PazarVerisi.id.desc())
+            .limit(1)
+        ).first()
+        mevcut = db.get(GuncelPazarVerisi, (marka, model, yil))
+        if en_yeni is None:
+            if mevcut is not None:
+                db.delete(mevcut)
+            continue
+        db.merge(GuncelPazarVerisi(
+            marka=marka, model=model, yil=yil, kaynak=en_yeni.kaynak, veri_tarihi=en_yeni.veri_tarihi,
+            aktif=True, **{s: getattr(en_yeni, s) for s in DEGER_SUTUNLARI},
+        ))
+
+
+def _gecmise_birlestir(db: Session, satirlar: List[Dict]) -> None:
+    """ON CONFLICT desteklemeyen veritabanları için: var olan görüntüyü günceller, yoksa ekler."""
+    for satir in satirlar:
+        mevcut = db.scalars(
+            select(PazarVerisi).filter_by(**{s: satir[s] for s in ANLIK_ANAHTAR})
+        ).one_or_none()
+        if mevcut is None:
+            db.add(PazarVerisi(**satir))
+            continue
+        for sutun in DEGER_SUTUNLARI + ("aktif",):
+            setattr(mevcut, sutun, satir[sutun])
+    db.flush()
+
+
+def bulk_upsert_market_data(db: Session, kayitlar: Iterable[Dict], parca_boyutu: int = 1000) -> int:
+    """Çok sayıda pazar verisi anlık görüntüsünü tek işlemde yazar.
+
+    Geçmiş tablosuna (kaynak, marka, model, yil, veri_tarihi) anahtarıyla
+    upsert yapılır. Güncel tablo, `rebuild_latest_market_data` ile aynı
+    sonucu verecek şekilde her aracın en yeni aktif görüntüsünü tutar:
+    aktif görüntüler yalnızca daha yeniyse yazılır, pasif bir görüntü
+    gelen araçların güncel satırı geçmişten yeniden kurulur. Yazılan satır
+    sayısını döndürür.
+    """
+    satirlar = _tekillestir(_satir_hazirla(k) for k in kayitlar)
+    if not satirlar:
+        return 0
+
+    # Pasifleşen görüntü güncel satır olabilir; bu araçlarda eski aktif görüntüye dönülür
+    pasif_araclar = {(s["marka"], s["model"], s["yil"]) for s in satirlar if not s["aktif"]}
+    insert = _insert_fonksiyonu(db)
+    try:
+        if insert is None:
+            _gecmise_birlestir(db, satirlar)
+            _guncel_yeniden_hesapla(db, {(s["marka"], s["model"], s["yil"]) for s in satirlar})
+        else:
+            for baslangic in range(0, len(satirlar), parca_boyutu):
+                parca = satirlar[baslangic:baslangic + parca_boyutu]
+                gecmis = insert(PazarVerisi)
+                db.execute(
+                    gecmis.on_conflict_do_update(
+                        index_elements=["kaynak", "marka", "model", "yil", "veri_tarihi"],
+                        set_={s: gecmis.excluded[s] for s in DEGER_SUTUNLARI + ("aktif",)},
+                    ),
+                    parca,
+                )
+
+            guncel = insert(GuncelPazarVerisi)
+            en_yeniler = _en_yeniler(
+                s for s in satirlar if s["aktif"] and (s["marka"], s["model"], s["yil"]) not in pasif_araclar
+            )
+            for baslangic in range(0, len(en_yeniler), parca_boyutu):
+                db.execute(
+                    guncel.on_conflict_do_update(
+                        index_elements=["marka", "model", "yil"],
+                        set_={
+                            s: guncel.excluded[s]
+                            for s in DEGER_SUTUNLARI + ("kaynak", "veri_tarihi", "aktif")
+                        },
+                        where=GuncelPazarVerisi.veri_tarihi <= guncel.excluded.veri_tarihi,
+                    ),
+                    en_yeniler[baslangic:baslangic + parca_boyutu],
+                )
+            _guncel_yeniden_hesapla(db, pasif_araclar)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(satirlar)
+
+
+def rebuild_latest_market_data(db: Session) -> None:
+    """Güncel tabloyu geçmiş tablosundan (aktif kayıtlar üzerinden) yeniden oluşturur."""
+    sutunlar = ", ".join(("marka", "model", "yil", "kaynak") + DEGER_SUTUNLARI + ("veri_tarihi", "aktif"))
+    try:
+        db.execute(text(f"DELETE FROM {GuncelPazarVerisi.__tablename__}"))
+        db.execute(text(f"""
+            INSERT INTO {GuncelPazarVerisi.__tablename__} ({sutunlar})
+            SELECT {sutunlar} FROM (
+                SELECT *, ROW_NUMBER() OVER (
+                    PARTITION BY marka, model, yil ORDER BY veri_tarihi DESC, id DESC
+                ) AS sira
+                FROM {PazarVerisi.__tablename__}
+                WHERE aktif = :aktif
+            ) AS siralanmis
+            WHERE sira = 1
+        """), {"aktif": True})
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
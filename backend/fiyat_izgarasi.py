@@ -0,0 +1,295 @@
+"""Fiyat Izgarası
+
+Fiyat endeksindeki popüler modeller için (marka/model, yıl, kilometre,
+yakıt tipi, vites tipi, il) ızgarasında önceden hesaplanmış min/ortalama/max
+fiyatları tutan sütunlu ikili dosya. Dosya çevrimdışı bir işle üretilir
+(`python fiyat_izgarasi.py --kaynak yerel`), API onu bellek eşlemeli (mmap)
+açar. Bir sorgu yalnızca indeks aritmetiği ve iki kilometre noktası
+arasındaki doğrusal aradeğerlemedir; LLM çağrısı yapılmaz ve dosyanın
+sayfaları işletim sistemi önbelleğinde tüm işçiler arasında paylaşılır.
+
+Dosya biçimi: 8 baytlık imza, 4 baytlık başlık uzunluğu, JSON başlık
+(eksenler, kaynak, oluşturma zamanı), 64 bayta hizalama dolgusu ve ardından
+her biri ızgara boyutunda üç int32 sütun (min, ortalama, max).
+"""
+
+import argparse
+import asyncio
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from web_scraper import PRICE_INDEX, normalize_name
+
+IMZA = b"FIQIZG01"
+HIZALAMA = 64
+SUTUNLAR = ("min", "ortalama", "max")
+# Kategorik eksenlerde her değeri karşılayan joker değer
+JOKER = "*"
+
+VARSAYILAN_YOL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "fiyat_izgarasi.bin")
+VARSAYILAN_YIL_SAYISI = 26
+VARSAYILAN_KM_ADIMI = 10000
+VARSAYILAN_KM_NOKTASI = 41
+
+Fiyatlar = Tuple[int, int, int]
+# Bir ızgara noktası için (marka, model, yil, kilometre, yakit, vites, il) -> (min, ortalama, max)
+IzgaraKaynagi = Callable[[str, str, int, int, str, str, str], Awaitable[Fiyatlar]]
+
+
+def _kategori(deger: str) -> str:
+    return JOKER if deger == JOKER else normalize_name(str(deger))
+
+
+class FiyatIzgarasi:
+    """Bellek eşlemeli fiyat ızgarası; `ara` sabit sürede (min, ortalama, max) döndürür."""
+
+    def __init__(self, yol: str):
+        with open(yol, "rb") as f:
+            on_ek = f.read(len(IMZA) + 4)
+            if len(on_ek) < len(IMZA) + 4 or on_ek[:len(IMZA)] != IMZA:
+                raise ValueError(f"{yol} bir fiyat ızgarası dosyası değil")
+            (baslik_uzunlugu,) = struct.unpack("<I", on_ek[len(IMZA):])
+            self.baslik = json.loads(f.read(baslik_uzunlugu).decode("utf-8"))
+
+        b = self.baslik
+        self.yol = yol
+        self.kaynak = b["kaynak"]
+        self.olusturma = datetime.fromisoformat(b["olusturma"])
+        self.modeller = {tuple(m): i for i, m in enumerate(b["modeller"])}
+        self.ilk_yil = b["ilk_yil"]
+        self.km_adimi = b["km_adimi"]
+        self.yakitlar = {d: i for i, d in enumerate(b["yakit_tipleri"])}
+        self.vitesler = {d: i for i, d in enumerate(b["vites_tipleri"])}
+        self.iller = {d: i for i, d in enumerate(b["iller"])}
+        self.sekil = (len(b["modeller"]), b["yil_sayisi"], b["km_noktasi"],
+                      len(self.yakitlar), len(self.vitesler), len(self.iller))
+        self.boyut = int(np.prod(self.sekil))
+        # C sırasındaki adımlar: düz indeks = sum(indeks * adim)
+        self.adimlar = tuple(int(np.prod(self.sekil[i + 1:])) for i in range(len(self.sekil)))
+        if sys.byteorder != "little":
+            raise ValueError("Izgara dosyası little-endian int32 sütunlar içerir")
+        # Salt okunur eşleme: sayfalar aynı dosyayı açan tüm işçiler arasında paylaşılır
+        with open(yol, "rb") as f:
+            self._eslem = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        bitis = b["veri_baslangici"] + len(SUTUNLAR) * self.boyut * 4
+        if len(self._eslem) < bitis:
+            raise ValueError(f"{yol} eksik yazılmış")
+        self._veri = memoryview(self._eslem)[b["veri_baslangici"]:bitis].cast("i")
+        self.isabet = 0
+        self.iska = 0
+
+    @classmethod
+    def yukle(cls, yol: str, max_gun: float = 0) -> Optional["FiyatIzgarasi"]:
+        """Dosyayı açar; yoksa, okunamıyorsa ya da bayatsa None döndürür."""
+        if not yol or not os.path.exists(yol):
+            return None
+        try:
+            izgara = cls(yol)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Fiyat ızgarası yüklenemedi ({yol}): {e}")
+            return None
+        simdi = datetime.now()
+        # Yaşa bağlı değer kaybı takvim yılına göre hesaplandığından yıl değişince ızgara da bayatlar
+        if izgara.olusturma.year != simdi.year or (max_gun and (simdi - izgara.olusturma).days > max_gun):
+            print(f"Fiyat ızgarası bayat ({izgara.olusturma:%Y-%m-%d}), kullanılmıyor: {yol}")
+            return None
+        print(f"Fiyat ızgarası yüklendi: {len(izgara.modeller)} model, {izgara.boyut} nokta ({izgara.kaynak}).")
+        return izgara
+
+    @staticmethod
+    def _eksen(eksen: Dict[str, int], deger: str) -> Optional[int]:
+        indeks = eksen.get(_kategori(deger))
+        return eksen.get(JOKER) if indeks is None else indeks
+
+    def ara(self, marka: str, model: str, yil: int, kilometre: int,
+            yakit_tipi: str, vites_tipi: str, il: str) -> Optional[Fiyatlar]:
+        """Izgaradaki (min, ortalama, max) fiyatlar; ızgaranın dışındaki araçlar için None."""
+        m = self.modeller.get(PRICE_INDEX.canonical_key(marka, model))
+        y = yil - self.ilk_yil
+        konum = kilometre / self.km_adimi
+        yk = self._eksen(self.yakitlar, yakit_tipi)
+        v = self._eksen(self.vitesler, vites_tipi)
+        i = self._eksen(self.iller, il)
+        if (m is None or yk is None or v is None or i is None
+                or not 0 <= y < self.sekil[1] or not 0 <= konum <= self.sekil[2] - 1):
+            self.iska += 1
+            return None
+
+        k = min(int(konum), self.sekil[2] - 2)
+        oran = konum - k
+        a = self.adimlar
+        ofset = m * a[0] + y * a[1] + k * a[2] + yk * a[3] + v * a[4] + i * a[5]
+        veri = self._veri
+        fiyatlar = []
+        for sutun in range(len(SUTUNLAR)):
+            alt = veri[sutun * self.boyut + ofset]
+            ust = veri[sutun * self.boyut + ofset + a[2]]
+            fiyatlar.append(int(round(alt + (ust - alt) * oran)))
+        self.isabet += 1
+        return tuple(fiyatlar)
+
+    def istatistikler(self) -> dict:
+        toplam = self.isabet + self.iska
+        return {
+            "kaynak": self.kaynak,
+            "olusturma": self.olusturma.isoformat(timespec="seconds"),
+            "model_sayisi": len(self.modeller),
+            "nokta_sayisi": self.boyut,
+            "boyut_bayt": self._veri.nbytes,
+            "isabet": self.isabet,
+            "iska": self.iska,
+            "isabet_orani": round(self.isabet / toplam, 4) if toplam else 0.0,
+        }
+
+
+async def yerel_kaynak(marka, model, yil, kilometre, yakit_tipi, vites_tipi, il) -> Fiyatlar:
+    """Kural tabanlı yerel motorun hızlı tahmini."""
+    from yerel_tahmin import yerel_motor
+
+    sonuc = yerel_motor.hizli(SimpleNamespace(
+        marka=marka, model=model, yil=yil, kilometre=kilometre,
+        yakit_tipi=yakit_tipi, vites_tipi=vites_tipi, il=il,
+    ))
+    return sonuc["tahmini_fiyat_min"], sonuc["ortalama_fiyat"], sonuc["tahmini_fiyat_max"]
+
+
+def pazar_kaynagi() -> IzgaraKaynagi:
+    """Pazar verisi (SCRAPING_ENABLED ise toplanan ilanlar, değilse fiyat modeli).
+
+    Hasarsız fiyat aralığı her (model, yıl) için bir kez alınır ve yerel
+    motorun kilometre çarpanıyla ölçeklenir.
+    """
+    from web_scraper import scraper
+    from yerel_tahmin import kilometre_carpani
+
+    veriler: Dict[Tuple[str, str, int], Fiyatlar] = {}
+
+    async def kaynak(marka, model, yil, kilometre, yakit_tipi, vites_tipi, il) -> Fiyatlar:
+        if (marka, model, yil) not in veriler:
+            veri = await scraper.get_depreciation_data_by_damage(marka, model, yil)
+            ortalama = veri.get("hasarsiz_ortalama") or veri["ortalama_fiyat"]
+            oran = ortalama / veri["ortalama_fiyat"] if veri["ortalama_fiyat"] else 1.0
+            veriler[(marka, model, yil)] = (
+                int(veri["minimum_fiyat"] * oran), int(ortalama), int(veri["maksimum_fiyat"] * oran)
+            )
+        carpan = kilometre_carpani(yil, kilometre)
+        return tuple(int(f * carpan) for f in veriler[(marka, model, yil)])
+
+    return kaynak
+
+
+KAYNAKLAR = {"yerel": lambda: yerel_kaynak, "pazar": pazar_kaynagi}
+
+
+async def izgara_olustur(
+    yol: str,
+    kaynak: IzgaraKaynagi,
+    kaynak_adi: str,
+    modeller: Optional[Sequence[Tuple[str, str]]] = None,
+    ilk_yil: Optional[int] = None,
+    yil_sayisi: int = VARSAYILAN_YIL_SAYISI,
+    km_adimi: int = VARSAYILAN_KM_ADIMI,
+    km_noktasi: int = VARSAYILAN_KM_NOKTASI,
+    yakit_tipleri: Sequence[str] = (JOKER,),
+    vites_tipleri: Sequence[str] = (JOKER,),
+    iller: Sequence[str] = (JOKER,),
+) -> int:
+    """Izgaradaki her nokta için kaynağı çağırıp dosyayı yazar; nokta sayısını döndürür.
+
+    Kaynağın kullanmadığı kategorik eksenler `*` olarak bırakılırsa dosya
+    küçük kalır; bu eksenlerde her değer jokere düşer.
+    """
+    if km_noktasi < 2:
+        raise ValueError("En az iki kilometre noktası gerekir")
+    modeller = sorted(set(modeller or PRICE_INDEX.canonical_names.values()))
+    if ilk_yil is None:
+        ilk_yil = datetime.now().year - yil_sayisi + 1
+    yakit_tipleri = [_kategori(d) for d in yakit_tipleri]
+    vites_tipleri = [_kategori(d) for d in vites_tipleri]
+    iller = [_kategori(d) for d in iller]
+
+    sekil = (len(modeller), yil_sayisi, km_noktasi, len(yakit_tipleri), len(vites_tipleri), len(iller))
+    sutunlar = np.zeros((len(SUTUNLAR),) + sekil, dtype="<i4")
+    for indeks in np.ndindex(*sekil):
+        m, y, k, yk, v, i = indeks
+        fiyatlar = await kaynak(*modeller[m], ilk_yil + y, k * km_adimi,
+                                yakit_tipleri[yk], vites_tipleri[v], iller[i])
+        for sutun, fiyat in enumerate(fiyatlar):
+            sutunlar[(sutun,) + indeks] = fiyat
+
+    baslik = {
+        "surum": 1,
+        "kaynak": kaynak_adi,
+        "olusturma": datetime.now().isoformat(timespec="seconds"),
+        "sutunlar": list(SUTUNLAR),
+        "modeller": [list(m) for m in modeller],
+        "ilk_yil": ilk_yil,
+        "yil_sayisi": yil_sayisi,
+        "km_adimi": km_adimi,
+        "km_noktasi": km_noktasi,
+        "yakit_tipleri": yakit_tipleri,
+        "vites_tipleri": vites_tipleri,
+        "iller": iller,
+    }
+    # veri_baslangici başlığın kendi uzunluğunu etkilediğinden sabit genişlikte yazılır
+    baslik["veri_baslangici"] = 0
+    baslik_uzunlugu = len(json.dumps(baslik).encode("utf-8")) + 10
+    veri_baslangici = -(-(len(IMZA) + 4 + baslik_uzunlugu) // HIZALAMA) * HIZALAMA
+    baslik["veri_baslangici"] = veri_baslangici
+    baslik_baytlari = json.dumps(baslik).encode("utf-8").ljust(baslik_uzunlugu)
+
+    # Yarım yazılmış bir dosya okunmasın diye önce geçici dosyaya yazılır
+    gecici = f"{yol}.{os.getpid()}.tmp"
+    with open(gecici, "wb") as f:
+        f.write(IMZA + struct.pack("<I", len(baslik_baytlari)) + baslik_baytlari)
+        f.write(b"\0" * (veri_baslangici - f.tell()))
+        f.write(sutunlar.tobytes())
+    os.replace(gecici, yol)
+    return int(np.prod(sekil))
+
+
+def _liste(deger: str) -> List[str]:
+    return [d.strip() for d in deger.split(",") if d.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fiyat ızgarası dosyasını üretir.")
+    parser.add_argument("--kaynak", choices=sorted(KAYNAKLAR), default="yerel")
+    parser.add_argument("--cikti", default=os.getenv("FIYAT_IZGARASI_DOSYASI") or VARSAYILAN_YOL)
+    parser.add_argument("--yil-sayisi", type=int, default=VARSAYILAN_YIL_SAYISI)
+    parser.add_argument("--km-adimi", type=int, default=VARSAYILAN_KM_ADIMI)
+    parser.add_argument("--km-noktasi", type=int, default=VARSAYILAN_KM_NOKTASI)
+    parser.add_argument("--yakit-tipleri", type=_liste, default=[JOKER])
+    parser.add_argument("--vites-tipleri", type=_liste, default=[JOKER])
+    parser.add_argument("--iller", type=_liste, default=[JOKER])
+    args = parser.parse_args()
+
+    async def olustur() -> int:
+        from web_scraper import scraper
+
+        try:
+            return await izgara_olustur(
+                args.cikti, KAYNAKLAR[args.kaynak](), args.kaynak,
+                yil_sayisi=args.yil_sayisi, km_adimi=args.km_adimi, km_noktasi=args.km_noktasi,
+                yakit_tipleri=args.yakit_tipleri, vites_tipleri=args.vites_tipleri, iller=args.iller,
+            )
+        finally:
+            await scraper.close()
+
+    baslangic = time.perf_counter()
+    nokta = asyncio.run(olustur())
+    print(f"{args.cikti}: {nokta} nokta, {os.path.getsize(args.cikti)} bayt, "
+          f"{time.perf_counter() - baslangic:.1f} sn")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Gunicorn settings for serving main:app with uvicorn workers
+Usage: gunicorn -c gunicorn_conf.py main:app
+
+The worker count is derived from the CPUs this process may actually use
+(scheduler affinity and the cgroup CPU quota of a container), not from the
+host's core count. WEB_CONCURRENCY overrides it and is exported so the app
+can split per-process limits (the LLM quota with PAYLASIMLI_DURUM=bellek)
+across workers. Use PAYLASIMLI_DURUM=redis when running more than one
+worker so caches, single-flight locks and the LLM quota are shared.
+"""
+
+import math
+import os
+
+
+def usable_cpus() -> float:
+    """CPUs available to this process, honouring affinity and cgroup v2/v1 quotas"""
+    try:
+        cpus = float(len(os.sched_getaffinity(0)))
+    except AttributeError:
+        cpus = float(os.cpu_count() or 1)
+
+    quota = None
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            limit, period = f.read().split()
+        if limit != 'max':
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+                limit = int(f.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    return min(cpus, quota) if quota else cpus
+
+
+def worker_count() -> int:
+    if os.getenv('WEB_CONCURRENCY'):
+        return max(1, int(os.getenv('WEB_CONCURRENCY')))
+    # Workers are async and mostly wait on Gemini, so one per core keeps every
+    # core busy; a fractional quota is rounded up to use the partial core
+    per_core = float(os.getenv('WORKERS_PER_CORE', '1'))
+    count = max(int(os.getenv('MIN_WORKERS', '1')), math.ceil(usable_cpus() * per_core))
+    max_workers = int(os.getenv('MAX_WORKERS', '0'))
+    return min(count, max_workers) if max_workers > 0 else count
+
+
+workers = worker_count()
+# Inherited by the forked workers; read by paylasimli_durum.isci_sayisi
+os.environ['WEB_CONCURRENCY'] = str(workers)
+
+worker_class = 'uvicorn.workers.UvicornWorker'
+bind = os.getenv('BIND', f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}")
+# Detailed estimates can take LLM_ZAMAN_ASIMI_DETAYLI (45s) plus retries
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+# Recycle workers periodically so a slow leak cannot grow without bound
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '0'))
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info').lower()
+
+
+def on_starting(server):
+    shared = os.getenv('PAYLASIMLI_DURUM', 'bellek').strip().lower()
+    server.log.info(f"Starting {workers} uvicorn worker(s) on {usable_cpus():g} usable CPU(s), shared state: {shared}")
+    if workers > 1 and shared == 'bellek':
+        server.log.warning(
+            'PAYLASIMLI_DURUM=bellek with several workers: estimate caches and '
+            'single-flight are per worker and the LLM quota is split evenly between them'
+        )
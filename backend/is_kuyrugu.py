@@ -0,0 +1,529 @@
+"""İş Kuyruğu
+
+`/detayli-tahmin` iki LLM çağrısı bitene kadar bağlantıyı açık tutar. İş
+modunda istek kuyruğa yazılır ve hemen bir iş kimliği döner; sınırlı sayıda
+işçi işleri öncelik sırasıyla alıp işler, istemci sonucu `/isler/{id}` ile
+sorgular ya da webhook ile alır. Böylece açık bağlantı sayısı LLM eş
+zamanlılığından ayrılır: aynı anda en fazla `isci_sayisi` iş işlenir, fazlası
+kuyrukta bekler ve bekleyen iş sayısı üst sınıra ulaşınca yeni işler
+reddedilir.
+
+İşler veritabanında (`TahminIsi`) tutulduğundan süreç yeniden başlasa da
+kaybolmaz ve aynı veritabanını kullanan tüm işçi süreçleri ortak kuyruktan
+iş alır. Bir iş kira süresiyle alınır; işleyen süreç çökerse kira dolunca iş
+yeniden kuyruğa döner.
+
+Webhook adresleri sunucunun kendi ağına istek attırmak için kullanılamaz:
+`webhook_izinli_hostlar` verildiyse yalnızca bu hostlara, verilmediyse yalnızca
+genel (iç ağ, loopback, link-local olmayan) adreslere çözümlenen hostlara
+gönderilir. Adres hem iş alınırken hem de bağlantı kurulurken denetlenir.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+from sqlalchemy import and_, delete, func, or_, select, update
+
+from database import SessionLocal, TahminIsi
+from metrikler import IS_BEKLEME_SURESI, IS_TOPLAM, IS_WEBHOOK
+
+BITMIS_DURUMLAR = ("tamamlandi", "basarisiz")
+
+
+class KuyrukDolu(Exception):
+    """Bekleyen iş sayısı üst sınırda; istemci daha sonra tekrar denemeli."""
+
+
+class IsBulunamadi(KeyError):
+    """İş yok ya da saklama süresi dolduğu için silinmiş."""
+
+
+class GecersizWebhook(ValueError):
+    """Webhook adresi izinli değil, iç ağa çözümleniyor ya da çözümlenemiyor."""
+
+
+def _ic_adres(adres: str) -> bool:
+    """Loopback, özel ağ, link-local, ayrılmış ve çok noktaya yayın adresleri."""
+    ip = ipaddress.ip_address(adres.split("%")[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return not ip.is_global or ip.is_multicast
+
+
+class _WebhookCozumleyici(AbstractResolver):
+    """Webhook bağlantılarında iç adreslere çözümlenen hostları reddeder.
+
+    Denetim bağlantı anında yapıldığından iş alınırken genel adrese, teslimatta
+    iç adrese çözümlenen (DNS rebinding) hostlar da engellenir. İzinli hostlar
+    denetlenmez.
+    """
+
+    def __init__(self, izinli_hostlar: frozenset):
+        self.izinli_hostlar = izinli_hostlar
+        self._cozumleyici = aiohttp.ThreadedResolver()
+
+    async def resolve(self, host: str, port: int = 0, family: socket.AddressFamily = socket.AF_INET) -> List[Dict[str, Any]]:
+        adresler = await self._cozumleyici.resolve(host, port, family)
+        if host.lower() not in self.izinli_hostlar and any(_ic_adres(a["host"]) for a in adresler):
+            # OSError, aiohttp'de bağlantı hatasına çevrilir
+            raise OSError(f"Webhook hostu iç ağ adresine çözümleniyor: {host}")
+        return adresler
+
+    async def close(self) -> None:
+        await self._cozumleyici.close()
+
+
+def _tarih(deger: Optional[datetime]) -> Optional[str]:
+    return deger.isoformat(timespec="seconds") if deger else None
+
+
+def _is_sozlugu(db, kayit: TahminIsi) -> Dict[str, Any]:
+    """Kaydı API'nin döndürdüğü iş durumuna çevirir; bekleyen işlere sıra eklenir."""
+    sira = None
+    if kayit.durum == "bekliyor":
+        # Önündeki işler: daha yüksek öncelikli ya da aynı öncelikte daha eski olanlar
+        sira = db.scalar(
+            select(func.count()).select_from(TahminIsi).where(
+                TahminIsi.durum == "bekliyor",
+                or_(
+                    TahminIsi.oncelik > kayit.oncelik,
+                    and_(TahminIsi.oncelik == kayit.oncelik, TahminIsi.olusturma < kayit.olusturma),
+                ),
+            )
+        )
+    return {
+        "is_id": kayit.id,
+        "durum": kayit.durum,
+        "oncelik": kayit.oncelik,
+        "sira": sira,
+        "deneme": kayit.deneme,
+        "olusturma": _tarih(kayit.olusturma),
+        "baslama": _tarih(kayit.baslama),
+        "bitis": _tarih(kayit.bitis),
+        "sonuc": json.loads(kayit.sonuc) if kayit.sonuc else None,
+        "hata": kayit.hata,
+        "webhook_durumu": kayit.webhook_durumu,
+    }
+
+
+def _bekleyen_sayisi(db) -> int:
+    return db.scalar(select(func.count()).select_from(TahminIsi).where(TahminIsi.durum == "bekliyor"))
+
+
+class IsKuyrugu:
+    """Veritabanı destekli, öncelikli ve sınırlı işçili iş kuyruğu.
+
+    `isleyici` işin yükünü (JSON'a çevrilebilir sözlük) alıp sonucu (yine
+    sözlük) döndürür. Veritabanı işlemleri olay döngüsünü bekletmemek için
+    ayrı iş parçacığında yapılır.
+    """
+
+    def __init__(
+        self,
+        isleyici: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        isci_sayisi: int = 4,
+        max_bekleyen: int = 1000,
+        zaman_asimi: float = 120,
+        max_deneme: int = 3,
+        saklama_suresi: float = 86400,
+        yoklama_araligi: float = 1.0,
+        bakim_araligi: float = 30.0,
+        webhook_deneme: int = 3,
+        webhook_zaman_asimi: float = 10,
+        webhook_geri_cekilme: float = 1.0,
+        webhook_sirri: Optional[str] = None,
+        webhook_izinli_hostlar: Iterable[str] = (),
+    ):
+        self.isleyici = isleyici
+        self.isci_sayisi = isci_sayisi
+        self.max_bekleyen = max_bekleyen
+        self.zaman_asimi = zaman_asimi
+        self.max_deneme = max_deneme
+        self.saklama_suresi = saklama_suresi
+        # Kira, zaman aşımından biraz uzun tutulur; süren bir iş başka işçiye geçmez
+        self.kira_suresi = zaman_asimi + 30
+        self.yoklama_araligi = yoklama_araligi
+        self.bakim_araligi = bakim_araligi
+        self.webhook_deneme = webhook_deneme
+        self.webhook_zaman_asimi = webhook_zaman_asimi
+        self.webhook_geri_cekilme = webhook_geri_cekilme
+        self.webhook_sirri = webhook_sirri
+        # Boşsa genel adreslere çözümlenen her host kabul edilir
+        self.webhook_izinli_hostlar = frozenset(h.strip().lower() for h in webhook_izinli_hostlar if h.strip())
+
+        self._gorevler: list = []
+        self._webhooklar: set = set()
+        self._oturum: Optional[aiohttp.ClientSession] = None
+        self._uyandir: Optional[asyncio.Event] = None
+        self._durduruluyor = False
+        # İşlenmekte olan iş kimliği -> (başlangıç zamanı (monotonic), deneme)
+        self._aktif: Dict[str, Tuple[float, int]] = {}
+        self._baslangic: Optional[float] = None
+        self.mesgul_sure = 0.0
+        # Son bilinen bekleyen iş sayısı; her ekleme, alma ve bakımda güncellenir
+        self.derinlik = 0
+        self.kabul = 0
+        self.reddedilen = 0
+        self.tamamlanan = 0
+        self.basarisiz = 0
+        self.geri_alinan = 0
+        self.webhook_teslim = 0
+        self.webhook_basarisiz = 0
+
+    # --- Veritabanı işlemleri (iş parçacığında çalışır) ---
+
+    def _ekle(self, kayit: TahminIsi) -> Tuple[Optional[Dict[str, Any]], int]:
+        with SessionLocal() as db:
+            bekleyen = _bekleyen_sayisi(db)
+            if self.max_bekleyen and bekleyen >= self.max_bekleyen:
+                return None, bekleyen
+            db.add(kayit)
+            db.commit()
+            return _is_sozlugu(db, kayit), bekleyen + 1
+
+    def _sahiplen(self) -> Tuple[Optional[Dict[str, Any]], int]:
+        """Sıradaki işi kirayla alır; başka bir süreç aynı işi önce aldıysa sonrakini dener."""
+        with SessionLocal() as db:
+            while True:
+                aday = db.scalar(
+                    select(TahminIsi.id)
+                    .where(TahminIsi.durum == "bekliyor")
+                    .order_by(TahminIsi.oncelik.desc(), TahminIsi.olusturma)
+                    .limit(1)
+                )
+                if aday is None:
+                    return None, 0
+                simdi = datetime.utcnow()
+                alindi = db.execute(
+                    update(TahminIsi)
+                    .where(TahminIsi.id == aday, TahminIsi.durum == "bekliyor")
+                    .values(
+                        durum="calisiyor",
+                        baslama=simdi,
+                        kira_bitis=simdi + timedelta(seconds=self.kira_suresi),
+                        deneme=TahminIsi.deneme + 1,
+                    )
+                ).rowcount
+                db.commit()
+                if alindi:
+                    kayit = db.get(TahminIsi, aday)
+                    return {
+                        "id": kayit.id,
+                        "yuk": json.loads(kayit.yuk),
+                        "deneme": kayit.deneme,
+                        "webhook_url": kayit.webhook_url,
+                        "bekleme": (simdi - kayit.olusturma).total_seconds(),
+                    }, _bekleyen_sayisi(db)
+
+    def _bitir(
+        self, is_id: str, deneme: int, sonuc: Optional[Dict[str, Any]], hata: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        """Sonucu yazar; kira dolup iş başka bir işçiye geçtiyse yazmaz ve None döndürür."""
+        with SessionLocal() as db:
+            yazildi = db.execute(
+                update(TahminIsi)
+                .where(TahminIsi.id == is_id, TahminIsi.durum == "calisiyor", TahminIsi.deneme == deneme)
+                .values(
+                    durum="basarisiz" if hata else "tamamlandi",
+                    sonuc=json.dumps(sonuc, ensure_ascii=False) if sonuc is not None else None,
+                    hata=hata,
+                    bitis=datetime.utcnow(),
+                    kira_bitis=None,
+                )
+            ).rowcount
+            db.commit()
+            return _is_sozlugu(db, db.get(TahminIsi, is_id)) if yazildi else None
+
+    def _al(self, is_id: str) -> Optional[Dict[str, Any]]:
+        with SessionLocal() as db:
+            kayit = db.get(TahminIsi, is_id)
+            return _is_sozlugu(db, kayit) if kayit is not None else None
+
+    def _webhook_durumu_yaz(self, is_id: str, durum: str) -> None:
+        with SessionLocal() as db:
+            db.execute(update(TahminIsi).where(TahminIsi.id == is_id).values(webhook_durumu=durum))
+            db.commit()
+
+    def _geri_birak(self, isler: List[Tuple[str, int]]) -> None:
+        """Kapanışta yarıda kalan işleri beklemeye döndürür; deneme hakkı harcanmaz.
+        Kirası dolup başka işçiye geçmiş işlere dokunulmaz."""
+        with SessionLocal() as db:
+            db.execute(
+                update(TahminIsi)
+                .where(
+                    TahminIsi.durum == "calisiyor",
+                    or_(*(and_(TahminIsi.id == is_id, TahminIsi.deneme == deneme) for is_id, deneme in isler)),
+                )
+                .values(durum="bekliyor", baslama=None, kira_bitis=None, deneme=TahminIsi.deneme - 1)
+            )
+            db.commit()
+
+    def _bakim(self) -> Tuple[int, int, List[Tuple[str, Dict[str, Any]]]]:
+        """Kirası dolan işleri kuyruğa döndürür (deneme hakkı bittiyse başarısız sayar)
+        ve saklama süresini aşan bitmiş işleri siler. Başarısız sayılan işlerden
+        webhook'u olanların (adres, durum) çiftlerini de döndürür."""
+        simdi = datetime.utcnow()
+        with SessionLocal() as db:
+            suresi_dolan = and_(TahminIsi.durum == "calisiyor", TahminIsi.kira_bitis < simdi)
+            tukenen = and_(suresi_dolan, TahminIsi.deneme >= self.max_deneme)
+            basarisizlar = []
+            for is_id in db.scalars(select(TahminIsi.id).where(tukenen)).all():
+                # Tek tek güncellenir: işi başka bir süreç de bitirebilir, webhook'u yalnızca güncelleyen gönderir
+                if db.execute(
+                    update(TahminIsi)
+                    .where(TahminIsi.id == is_id, tukenen)
+                    .values(durum="basarisiz", hata="İşçi yanıt vermedi; deneme hakkı doldu.", bitis=simdi,
+                            kira_bitis=None)
+                ).rowcount:
+                    basarisizlar.append(is_id)
+            geri_alinan = db.execute(
+                update(TahminIsi).where(suresi_dolan).values(durum="bekliyor", kira_bitis=None)
+            ).rowcount
+            db.execute(
+                delete(TahminIsi).where(
+                    TahminIsi.durum.in_(BITMIS_DURUMLAR),
+                    TahminIsi.bitis < simdi - timedelta(seconds=self.saklama_suresi),
+                )
+            )
+            db.commit()
+            webhooklar = []
+            for is_id in basarisizlar:
+                kayit = db.get(TahminIsi, is_id)
+                if kayit.webhook_url:
+                    webhooklar.append((kayit.webhook_url, _is_sozlugu(db, kayit)))
+            return geri_alinan, _bekleyen_sayisi(db), webhooklar
+
+    # --- Yaşam döngüsü ---
+
+    def start(self):
+        """İşçileri ve bakım görevini çalışan olay döngüsünde başlatır."""
+        if self._gorevler:
+            return
+        self._uyandir = asyncio.Event()
+        self._durduruluyor = False
+        self._oturum = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(resolver=_WebhookCozumleyici(self.webhook_izinli_hostlar)),
+            timeout=aiohttp.ClientTimeout(total=self.webhook_zaman_asimi),
+        )
+        self._baslangic = time.monotonic()
+        self._gorevler = [asyncio.create_task(self._isci()) for _ in range(self.isci_sayisi)]
+        self._gorevler.append(asyncio.create_task(self._bakim_dongusu()))
+
+    async def stop(self):
+        yarim_kalanlar = [(is_id, deneme) for is_id, (_, deneme) in self._aktif.items()]
+        # wait_for, iç görev aynı anda biterse iptali yutabilir; işçi bayrakla da çıkar
+        self._durduruluyor = True
+        for gorev in self._gorevler + list(self._webhooklar):
+            gorev.cancel()
+        if self._uyandir is not None:
+            self._uyandir.set()
+        await asyncio.gather(*self._gorevler, *self._webhooklar, return_exceptions=True)
+        self._gorevler = []
+        if yarim_kalanlar:
+            await asyncio.to_thread(self._geri_birak, yarim_kalanlar)
+        if self._oturum is not None:
+            await self._oturum.close()
+            self._oturum = None
+
+    # --- İstemci tarafı ---
+
+    async def webhook_dogrula(self, url: str) -> None:
+        """Adres izinli değilse ya da iç ağ adresine çözümleniyorsa `GecersizWebhook` fırlatır."""
+        try:
+            parca = urlsplit(url)
+            host, port = (parca.hostname or "").lower(), parca.port
+        except ValueError as e:
+            raise GecersizWebhook(f"Webhook adresi geçersiz: {e}")
+        if parca.scheme not in ("http", "https") or not host:
+            raise GecersizWebhook("Webhook adresi http(s) ile başlamalı ve bir host içermeli.")
+        if self.webhook_izinli_hostlar:
+            if host not in self.webhook_izinli_hostlar:
+                raise GecersizWebhook(f"Webhook hostuna izin verilmiyor: {host}")
+            return
+        try:
+            bilgiler = await asyncio.get_running_loop().getaddrinfo(host, port or 0, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise GecersizWebhook(f"Webhook hostu çözümlenemedi: {host} ({e})")
+        if any(_ic_adres(bilgi[4][0]) for bilgi in bilgiler):
+            raise GecersizWebhook(f"Webhook hostu iç ağ adresine çözümleniyor: {host}")
+
+    async def gonder(self, yuk: Dict[str, Any], oncelik: int = 0, webhook_url: Optional[str] = None) -> Dict[str, Any]:
+        """İşi kuyruğa yazar ve durumunu döndürür; kuyruk doluysa `KuyrukDolu`,
+        webhook adresi kabul edilmezse `GecersizWebhook` fırlatır."""
+        if webhook_url:
+            await self.webhook_dogrula(webhook_url)
+        kayit = TahminIsi(
+            id=uuid.uuid4().hex,
+            durum="bekliyor",
+            oncelik=oncelik,
+            yuk=json.dumps(yuk, ensure_ascii=False),
+            deneme=0,
+            webhook_url=webhook_url,
+            webhook_durumu="bekliyor" if webhook_url else None,
+            olusturma=datetime.utcnow(),
+        )
+        is_, self.derinlik = await asyncio.to_thread(self._ekle, kayit)
+        if is_ is None:
+            self.reddedilen += 1
+            IS_TOPLAM.artir(sonuc="reddedildi")
+            raise KuyrukDolu(f"Bekleyen iş sayısı üst sınırda ({self.max_bekleyen}).")
+        self.kabul += 1
+        IS_TOPLAM.artir(sonuc="kabul")
+        if self._uyandir is not None:
+            self._uyandir.set()
+        return is_
+
+    async def al(self, is_id: str) -> Dict[str, Any]:
+        is_ = await asyncio.to_thread(self._al, is_id)
+        if is_ is None:
+            raise IsBulunamadi(is_id)
+        return is_
+
+    def tahmini_bekleme(self) -> float:
+        """Kuyruğun mevcut derinlikte boşalması için gereken yaklaşık süre (sn)."""
+        bitmis = self.tamamlanan + self.basarisiz
+        ortalama = self.mesgul_sure / bitmis if bitmis else self.zaman_asimi
+        return self.derinlik * ortalama / max(self.isci_sayisi, 1)
+
+    # --- İşçiler ---
+
+    async def _isci(self):
+        while not self._durduruluyor:
+            # Bayrak sorgudan önce indirilir: sorgudan sonra eklenen iş bayrağı yeniden kaldırır
+            self._uyandir.clear()
+            try:
+                is_, self.derinlik = await asyncio.to_thread(self._sahiplen)
+            except Exception as e:
+                print(f"İş kuyruğu okunamadı: {e}")
+                is_ = None
+            if is_ is None:
+                try:
+                    await asyncio.wait_for(self._uyandir.wait(), self.yoklama_araligi)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            if self.derinlik:
+                # Bekleyen başka iş varsa boştaki bir işçiyi de uyandır
+                self._uyandir.set()
+            await self._isle(is_)
+
+    async def _isle(self, is_: Dict[str, Any]):
+        IS_BEKLEME_SURESI.gozlemle(is_["bekleme"])
+        self._aktif[is_["id"]] = (time.monotonic(), is_["deneme"])
+        sonuc, hata = None, None
+        try:
+            sonuc = await asyncio.wait_for(self.isleyici(is_["yuk"]), self.zaman_asimi)
+        except asyncio.TimeoutError:
+            hata = f"Zaman aşımı ({self.zaman_asimi} sn)"
+        except Exception as e:
+            hata = str(e) or type(e).__name__
+        finally:
+            self.mesgul_sure += time.monotonic() - self._aktif.pop(is_["id"])[0]
+
+        try:
+            durum = await asyncio.to_thread(self._bitir, is_["id"], is_["deneme"], sonuc, hata)
+        except Exception as e:
+            # Kira dolunca iş yeniden alınır
+            print(f"İş sonucu yazılamadı ({is_['id']}): {e}")
+            return
+        if durum is None:
+            # Kira dolmuş; işi yeniden alan işçinin sonucu geçerli
+            print(f"İş sonucu yazılmadı; kira dolmuş ve iş yeniden alınmış ({is_['id']})")
+            return
+        if hata:
+            self.basarisiz += 1
+            IS_TOPLAM.artir(sonuc="basarisiz")
+        else:
+            self.tamamlanan += 1
+            IS_TOPLAM.artir(sonuc="tamamlandi")
+        if is_["webhook_url"]:
+            self._webhook_baslat(is_["webhook_url"], durum)
+
+    def _webhook_baslat(self, url: str, durum: Dict[str, Any]):
+        # Teslimat işçiyi bekletmez; yeniden denemeler sırasında işçi sonraki işi alır
+        gorev = asyncio.create_task(self._webhook_gonder(url, durum))
+        self._webhooklar.add(gorev)
+        gorev.add_done_callback(self._webhooklar.discard)
+
+    async def _webhook_gonder(self, url: str, durum: Dict[str, Any]):
+        govde = json.dumps(durum, ensure_ascii=False).encode("utf-8")
+        basliklar = {"Content-Type": "application/json", "X-FiyatIQ-Is": durum["is_id"]}
+        if self.webhook_sirri:
+            imza = hmac.new(self.webhook_sirri.encode(), govde, hashlib.sha256).hexdigest()
+            basliklar["X-FiyatIQ-Imza"] = f"sha256={imza}"
+
+        try:
+            # İş alınırken geçerli olan adres bu arada değişmiş (izin listesi, DNS) olabilir
+            await self.webhook_dogrula(url)
+        except GecersizWebhook as e:
+            self.webhook_basarisiz += 1
+            IS_WEBHOOK.artir(sonuc="reddedildi")
+            print(f"Webhook gönderilmedi ({durum['is_id']}): {e}")
+            await asyncio.to_thread(self._webhook_durumu_yaz, durum["is_id"], "basarisiz")
+            return
+
+        hata = None
+        for deneme in range(self.webhook_deneme):
+            try:
+                # Yönlendirme izlenmez: başka bir hosta yönlendirme denetimi atlatırdı
+                async with self._oturum.post(url, data=govde, headers=basliklar, allow_redirects=False) as yanit:
+                    if yanit.status < 300:
+                        self.webhook_teslim += 1
+                        IS_WEBHOOK.artir(sonuc="teslim")
+                        await asyncio.to_thread(self._webhook_durumu_yaz, durum["is_id"], "teslim_edildi")
+                        return
+                    hata = f"HTTP {yanit.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                hata = str(e) or type(e).__name__
+            IS_WEBHOOK.artir(sonuc="hata")
+            if deneme + 1 < self.webhook_deneme:
+                await asyncio.sleep(self.webhook_geri_cekilme * 2 ** deneme)
+
+        self.webhook_basarisiz += 1
+        print(f"Webhook teslim edilemedi ({durum['is_id']} -> {url}): {hata}")
+        await asyncio.to_thread(self._webhook_durumu_yaz, durum["is_id"], "basarisiz")
+
+    async def _bakim_dongusu(self):
+        while True:
+            try:
+                geri_alinan, self.derinlik, webhooklar = await asyncio.to_thread(self._bakim)
+                # Deneme hakkı dolan işlerin sahibine de başarısızlık bildirilir
+                for url, durum in webhooklar:
+                    self._webhook_baslat(url, durum)
+                if geri_alinan:
+                    self.geri_alinan += geri_alinan
+                    self._uyandir.set()
+            except Exception as e:
+                print(f"İş kuyruğu bakımı başarısız: {e}")
+            await asyncio.sleep(self.bakim_araligi)
+
+    def istatistikler(self) -> Dict[str, Any]:
+        simdi = time.monotonic()
+        mesgul_sure = self.mesgul_sure + sum(simdi - b for b, _ in self._aktif.values())
+        gecen = (simdi - self._baslangic) * self.isci_sayisi if self._baslangic else 0
+        return {
+            "isci_sayisi": self.isci_sayisi,
+            "mesgul_isci": len(self._aktif),
+            "kullanim": round(mesgul_sure / gecen, 4) if gecen else 0.0,
+            "mesgul_sure_sn": round(mesgul_sure, 3),
+            "derinlik": self.derinlik,
+            "max_bekleyen": self.max_bekleyen,
+            "kabul": self.kabul,
+            "reddedilen": self.reddedilen,
+            "tamamlanan": self.tamamlanan,
+            "basarisiz": self.basarisiz,
+            "geri_alinan": self.geri_alinan,
+            "webhook": {"teslim": self.webhook_teslim, "basarisiz": self.webhook_basarisiz,
+                        "bekleyen": len(self._webhooklar)},
+        }
@@ -0,0 +1,716 @@
+"""LLM İstemci Havuzu
+
+Gemini çağrılarını birden fazla API anahtarı ve model arasında dağıtır.
+Her çağrı bir süre sınırı içinde yapılır; 429/5xx ve zaman aşımı gibi
+geçici hatalarda sıradaki istemciyle, rastgele saçılımlı geri çekilmeyle
+yeniden denenir. Art arda hata veren istemcilerin devresi açılır ve
+soğuma süresi boyunca atlanır; profilin tüm istemcileri kullanılamazsa
+`LLMKullanilamiyor` fırlatılır (çağıran taraf yerel motora düşer).
+Her anahtarın istek hızı, kotaya göre boyutlandırılmış bir jeton
+kovasıyla sınırlanır; birden fazla işçiyle çalışırken kova
+`paylasimli_durum` üzerinden süreçler arasında paylaşılır.
+İsteğe bağlı hedge politikası (`LLM_HEDGE_PROFILLERI`), son çağrıların
+gecikme yüzdeliğini aşan çağrılar için başka bir istemciye ikinci bir
+istek gönderir, önce biteni alır ve diğerini iptal eder.
+
+İstemciler `istemci_fabrikasi(model, api_anahtari)` ile ilk kullanımda
+oluşturulur (Gemini SDK'sı ancak o zaman yüklenir); testlerde ve yük
+ölçümlerinde `SahteLLM` ya da başka bir sahte istemci verilebilir
+(MOCK_AI_RESPONSES=true). LangChain'e bağlanan `HavuzluModel`
+`tahmin_zincirleri` modülündedir.
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from metrikler import LLM_HATA, LLM_HEDGE, llm_kullanimi
+
+# Yeniden denenebilecek HTTP durum kodları
+GECICI_DURUMLAR = {408, 429, 500, 502, 503, 504}
+# Anahtara özgü hatalar: aynı istek başka bir anahtarla denenebilir
+ANAHTAR_DURUMLARI = {401, 403}
+# Durum kodu taşımayan geçici hata sınıfları (google.api_core vb.)
+GECICI_HATA_ADLARI = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "BadGateway",
+}
+
+IstemciFabrikasi = Callable[[str, str], Any]
+# (kova adı, dakika başına istek) -> `al(zaman_asimi)` sunan kota nesnesi
+KovaFabrikasi = Callable[[str, float], Any]
+
+
+class LLMKullanilamiyor(Exception):
+    """Profildeki hiçbir istemci süre sınırı içinde yanıt veremediğinde fırlatılır."""
+
+
+class DevrelerAcik(LLMKullanilamiyor):
+    """Profildeki tüm istemcilerin devresi açık; hiçbir istemci denenmedi."""
+
+
+def _durum_kodu(hata: BaseException) -> Optional[int]:
+    for kaynak in (hata, hata.__cause__):
+        if kaynak is None:
+            continue
+        for ad in ("code", "status_code", "status"):
+            deger = getattr(kaynak, ad, None)
+            deger = deger() if callable(deger) else deger
+            if isinstance(deger, int):
+                return deger
+    return None
+
+
+def _anahtar_ozeti(api_anahtari: str) -> str:
+    return hashlib.sha256(api_anahtari.encode("utf-8")).hexdigest()[:12]
+
+
+def hata_turu(hata: BaseException) -> str:
+    """Hatayı "gecici", "anahtar" ya da "kalici" olarak sınıflandırır."""
+    if isinstance(hata, (asyncio.TimeoutError, ConnectionError)):
+        return "gecici"
+    kod = _durum_kodu(hata)
+    if kod in GECICI_DURUMLAR:
+        return "gecici"
+    if kod in ANAHTAR_DURUMLARI:
+        return "anahtar"
+    if kod is not None and 400 <= kod < 500:
+        return "kalici"
+    if type(hata).__name__ in GECICI_HATA_ADLARI:
+        return "gecici"
+    # Sınıflandırılamayan hatalar (ağ katmanı vb.) geçici sayılır
+    return "gecici"
+
+
+class TokenKovasi:
+    """Dakika başına istek kotasını uygulayan jeton kovası."""
+
+    def __init__(self, dakika_basina: float, kapasite: Optional[float] = None, saat=time.monotonic):
+        self.hiz = dakika_basina / 60.0
+        self.kapasite = kapasite if kapasite is not None else max(1.0, dakika_basina / 6)
+        self.jeton = self.kapasite
+        self._saat = saat
+        self._son = saat()
+
+    def _doldur(self):
+        simdi = self._saat()
+        self.jeton = min(self.kapasite, self.jeton + (simdi - self._son) * self.hiz)
+        self._son = simdi
+
+    async def al(self, zaman_asimi: Optional[float] = None) -> bool:
+        """Bir jeton ayırır; gereken bekleme `zaman_asimi`ni aşacaksa ayırmadan False döner."""
+        if self.hiz <= 0:
+            return True
+        self._doldur()
+        bekleme = max(0.0, (1 - self.jeton) / self.hiz)
+        if zaman_asimi is not None and bekleme > zaman_asimi:
+            return False
+        # Jeton şimdiden ayrılır (bakiye eksiye düşebilir), böylece bekleyenler sıraya girer
+        self.jeton -= 1
+        if bekleme > 0:
+            await asyncio.sleep(bekleme)
+        return True
+
+
+class DevreKesici:
+    """Art arda `esik` hatadan sonra `sure` saniye boyunca çağrılara izin vermez."""
+
+    def __init__(self, esik: int = 5, sure: float = 30.0, saat=time.monotonic):
+        self.esik = esik
+        self.sure = sure
+        self._saat = saat
+        self.ardisik_hata = 0
+        self._acilis: Optional[float] = None
+        self._deneme_suruyor = False
+
+    @property
+    def durum(self) -> str:
+        if self._acilis is None:
+            return "kapali"
+        if self._saat() - self._acilis >= self.sure:
+            return "yari_acik"
+        return "acik"
+
+    @property
+    def kullanilabilir(self) -> bool:
+        """`izin_var` çağrılsa izin verilir mi; deneme hakkını ayırmaz."""
+        durum = self.durum
+        return durum == "kapali" or (durum == "yari_acik" and not self._deneme_suruyor)
+
+    def izin_var(self) -> bool:
+        durum = self.durum
+        if durum == "kapali":
+            return True
+        if durum == "yari_acik" and not self._deneme_suruyor:
+            # Soğuma bitti: tek bir deneme çağrısına izin ver
+            self._deneme_suruyor = True
+            return True
+        return False
+
+    def basarili(self):
+        self.ardisik_hata = 0
+        self._acilis = None
+        self._deneme_suruyor = False
+
+    def basarisiz(self):
+        self.ardisik_hata += 1
+        if self._deneme_suruyor or self.ardisik_hata >= self.esik:
+            self._acilis = self._saat()
+        self._deneme_suruyor = False
+
+    def birak(self):
+        """Sonuçlanmadan biten (iptal edilen) çağrının deneme hakkını geri verir;
+        başarı ya da hata sayılmaz, yarı açık devre yeni bir denemeye izin verir."""
+        self._deneme_suruyor = False
+
+
+class HedgePolitikasi:
+    """Kuyruk gecikmesini kısaltmak için ikinci isteğin ne zaman ve ne sıklıkla gönderileceği.
+
+    Son `pencere` başarılı çağrının `yuzdelik`. yüzdeliği eşik olarak
+    kullanılır; en az `min_ornek` ölçüm birikene kadar hedge yapılmaz.
+    Her çağrı `butce` kadar kredi kazandırır, her ikinci istek bir kredi
+    harcar; böylece ikinci istekler uzun vadede trafiğin `butce` oranını
+    (ör. 0.05 = %5) aşmaz ve anlık patlama `kapasite` ile sınırlanır.
+    """
+
+    def __init__(self, yuzdelik: float = 95.0, butce: float = 0.05, min_ornek: int = 20,
+                 pencere: int = 500, min_gecikme: float = 0.0, kapasite: float = 5.0):
+        self.yuzdelik = yuzdelik
+        self.butce = butce
+        self.min_ornek = min_ornek
+        self.min_gecikme = min_gecikme
+        self.kapasite = kapasite
+        self.gecikmeler: deque = deque(maxlen=pencere)
+        self.kredi = 0.0
+        self._esik: Optional[float] = None
+        self._yeni_ornek = 0
+        self.cagri = 0
+        self.baslatilan = 0
+        self.kazanan = 0
+        self.butce_yok = 0
+        self.yuva_yok = 0
+
+    def gozlemle(self, sure: float):
+        self.gecikmeler.append(sure)
+        self._yeni_ornek += 1
+
+    def esik(self) -> Optional[float]:
+        """İkinci isteğin gönderileceği gecikme (sn); yeterli ölçüm yoksa None."""
+        if len(self.gecikmeler) < self.min_ornek:
+            return None
+        # Sıralama pahalı olmasın diye eşik, eldeki ölçümlerin onda biri kadar yeni ölçümde bir yenilenir
+        if self._esik is None or self._yeni_ornek >= max(1, len(self.gecikmeler) // 10):
+            sirali = sorted(self.gecikmeler)
+            sira = min(len(sirali) - 1, int(len(sirali) * self.yuzdelik / 100))
+            self._esik = max(sirali[sira], self.min_gecikme)
+            self._yeni_ornek = 0
+        return self._esik
+
+    def cagri_basladi(self):
+        self.cagri += 1
+        self.kredi = min(self.kapasite, self.kredi + self.butce)
+
+    def butce_al(self) -> bool:
+        if self.kredi < 1:
+            self.butce_yok += 1
+            return False
+        self.kredi -= 1
+        self.baslatilan += 1
+        return True
+
+    def istatistikler(self) -> Dict[str, Any]:
+        esik = self.esik()
+        return {
+            "esik_sn": round(esik, 4) if esik is not None else None,
+            "cagri": self.cagri,
+            "baslatilan": self.baslatilan,
+            "kazanan": self.kazanan,
+            "butce_yok": self.butce_yok,
+            "yuva_yok": self.yuva_yok,
+            "oran": round(self.baslatilan / self.cagri, 4) if self.cagri else 0.0,
+        }
+
+
+@dataclass
+class IstemciYuvasi:
+    """Havuzdaki bir (model, API anahtarı) istemcisi; istemci ilk çağrıda oluşturulur."""
+    model: str
+    anahtar_no: int
+    fabrika: IstemciFabrikasi
+    anahtar: str = field(repr=False)
+    kova: TokenKovasi = None
+    devre: DevreKesici = None
+    cagri: int = 0
+    hata: int = 0
+    _istemci: Any = field(default=None, repr=False)
+
+    @property
+    def ad(self) -> str:
+        return f"{self.model}#{self.anahtar_no}"
+
+    @property
+    def istemci(self) -> Any:
+        if self._istemci is None:
+            self._istemci = self.fabrika(self.model, self.anahtar)
+        return self._istemci
+
+
+@dataclass
+class LLMAyarlari:
+    anahtarlar: List[str]
+    # Profil -> öncelik sırasıyla model adları (ilk model birincil, sonrakiler yedek)
+    profiller: Dict[str, List[str]]
+    zaman_asimlari: Dict[str, float] = field(default_factory=dict)
+    varsayilan_zaman_asimi: float = 30.0
+    max_deneme: int = 3
+    geri_cekilme_tabani: float = 0.5
+    devre_esigi: int = 5
+    devre_suresi: float = 30.0
+    dakika_basina_istek: float = 60.0
+    # Hedge uygulanacak profiller (boşsa kapalı) ve politika ayarları
+    hedge_profilleri: List[str] = field(default_factory=list)
+    hedge_yuzdelik: float = 95.0
+    hedge_butcesi: float = 0.05
+    hedge_min_ornek: int = 20
+    hedge_min_gecikme: float = 0.0
+
+    @classmethod
+    def ortamdan(cls) -> "LLMAyarlari":
+        anahtarlar = [a.strip() for a in os.getenv("GEMINI_API_KEYS", "").split(",") if a.strip()]
+        if not anahtarlar and os.getenv("GEMINI_API_KEY"):
+            anahtarlar = [os.getenv("GEMINI_API_KEY")]
+        varsayilan_model = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+        yedekler = [m.strip() for m in os.getenv("GEMINI_YEDEK_MODELLER", "").split(",") if m.strip()]
+        return cls(
+            anahtarlar=anahtarlar,
+            profiller={
+                "hizli": list(dict.fromkeys([os.getenv("GEMINI_MODEL_HIZLI", varsayilan_model)] + yedekler)),
+                "detayli": list(dict.fromkeys([os.getenv("GEMINI_MODEL_DETAYLI", varsayilan_model)] + yedekler)),
+            },
+            zaman_asimlari={
+                "hizli": float(os.getenv("LLM_ZAMAN_ASIMI_HIZLI", "15")),
+                "detayli": float(os.getenv("LLM_ZAMAN_ASIMI_DETAYLI", "45")),
+            },
+            max_deneme=int(os.getenv("LLM_MAX_DENEME", "3")),
+            geri_cekilme_tabani=float(os.getenv("LLM_GERI_CEKILME_TABANI", "0.5")),
+            devre_esigi=int(os.getenv("LLM_DEVRE_ESIGI", "5")),
+            devre_suresi=float(os.getenv("LLM_DEVRE_SURESI", "30")),
+            dakika_basina_istek=float(os.getenv("GEMINI_RATE_LIMIT_PER_MINUTE", "60")),
+            hedge_profilleri=[p.strip() for p in os.getenv("LLM_HEDGE_PROFILLERI", "").split(",") if p.strip()],
+            hedge_yuzdelik=float(os.getenv("LLM_HEDGE_YUZDELIK", "95")),
+            hedge_butcesi=float(os.getenv("LLM_HEDGE_BUTCESI", "0.05")),
+            hedge_min_ornek=int(os.getenv("LLM_HEDGE_MIN_ORNEK", "20")),
+            hedge_min_gecikme=float(os.getenv("LLM_HEDGE_MIN_GECIKME", "0")),
+        )
+
+
+def gemini_istemcisi(model: str, api_anahtari: str) -> Any:
+    """Varsayılan istemci fabrikası; yeniden deneme havuz tarafından yapılır.
+
+    Sistem mesajları Gemini'ye `system_instruction` olarak gider. Yapısal
+    istem modunda yanıt JSON'a zorlanır; `GEMINI_ONBELLEK_ICERIGI` verilirse
+    (ör. ``cachedContents/abc``) önbelleğe alınmış bağlam kullanılır.
+    """
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    ek_ayarlar = {}
+    if os.getenv("ISTEM_MODU", "klasik") == "yapisal":
+        ek_ayarlar["response_mime_type"] = "application/json"
+    if os.getenv("GEMINI_ONBELLEK_ICERIGI"):
+        ek_ayarlar["cached_content"] = os.getenv("GEMINI_ONBELLEK_ICERIGI")
+    return ChatGoogleGenerativeAI(
+        model=model,
+        google_api_key=api_anahtari,
+        temperature=float(os.getenv("GEMINI_TEMPERATURE", "0.2")),
+        max_tokens=int(os.getenv("GEMINI_MAX_TOKENS", "2048")),
+        max_retries=1,
+        **ek_ayarlar,
+    )
+
+
+class SahteLLM:
+    """Ağ çağrısı yapmayan, sabit bir JSON tahmini döndüren test istemcisi.
+
+    Her çağrı `gecikme` ± `sapma` saniye sürer; `kuyruk_orani` olasılıkla
+    bunun yerine `kuyruk_gecikmesi` saniye sürer (uzun kuyruklu gecikme
+    dağılımı); `hata_orani` olasılıkla
+    503 benzeri geçici hata verir, `bozuk_orani` olasılıkla da gerçek
+    modellerde görülen bozuk biçimlerden birini (tek tırnak, fazla virgül,
+    açıklama metni, yarıda kesilme, JSON dışı metin) döndürür.
+    """
+
+    YANIT = (
+        '{"tahmini_fiyat_min": 900000, "tahmini_fiyat_max": 1100000, "ortalama_fiyat": 1000000, '
+        '"rapor": "<h4>Referans Fiyat</h4><p>Sahte yanıt.</p>", '
+        '"pazar_analizi": "<p>Sahte pazar analizi.</p>"}'
+    )
+    # Yapısal istem modunda beklenen yanıt (HTML sunucuda üretilir)
+    YAPISAL_YANIT = (
+        '{"tahmini_fiyat_min":900000,"tahmini_fiyat_max":1100000,"ortalama_fiyat":1000000,'
+        '"faktorler":[["KM_YUKSEK",-40000],["MODEL_POPULER",25000]],"pazar":"TALEP_YUKSEK"}'
+    )
+    BOZUK_YANITLAR = (
+        "{'tahmini_fiyat_min': 900000, 'tahmini_fiyat_max': 1100000, 'ortalama_fiyat': 1000000, "
+        "'rapor': \"<p class=\"not\">Sahte yanıt.</p>\", 'pazar_analizi': '<p>Sahte pazar analizi.</p>',}",
+        "İşte analiz:\n```json\n" + YANIT + "\n```\nBaşka sorunuz var mı?",
+        YANIT[:120],
+        "Bu araç için fiyat tahmini yapamıyorum.",
+    )
+
+    def __init__(self, model: str = "sahte", api_anahtari: str = "", gecikme: float = 0.0,
+                 hata_orani: float = 0.0, yanit: Optional[str] = None, sapma: float = 0.0,
+                 bozuk_orani: float = 0.0, kuyruk_orani: float = 0.0, kuyruk_gecikmesi: float = 0.0):
+        self.model = model
+        self.gecikme = gecikme
+        self.sapma = sapma
+        self.kuyruk_orani = kuyruk_orani
+        self.kuyruk_gecikmesi = kuyruk_gecikmesi
+        self.hata_orani = hata_orani
+        self.bozuk_orani = bozuk_orani
+        self.yanit = yanit or self.YANIT
+
+    async def _bekle(self):
+        gecikme = self.gecikme + (random.uniform(-self.sapma, self.sapma) if self.sapma else 0.0)
+        if self.kuyruk_orani and random.random() < self.kuyruk_orani:
+            gecikme = self.kuyruk_gecikmesi
+        if gecikme > 0:
+            await asyncio.sleep(gecikme)
+        if self.hata_orani and random.random() < self.hata_orani:
+            hata = RuntimeError("Sahte geçici hata")
+            hata.code = 503
+            raise hata
+
+    def _metin(self) -> str:
+        if self.bozuk_orani and random.random() < self.bozuk_orani:
+            return random.choice(self.BOZUK_YANITLAR)
+        return self.yanit
+
+    @staticmethod
+    def _kullanim(girdi: Any, metin: str) -> Dict[str, int]:
+        # Yaklaşık token sayısı: 4 karakter ~ 1 token
+        girdi_token = len(str(girdi)) // 4
+        cikti_token = len(metin) // 4
+        return {"input_tokens": girdi_token, "output_tokens": cikti_token, "total_tokens": girdi_token + cikti_token}
+
+    async def ainvoke(self, girdi: Any, *args, **kwargs):
+        from langchain_core.messages import AIMessage
+
+        await self._bekle()
+        metin = self._metin()
+        return AIMessage(content=metin, usage_metadata=self._kullanim(girdi, metin))
+
+    async def astream(self, girdi: Any, *args, **kwargs) -> AsyncIterator[Any]:
+        from langchain_core.messages import AIMessageChunk
+
+        await self._bekle()
+        metin = self._metin()
+        for i in range(0, len(metin), 64):
+            yield AIMessageChunk(content=metin[i:i + 64])
+        yield AIMessageChunk(content="", usage_metadata=self._kullanim(girdi, metin))
+
+
+def sahte_istemci_fabrikasi(model: str, api_anahtari: str) -> SahteLLM:
+    return SahteLLM(
+        model,
+        api_anahtari,
+        yanit=SahteLLM.YAPISAL_YANIT if os.getenv("ISTEM_MODU", "klasik") == "yapisal" else None,
+        gecikme=float(os.getenv("MOCK_AI_GECIKME", "0")),
+        sapma=float(os.getenv("MOCK_AI_SAPMA", "0")),
+        hata_orani=float(os.getenv("MOCK_AI_HATA_ORANI", "0")),
+        bozuk_orani=float(os.getenv("MOCK_AI_BOZUK_ORANI", "0")),
+        kuyruk_orani=float(os.getenv("MOCK_AI_KUYRUK_ORANI", "0")),
+        kuyruk_gecikmesi=float(os.getenv("MOCK_AI_KUYRUK_GECIKMESI", "0")),
+    )
+
+
+class LLMHavuzu:
+    """Profil bazında (hizli/detayli) istemci seçen, yeniden deneyen ve devre kesen havuz."""
+
+    def __init__(self, ayarlar: LLMAyarlari, istemci_fabrikasi: IstemciFabrikasi = gemini_istemcisi,
+                 kova_fabrikasi: Optional[KovaFabrikasi] = None):
+        # Anahtar yoksa havuz yine kurulur; her çağrı LLMKullanilamiyor ile yerel motora düşer
+        self.ayarlar = ayarlar
+        # Kota anahtar başınadır; aynı anahtarı kullanan modeller kovayı paylaşır.
+        # Paylaşımlı kovalar anahtarın özetiyle adlandırılır, böylece aynı anahtarı
+        # kullanan tüm işçiler tek kotaya tabi olur.
+        kova_fabrikasi = kova_fabrikasi or (lambda _ad, dakika_basina: TokenKovasi(dakika_basina))
+        kovalar = [
+            kova_fabrikasi(f"llm:kota:{_anahtar_ozeti(anahtar)}", ayarlar.dakika_basina_istek)
+            for anahtar in ayarlar.anahtarlar
+        ]
+        self.yuvalar: Dict[str, List[IstemciYuvasi]] = {}
+        for model in dict.fromkeys(m for modeller in ayarlar.profiller.values() for m in modeller):
+            self.yuvalar[model] = [
+                IstemciYuvasi(
+                    model=model,
+                    anahtar_no=no,
+                    fabrika=istemci_fabrikasi,
+                    anahtar=anahtar,
+                    kova=kovalar[no],
+                    devre=DevreKesici(ayarlar.devre_esigi, ayarlar.devre_suresi),
+                )
+                for no, anahtar in enumerate(ayarlar.anahtarlar)
+            ]
+        self._sira = count()
+        self.basarisiz_cagri = 0
+        self.hedge = {
+            profil: HedgePolitikasi(ayarlar.hedge_yuzdelik, ayarlar.hedge_butcesi,
+                                    ayarlar.hedge_min_ornek, min_gecikme=ayarlar.hedge_min_gecikme)
+            for profil in ayarlar.hedge_profilleri
+            if profil in ayarlar.profiller
+        }
+
+    def _adaylar(self, profil: str, haric: Optional[IstemciYuvasi] = None) -> List[IstemciYuvasi]:
+        """Profilin modellerini öncelik sırasıyla, anahtarları dönüşümlü olarak sıralar.
+
+        `haric` verilirse (hedge'de birincil isteğin istemcisi) o istemci listeye alınmaz.
+        """
+        baslangic = next(self._sira)
+        adaylar = []
+        for model in self.ayarlar.profiller[profil]:
+            yuvalar = self.yuvalar[model]
+            kayma = baslangic % len(yuvalar)
+            adaylar.extend(yuvalar[kayma:] + yuvalar[:kayma])
+        if haric is not None and haric in adaylar:
+            adaylar.remove(haric)
+        return adaylar
+
+    def _baska_yuva_var(self, profil: str, haric: Optional[IstemciYuvasi]) -> bool:
+        """Profilde `haric` dışında devresi izin veren bir istemci var mı (hedge için)."""
+        return any(
+            yuva is not haric and yuva.devre.kullanilabilir
+            for model in self.ayarlar.profiller[profil]
+            for yuva in self.yuvalar[model]
+        )
+
+    def _zaman_asimi(self, profil: str, zaman_asimi: Optional[float]) -> float:
+        if zaman_asimi is not None:
+            return zaman_asimi
+        return self.ayarlar.zaman_asimlari.get(profil, self.ayarlar.varsayilan_zaman_asimi)
+
+    def _geri_cekilme(self, deneme: int) -> float:
+        return self.ayarlar.geri_cekilme_tabani * (2 ** deneme) * (0.5 + random.random())
+
+    async def _denemeler(self, profil: str, zaman_asimi: Optional[float],
+                         haric: Optional[IstemciYuvasi] = None, hedge: bool = False):
+        """Sırayla denenecek (yuva, kalan_sure) çiftlerini üretir.
+
+        Çağıran, başarısız bir denemenin hatasını `asend` ile geri gönderir
+        ve sıradaki çifti alır; başarıda üreteci kapatıp devrenin
+        `basarili` metodunu çağırır. Üreteç bir denemenin sonucu gelmeden
+        kapatılırsa (iptal) yuvanın deneme hakkı geri verilir. Denemeler
+        tükendiğinde `LLMKullanilamiyor`, hiçbir istemcinin devresi izin
+        vermediyse `DevrelerAcik` fırlatılır. Hedge isteği tek denemedir ve
+        kota jetonu beklemez.
+        """
+        if not self.yapilandirildi:
+            self.basarisiz_cagri += 1
+            raise LLMKullanilamiyor("GEMINI_API_KEY (ya da GEMINI_API_KEYS) çevre değişkeni ayarlanmamış!")
+        bitis = time.monotonic() + self._zaman_asimi(profil, zaman_asimi)
+        son_hata: Optional[BaseException] = None
+        deneme = 0
+        acik_devre = 0
+        max_deneme = 1 if hedge else self.ayarlar.max_deneme
+        for yuva in self._adaylar(profil, haric):
+            if deneme >= max_deneme:
+                break
+            kalan = bitis - time.monotonic()
+            if kalan <= 0:
+                break
+            if not yuva.devre.kullanilabilir:
+                acik_devre += 1
+                continue
+            # Kota, deneme hakkı ayrılmadan önce alınır: kota beklerken iptal ya da
+            # kotanın dolması yarı açık devreyi kilitlemez
+            if not await yuva.kova.al(0 if hedge else kalan):
+                son_hata = LLMKullanilamiyor(f"{yuva.ad} için istek kotası doldu")
+                continue
+            if not yuva.devre.izin_var():
+                # Kota beklenirken başka bir çağrı deneme hakkını aldı
+                acik_devre += 1
+                continue
+            deneme += 1
+            yuva.cagri += 1
+            try:
+                hata = yield yuva, max(bitis - time.monotonic(), 0.001)
+            except GeneratorExit:
+                # Başarı ya da iptal; başarıyı çağıran kaydeder, iptal sonuç sayılmaz
+                yuva.devre.birak()
+                raise
+            yuva.hata += 1
+            son_hata = hata
+            tur = hata_turu(hata)
+            LLM_HATA.artir(model=yuva.model, tur=tur)
+            if tur == "kalici":
+                # İstekten kaynaklanan hata (400 vb.): başka istemciyle denemek sonucu değiştirmez
+                yuva.devre.basarili()
+                break
+            yuva.devre.basarisiz()
+            if tur == "gecici":
+                await asyncio.sleep(min(self._geri_cekilme(deneme - 1), max(bitis - time.monotonic(), 0)))
+        self.basarisiz_cagri += 1
+        if son_hata is None and acik_devre:
+            raise DevrelerAcik(f"'{profil}' profilindeki tüm istemcilerin devresi açık")
+        if son_hata is None:
+            raise LLMKullanilamiyor(f"'{profil}' profili için süre doldu; hiçbir istemci denenmedi")
+        raise LLMKullanilamiyor(
+            f"'{profil}' profili için LLM yanıt vermedi: {type(son_hata).__name__}: {son_hata}"
+        ) from son_hata
+
+    async def _cagir(self, profil: str, girdi: Any, zaman_asimi: Optional[float] = None,
+                     haric: Optional[IstemciYuvasi] = None, hedge: bool = False,
+                     etkin: Optional[list] = None) -> Any:
+        """Yeniden denemeli tek çağrı; `etkin` listesine o an denenen yuva yazılır."""
+        denemeler = self._denemeler(profil, zaman_asimi, haric, hedge)
+        yuva, kalan = await denemeler.__anext__()
+        while True:
+            if etkin is not None:
+                etkin[:] = [yuva]
+            baslangic = time.monotonic()
+            try:
+                sonuc = await asyncio.wait_for(yuva.istemci.ainvoke(girdi), kalan)
+            except asyncio.CancelledError:
+                await denemeler.aclose()
+                raise
+            except Exception as e:
+                yuva, kalan = await denemeler.asend(e)
+                continue
+            await denemeler.aclose()
+            yuva.devre.basarili()
+            llm_kullanimi(yuva.model, sonuc)
+            if profil in self.hedge:
+                self.hedge[profil].gozlemle(time.monotonic() - baslangic)
+            return sonuc
+
+    async def cagir(self, profil: str, girdi: Any, zaman_asimi: Optional[float] = None) -> Any:
+        politika = self.hedge.get(profil)
+        if politika is None:
+            return await self._cagir(profil, girdi, zaman_asimi)
+        politika.cagri_basladi()
+        esik = politika.esik()
+        if esik is None:
+            return await self._cagir(profil, girdi, zaman_asimi)
+
+        bitis = time.monotonic() + self._zaman_asimi(profil, zaman_asimi)
+        etkin: list = []
+        birincil = asyncio.ensure_future(self._cagir(profil, girdi, zaman_asimi, etkin=etkin))
+        try:
+            await asyncio.wait({birincil}, timeout=esik)
+            if birincil.done():
+                return await birincil
+            haric = etkin[0] if etkin else None
+            if not self._baska_yuva_var(profil, haric):
+                # Tek anahtar ve tek model (ya da diğerlerinin devresi açık): ikinci istek
+                # aynı istemciye giderdi, bütçe harcanmaz
+                politika.yuva_yok += 1
+                LLM_HEDGE.artir(profil=profil, sonuc="yuva_yok")
+                return await birincil
+            if not politika.butce_al():
+                LLM_HEDGE.artir(profil=profil, sonuc="butce_yok")
+                return await birincil
+            LLM_HEDGE.artir(profil=profil, sonuc="baslatildi")
+            ikincil = asyncio.ensure_future(self._cagir(
+                profil, girdi, max(bitis - time.monotonic(), 0.001),
+                haric=haric, hedge=True,
+            ))
+        except BaseException:
+            birincil.cancel()
+            raise
+        bekleyenler = {birincil, ikincil}
+        try:
+            while bekleyenler:
+                biten, bekleyenler = await asyncio.wait(bekleyenler, return_when=asyncio.FIRST_COMPLETED)
+                # Önce başarıyla biten alınır; ikisi de hata verirse birincilin hatası yükseltilir
+                for gorev in sorted(biten, key=lambda g: g is not birincil):
+                    if gorev.exception() is None:
+                        if gorev is ikincil:
+                            politika.kazanan += 1
+                            LLM_HEDGE.artir(profil=profil, sonuc="kazandi")
+                        return gorev.result()
+            return birincil.result()
+        finally:
+            for gorev in (birincil, ikincil):
+                if not gorev.done():
+                    gorev.cancel()
+
+    async def akis(self, profil: str, girdi: Any, zaman_asimi: Optional[float] = None) -> AsyncIterator[Any]:
+        """Yanıtı parça parça üretir; yeniden deneme yalnızca ilk parçadan önce yapılır."""
+        denemeler = self._denemeler(profil, zaman_asimi)
+        yuva, kalan = await denemeler.__anext__()
+        while True:
+            akis = yuva.istemci.astream(girdi)
+            try:
+                ilk = await asyncio.wait_for(akis.__anext__(), kalan)
+            except StopAsyncIteration:
+                await denemeler.aclose()
+                yuva.devre.basarili()
+                return
+            except asyncio.CancelledError:
+                await denemeler.aclose()
+                raise
+            except Exception as e:
+                yuva, kalan = await denemeler.asend(e)
+                continue
+            break
+        bitis = time.monotonic() + kalan
+        try:
+            llm_kullanimi(yuva.model, ilk)
+            yield ilk
+            while True:
+                try:
+                    parca = await asyncio.wait_for(akis.__anext__(), max(bitis - time.monotonic(), 0.001))
+                except StopAsyncIteration:
+                    break
+                llm_kullanimi(yuva.model, parca)
+                yield parca
+        except Exception as e:
+            yuva.hata += 1
+            yuva.devre.basarisiz()
+            LLM_HATA.artir(model=yuva.model, tur=hata_turu(e))
+            raise
+        else:
+            yuva.devre.basarili()
+        finally:
+            # Tüketici akışı erken bırakırsa (iptal, aclose) deneme hakkı burada geri verilir
+            await denemeler.aclose()
+
+    @property
+    def yapilandirildi(self) -> bool:
+        return bool(self.ayarlar.anahtarlar)
+
+    def istatistikler(self) -> Dict[str, Any]:
+        return {
+            "yapilandirildi": self.yapilandirildi,
+            "basarisiz_cagri": self.basarisiz_cagri,
+            "hedge": {profil: politika.istatistikler() for profil, politika in self.hedge.items()},
+            "istemciler": {
+                yuva.ad: {
+                    "cagri": yuva.cagri,
+                    "hata": yuva.hata,
+                    "devre": yuva.devre.durum,
+                    "jeton": round(yuva.kova.jeton, 2),
+                }
+                for yuvalar in self.yuvalar.values()
+                for yuva in yuvalar
+            },
+        }
+
+
+def havuz_olustur(kova_fabrikasi: Optional[KovaFabrikasi] = None) -> LLMHavuzu:
+    """Ortam değişkenlerinden havuzu kurar; MOCK_AI_RESPONSES=true ise sahte istemci kullanır.
+
+    `kova_fabrikasi` verilirse (ör. paylaşımlı durum arka ucunun `kova`
+    metodu) istek kotası süreçler arasında paylaşılır.
+    """
+    ayarlar = LLMAyarlari.ortamdan()
+    if os.getenv("MOCK_AI_RESPONSES", "false").lower() == "true":
+        ayarlar.anahtarlar = ayarlar.anahtarlar or ["sahte"]
+        return LLMHavuzu(ayarlar, sahte_istemci_fabrikasi, kova_fabrikasi)
+    return LLMHavuzu(ayarlar, kova_fabrikasi=kova_fabrikasi)
@@ -4,21 +4,40 @@ Bu uygulama, kullanıcının girdiği araç bilgilerine göre
 LangChain ve Gemini AI kullanarak anlık fiyat tahmini yapar.
 """
 
+import time
+
+_IMPORT_BASLANGIC = time.perf_counter()
+
+import asyncio
 import json
 import os
-import re
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional, Union
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from langchain.output_parsers import PydanticOutputParser
-from langchain.prompts import PromptTemplate
-from langchain.schema import BaseOutputParser
-from langchain_google_genai import ChatGoogleGenerativeAI
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
+from akisli_ayristirici import AkisliJsonAyristirici
+from cache import TTLLRUCache, arac_parmak_izi
+from database import init_db
+from fiyat_izgarasi import VARSAYILAN_YOL, FiyatIzgarasi
+from is_kuyrugu import GecersizWebhook, IsBulunamadi, IsKuyrugu, KuyrukDolu
+from llm_havuzu import havuz_olustur
+from market_cache import market_cache
+from metrikler import MetrikAraKatmani, asama, metrikler, token_hesabi, yavas_istekler
+from paylasimli_durum import PaylasimliBirlestirici, PaylasimliOnbellek, durum_olustur
+from rapor_sablonu import detayli_raporu, hizli_raporu
+from referans_fiyat import ReferansFiyatSaglayici, pazar_kaynagi
+from tahmin_ayristirici import tahmin_ayristirici
+from tahmin_oturumu import (GecersizHasarDegisikligi, OturumBulunamadi, OturumDeposu, SurumCakismasi,
+                            hasarlari_guncelle, oturum_olustur, oturum_sonucu)
+from toplu_tahmin import toplu_calistir
+from web_scraper import scraper
+from yerel_tahmin import yerel_motor
+
 # FastAPI uygulamasını oluştur
 app = FastAPI(
     title="🚗 Akıllı Araç Fiyat Tahminleme API",
@@ -47,20 +66,69 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Gemini API'sini yapılandır
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY çevre değişkeni ayarlanmamış!")
-
-# LangChain ile Gemini modelini oluştur
-llm = ChatGoogleGenerativeAI(
-    model=os.getenv("GEMINI_MODEL", "gemini-1.5-flash"),
-    google_api_key=GEMINI_API_KEY,
-    temperature=float(os.getenv("GEMINI_TEMPERATURE", "0.2")),
-    max_tokens=int(os.getenv("GEMINI_MAX_TOKENS", "2048")),
-    convert_system_message_to_human=True
+# İstek süresi metrikleri ve isteğe bağlı Server-Timing başlığı
+METRIKLER_AKTIF = os.getenv("ENABLE_METRICS", "true").lower() == "true"
+if METRIKLER_AKTIF:
+    app.add_middleware(
+        MetrikAraKatmani,
+        server_timing=os.getenv("METRIK_SERVER_TIMING", "false").lower() == "true",
+    )
+
+# Süreçler arası paylaşılan durum (PAYLASIMLI_DURUM=bellek|redis): tahmin önbelleği,
+# tekil uçuş kilitleri ve LLM kotası birden fazla işçide bu arka uçta tutulur
+paylasimli_durum = durum_olustur()
+
+# Gemini istemci havuzu: anahtar/model rotasyonu, süre sınırı, yeniden deneme ve devre kesici
+llm_havuzu = havuz_olustur(paylasimli_durum.kova)
+
+# Hızlı tahmin yanıt önbelleği
+TAHMIN_ONBELLEK_KM_ARALIGI = int(os.getenv("TAHMIN_ONBELLEK_KM_ARALIGI", "5000"))
+hizli_tahmin_onbellegi = PaylasimliOnbellek(
+    TTLLRUCache(
+        ttl=float(os.getenv("CACHE_TTL", "1800")),
+        max_kayit=int(os.getenv("TAHMIN_ONBELLEK_MAX_KAYIT", "10000")),
+        max_bayt=int(os.getenv("TAHMIN_ONBELLEK_MAX_MB", "64")) * 1024 * 1024,
+    ),
+    paylasimli_durum,
+    "hizli",
 )
 
+# Aynı araç için eş zamanlı gelen istekleri (paylaşımlı durumda işçiler arasında da) tek LLM çağrısında birleştirir
+tahmin_birlestirici = PaylasimliBirlestirici(
+    paylasimli_durum,
+    kilit_suresi=float(os.getenv("LLM_ZAMAN_ASIMI_HIZLI", "15")) + 5,
+    bekleme_suresi=float(os.getenv("LLM_ZAMAN_ASIMI_HIZLI", "15")),
+)
+
+# Hasar farkıyla güncellenen detaylı tahmin oturumları (paylaşımlı durumda işçiler arasında ortak)
+tahmin_oturumlari = OturumDeposu(
+    paylasimli_durum,
+    ttl=float(os.getenv("TAHMIN_OTURUM_SURESI", "1800")),
+    max_kayit=int(os.getenv("TAHMIN_OTURUM_MAX_KAYIT", "10000")),
+)
+
+# Popüler modeller için önceden hesaplanmış, bellek eşlemeli fiyat ızgarası
+# (`python fiyat_izgarasi.py` ile üretilir). FIYAT_IZGARASI_MODLARI'ndaki modlarda
+# hızlı tahminler ızgarada varsa doğrudan oradan yanıtlanır.
+fiyat_izgarasi = FiyatIzgarasi.yukle(
+    os.getenv("FIYAT_IZGARASI_DOSYASI") or VARSAYILAN_YOL,
+    max_gun=float(os.getenv("FIYAT_IZGARASI_MAX_GUN", "30")),
+)
+FIYAT_IZGARASI_MODLARI = {m.strip() for m in os.getenv("FIYAT_IZGARASI_MODLARI", "local").split(",") if m.strip()}
+
+# LLM başarısız olduğunda ya da zaman aşımına uğradığında yerel fiyat motoruna düş
+YEREL_YEDEK_AKTIF = os.getenv("YEREL_YEDEK_AKTIF", "true").lower() == "true"
+YEREL_YEDEK_ZAMAN_ASIMI = float(os.getenv("YEREL_YEDEK_ZAMAN_ASIMI", "20"))
+
+# Başlangıçta pazar verisi önbelleğine yüklenecek en popüler model sayısı
+PAZAR_ONBELLEK_ISITMA_ADEDI = int(os.getenv("MARKET_WARMUP_TOP_N", "20"))
+
+# Toplu tahmin ayarları
+TOPLU_TAHMIN_MAX_ARAC = int(os.getenv("TOPLU_TAHMIN_MAX_ARAC", "50000"))
+TOPLU_TAHMIN_ESZAMANLILIK = int(os.getenv("TOPLU_TAHMIN_ESZAMANLILIK", "8"))
+TOPLU_TAHMIN_MAX_ESZAMANLILIK = int(os.getenv("TOPLU_TAHMIN_MAX_ESZAMANLILIK", "32"))
+TOPLU_TAHMIN_OGE_ZAMAN_ASIMI = float(os.getenv("TOPLU_TAHMIN_OGE_ZAMAN_ASIMI", "60"))
+
 # Pydantic Modelleri
 class HasarDetayi(BaseModel):
     parca: str
@@ -82,6 +150,13 @@ class DetayliAracBilgileri(AracBilgileri):
     ekstra_bilgiler: Optional[str] = None
     hasar_detaylari: List[HasarDetayi] = []
 
+class TokenKullanimi(BaseModel):
+    girdi_token: int = 0
+    cikti_token: int = 0
+    toplam_token: int = 0
+    llm_cagrisi: int = 0
+    istem_modu: str
+
 class TahminSonucu(BaseModel):
     tahmini_fiyat_min: int
     tahmini_fiyat_max: int
@@ -89,73 +164,404 @@ class TahminSonucu(BaseModel):
     rapor: str
     analiz_tarihi: str
     pazar_analizi: str
+    referans_fiyat: Optional[int] = None
+    referans_kaynagi: Optional[str] = None
+    tahmin_kaynagi: Optional[str] = None
+    # Bu isteğin yaptığı LLM çağrılarının token dökümü (önbellekten/birleştirilerek
+    # yanıtlanan isteklerde sıfırdır)
+    token_kullanimi: Optional[TokenKullanimi] = None
+
+# llm: Gemini (başarısızlıkta yerel yedek), local: yalnızca kural tabanlı yerel motor
+TahminModu = Literal["llm", "local"]
+
+class TopluTahminIstegi(BaseModel):
+    # DetayliAracBilgileri önce denenir; `renk` içermeyen araçlar hızlı tahmine gider.
+    araclar: List[Union[DetayliAracBilgileri, AracBilgileri]]
+    eszamanlilik: Optional[int] = Field(None, ge=1)
+    oge_zaman_asimi: Optional[float] = Field(None, gt=0)
+    mode: TahminModu = "llm"
+
+class TopluTahminOgesi(BaseModel):
+    sira: int
+    sonuc: Optional[TahminSonucu] = None
+    hata: Optional[str] = None
+
+class TopluTahminSonucu(BaseModel):
+    sonuclar: List[TopluTahminOgesi]
+    benzersiz_arac_sayisi: int
+
+class HasarDegisikligi(BaseModel):
+    ekle: List[HasarDetayi] = []
+    cikar: List[HasarDetayi] = []
+    # İstemcinin gördüğü oturum sürümü (ya da If-Match başlığı); arada güncellendiyse 409 döner
+    surum: Optional[int] = None
+
+class OturumSonucu(BaseModel):
+    oturum_id: str
+    surum: int
+    hasar_detaylari: List[HasarDetayi]
+    sonuc: TahminSonucu
+
+class IsIstegi(BaseModel):
+    arac: DetayliAracBilgileri
+    mode: TahminModu = "llm"
+    # Yüksek öncelikli işler kuyrukta önce alınır
+    oncelik: int = Field(0, ge=0, le=9)
+    # İş bitince iş durumunun POST edileceği adres; iç ağ adresleri kabul edilmez
+    webhook_url: Optional[str] = Field(None, pattern=r"^https?://")
+
+class IsDurumu(BaseModel):
+    is_id: str
+    durum: Literal["bekliyor", "calisiyor", "tamamlandi", "basarisiz"]
+    oncelik: int
+    # Bekleyen işler için önündeki iş sayısı
+    sira: Optional[int] = None
+    deneme: int
+    olusturma: datetime
+    baslama: Optional[datetime] = None
+    bitis: Optional[datetime] = None
+    sonuc: Optional[TahminSonucu] = None
+    hata: Optional[str] = None
+    webhook_durumu: Optional[str] = None
+
+# LLM zincirleri (LangChain) ilk kullanımda ayrı bir iş parçacığında kurulur.
+# LLM_BASLATMA: "arka_plan" başlangıçta arka planda ısıtır ve hazır olana kadar
+# llm modundaki istekleri yerel motorla yanıtlar; "hemen" hazır olmadan
+# istek kabul etmez; "ilk_kullanim" ilk LLM isteğinde kurar.
+LLM_BASLATMA = os.getenv("LLM_BASLATMA", "arka_plan")
+_zincirler = None
 
-# LangChain Output Parser
-class FiyatTahminParser(BaseOutputParser):
-    def parse(self, text: str) -> dict:
-        try:
-            cleaned_text = re.sub(r'```json\n?|```', '', text).strip()
-            if '{' in cleaned_text and '}' in cleaned_text:
-                json_start = cleaned_text.find('{')
-                json_end = cleaned_text.rfind('}') + 1
-                return json.loads(cleaned_text[json_start:json_end])
-        except Exception:
-            pass
-        min_fiyat_match = re.search(r'"tahmini_fiyat_min":\s*(\d+)', text)
-        max_fiyat_match = re.search(r'"tahmini_fiyat_max":\s*(\d+)', text)
-        ortalama_fiyat_match = re.search(r'"ortalama_fiyat":\s*(\d+)', text)
-        min_fiyat = int(min_fiyat_match.group(1)) if min_fiyat_match else 0
-        max_fiyat = int(max_fiyat_match.group(1)) if max_fiyat_match else 0
-        ortalama_fiyat = int(ortalama_fiyat_match.group(1)) if ortalama_fiyat_match else 0
-        return {
-            "tahmini_fiyat_min": min_fiyat, "tahmini_fiyat_max": max_fiyat, "ortalama_fiyat": ortalama_fiyat,
-            "rapor": "Rapor ayrıştırılamadı. Ham metin: " + text, 
-            "pazar_analizi": "Pazar analizi ayrıştırılamadı."
-        }
-
-# LangChain Prompt Templates
-hizli_tahmin_prompt = PromptTemplate.from_template(
-    """Sen bir otomotiv uzmanısın ve Türkiye'deki ikinci el araç piyasasını çok iyi biliyorsun.
-    Aşağıdaki araç için güncel pazar değerini hızlıca analiz et ve bir fiyat aralığı sun.
-    ARAÇ BİLGİLERİ: Marka: {marka}, Model: {model}, Yıl: {yil}, Kilometre: {kilometre} km, Yakıt: {yakit_tipi}, Vites: {vites_tipi}, İl: {il}, Motor Hacmi: {motor_hacmi}L, Motor Gücü: {motor_gucu}HP.
-    GÖREV: 
-    1.  Bu araç için Türkiye pazarında güncel ve gerçekçi bir fiyat aralığı (min, max, ortalama) belirle.
-    2.  **Rapor Alanı (HTML):** Fiyatı etkileyen en önemli 2-3 faktörü (örn: modelin popülerliği, kilometre durumu) `<strong>` etiketleriyle vurgulayarak kısaca açıkla.
-    3.  **Pazar Analizi Alanı (HTML):** Bu modelin genel piyasa durumu hakkında 1-2 cümlelik bir yorum yap.
-
-    JSON FORMATI: {{'tahmini_fiyat_min': int, 'tahmini_fiyat_max': int, 'ortalama_fiyat': int, 'rapor': "<p>Rapor metni...</p>", 'pazar_analizi': "<p>Analiz metni...</p>"}}
-    Önemli: Yanıtın sadece JSON formatında olsun ve `rapor` ile `pazar_analizi` alanları geçerli HTML içermelidir."""
+# İstem modu: "klasik" (HTML'i model yazar) ya da "yapisal" (model yalnızca fiyat,
+# faktör ve pazar kodlarını döndürür, HTML rapor_sablonu ile burada üretilir).
+# ISTEM_SISTEM_TALIMATI yapısal modun sabit talimatının nerede durduğunu seçer;
+# GEMINI_ONBELLEK_ICERIGI verilmişse talimat önbelleğe alınmış bağlamdan okunur.
+ISTEM_MODU = os.getenv("ISTEM_MODU", "klasik")
+ISTEM_SISTEM_TALIMATI = "onbellek" if os.getenv("GEMINI_ONBELLEK_ICERIGI") else os.getenv("ISTEM_SISTEM_TALIMATI", "mesaj")
+
+def _zincirleri_kur():
+    global _zincirler
+    baslangic = time.perf_counter()
+    from tahmin_zincirleri import zincirleri_olustur
+
+    _zincirler = zincirleri_olustur(llm_havuzu, ISTEM_MODU, ISTEM_SISTEM_TALIMATI)
+    print(f"LLM zincirleri {time.perf_counter() - baslangic:.2f} sn içinde hazırlandı.")
+    return _zincirler
+
+def zincirler_hazir() -> bool:
+    return _zincirler is not None
+
+async def zincirleri_al():
+    """Zincirleri döndürür; henüz kurulmadılarsa (eş zamanlı çağrıları birleştirerek) kurar."""
+    if _zincirler is not None:
+        return _zincirler
+    return await tahmin_birlestirici.do(("zincirler",), lambda: asyncio.to_thread(_zincirleri_kur))
+
+def _raporu_tamamla(result: dict, arac: AracBilgileri, referans_fiyat: Optional[int] = None) -> dict:
+    """Yapısal modda (model HTML yazmadığında) rapor ve pazar analizini şablondan üretir."""
+    if ISTEM_MODU != "yapisal" or result.get("rapor") or not result.get("ortalama_fiyat"):
+        return result
+    with asama("hizli" if referans_fiyat is None else "detayli", "rapor"):
+        if referans_fiyat is None:
+            result["rapor"], result["pazar_analizi"] = hizli_raporu(arac, result)
+        else:
+            result["rapor"], result["pazar_analizi"] = detayli_raporu(arac, result, referans_fiyat)
+    return result
+
+# Tahmin akışları
+async def _hizli_tahmin_uret(arac: AracBilgileri, anahtar: tuple) -> TahminSonucu:
+    result = _raporu_tamamla(await (await zincirleri_al()).hizli.ainvoke(arac.dict()), arac)
+    sonuc = TahminSonucu(
+        **result, analiz_tarihi=datetime.now().strftime("%Y-%m-%d %H:%M:%S"), tahmin_kaynagi="llm"
+    )
+    # Ayrıştırılamayan yanıtlar (sıfır fiyat) önbelleğe alınmaz.
+    if sonuc.ortalama_fiyat > 0:
+        await hizli_tahmin_onbellegi.yaz(anahtar, sonuc.dict())
+    return sonuc
+
+async def _onbellekten_hizli_tahmin(anahtar: tuple) -> Optional[TahminSonucu]:
+    onbellekteki = await hizli_tahmin_onbellegi.al(anahtar)
+    return TahminSonucu(**onbellekteki) if onbellekteki is not None else None
+
+async def hizli_tahmin(arac: AracBilgileri) -> TahminSonucu:
+    """Önbellekten ya da (eş zamanlı isteklerle birleştirilmiş) hızlı analiz zincirinden sonuç üretir."""
+    anahtar = arac_parmak_izi(arac, TAHMIN_ONBELLEK_KM_ARALIGI)
+    onbellekteki = await _onbellekten_hizli_tahmin(anahtar)
+    if onbellekteki is not None:
+        return onbellekteki
+    # Başka bir işçi aynı aracı analiz ediyorsa sonucu paylaşımlı önbellekte beklenir
+    return await tahmin_birlestirici.do(
+        ("hizli",) + anahtar,
+        lambda: _hizli_tahmin_uret(arac, anahtar),
+        hazir_mi=lambda: _onbellekten_hizli_tahmin(anahtar),
+    )
+
+async def _onbellekteki_hizli_tahmin(arac: AracBilgileri) -> Optional[int]:
+    onbellekteki = await hizli_tahmin_onbellegi.al(arac_parmak_izi(arac, TAHMIN_ONBELLEK_KM_ARALIGI))
+    return onbellekteki["ortalama_fiyat"] if onbellekteki else None
+
+async def _llm_hizli_tahmin(arac: AracBilgileri) -> Optional[int]:
+    return (await hizli_tahmin(arac)).ortalama_fiyat
+
+def _izgara_fiyatlari(arac: AracBilgileri):
+    if fiyat_izgarasi is None:
+        return None
+    return fiyat_izgarasi.ara(arac.marka, arac.model, arac.yil, arac.kilometre,
+                              arac.yakit_tipi, arac.vites_tipi, arac.il)
+
+async def _izgaradaki_referans(arac: AracBilgileri) -> Optional[int]:
+    fiyatlar = _izgara_fiyatlari(arac)
+    return fiyatlar[1] if fiyatlar else None
+
+# Referans fiyat kaynakları, REFERANS_FIYAT_KAYNAKLARI sırasıyla denenir
+REFERANS_KAYNAKLARI = {
+    "onbellek": _onbellekteki_hizli_tahmin,
+    "izgara": _izgaradaki_referans,
+    "pazar": pazar_kaynagi,
+    "llm": _llm_hizli_tahmin,
+}
+# Eski adlar: veritabanı ve tarayıcı kaynakları tek "pazar" kaynağında birleşti
+ESKI_REFERANS_KAYNAKLARI = {"pazar_veritabani": "pazar", "pazar_tarayici": "pazar"}
+
+def _referans_kaynaklari(deger: str) -> list:
+    adlar = [ESKI_REFERANS_KAYNAKLARI.get(ad.strip(), ad.strip()) for ad in deger.split(",") if ad.strip()]
+    bilinmeyenler = [ad for ad in adlar if ad not in REFERANS_KAYNAKLARI]
+    if bilinmeyenler:
+        raise ValueError(
+            f"REFERANS_FIYAT_KAYNAKLARI içinde bilinmeyen kaynak: {', '.join(bilinmeyenler)} "
+            f"(geçerli adlar: {', '.join(REFERANS_KAYNAKLARI)})"
+        )
+    # Eski iki ad aynı kaynağa çevrildiğinden tekrarlar atılır
+    return [(ad, REFERANS_KAYNAKLARI[ad]) for ad in dict.fromkeys(adlar)]
+
+referans_saglayici = ReferansFiyatSaglayici(
+    _referans_kaynaklari(os.getenv("REFERANS_FIYAT_KAYNAKLARI", "onbellek,pazar,llm"))
 )
 
-detayli_tahmin_prompt = PromptTemplate.from_template(
-    """Sen bir otomotiv uzmanısın ve Türkiye'deki ikinci el araç piyasasını çok iyi biliyorsun.
-    GÖREV: Sana verilen referans fiyattan yola çıkarak, aracın ek detaylarına göre fiyattaki değişimleri hesapla ve detaylı bir rapor oluştur.
-    
-    REFERANS BİLGİLER:
-    *   Aracın modeli: {marka} {model} {yil}
-    *   Bu aracın hasarsız ve ortalama kilometredeki piyasa değeri **{referans_fiyat} TL** olarak belirlendi.
-
-    DEĞERLENDİRİLECEK EK DETAYLAR:
-    *   **Kilometre:** {kilometre} km
-    *   **Hasar Listesi:** {hasar_listesi}
-    *   **Diğer Faktörler:** Renk ({renk}), İl ({il}), Ekstra Bilgiler ({ekstra_bilgiler}).
-
-HESAPLAMA VE RAPORLAMA (HTML FORMATINDA):
-    1.  **Değer Kaybı/Artışı Hesapla:** Belirlenen referans fiyattan başlayarak, yukarıdaki 'DEĞERLENDİRİLECEK EK DETAYLAR' bölümündeki her bir faktörün fiyata etkisini TL cinsinden hesapla.
-    2.  **Nihai Fiyatı Belirle:** Referans fiyattan toplam değer kayıplarını düşüp, artışları ekleyerek aracın yeni nihai fiyat aralığını (minimum, maksimum, ortalama) hesapla.
-    3.  **Rapor Oluştur:**
-        *   `<h4>Referans Fiyat</h4>` başlığı altında başlangıç fiyatını belirt.
-        *   `<h4>Değer Kaybı/Artışı Analizi</h4>` başlığı altında, değerlendirdiğin her faktörü `<li><strong>Faktör Adı:</strong> Açıklama ve +/- TL Etkisi</li>` şeklinde listele.
-        *   `<h4>Nihai Fiyat Tahmini</h4>` başlığı altında ulaştığın sonuçları özetle.
-    4.  **Pazar Analizi Oluştur:** Aracın modelinin genel pazar durumunu (popülerlik, arz-talep) özetle.
-
-    JSON FORMATI: {{"tahmini_fiyat_min": int, "tahmini_fiyat_max": int, "ortalama_fiyat": int, "rapor": "<h4>...</h4><ul><li>...</li></ul>", "pazar_analizi": "<p>...</p>"}}
-    Önemli: Yanıtın sadece JSON formatında olsun ve `rapor` ile `pazar_analizi` alanları geçerli HTML içermelidir."""
+def _detayli_analiz_girdisi(arac: DetayliAracBilgileri, referans_fiyat: int) -> dict:
+    # Hasar listesini formatla.
+    hasar_listesi_str = ", ".join([f'{h.parca}: {h.durum}' for h in arac.hasar_detaylari if h.parca and h.durum]) or "Hasar yok"
+    return {
+        **arac.dict(),
+        "referans_fiyat": f'{referans_fiyat:,}',
+        "hasar_listesi": hasar_listesi_str
+    }
+
+async def _detayli_tahmin_uret(arac: DetayliAracBilgileri) -> TahminSonucu:
+    # 1. Adım: Referans fiyatı önbellek, pazar verisi ve (son çare) hızlı analiz zincirinden al.
+    with asama("detayli", "referans"):
+        referans_fiyat, referans_kaynagi = await referans_saglayici.referans_fiyat(arac)
+
+    # 2. Adım: Elde edilen referans fiyatı ve diğer detayları kullanarak "Detaylı Analiz" zincirini çağır.
+    detayli_analiz_input = _detayli_analiz_girdisi(arac, referans_fiyat)
+    result = _raporu_tamamla(await (await zincirleri_al()).detayli.ainvoke(detayli_analiz_input), arac, referans_fiyat)
+
+    return TahminSonucu(
+        **result,
+        analiz_tarihi=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        referans_fiyat=referans_fiyat,
+        referans_kaynagi=referans_kaynagi,
+        tahmin_kaynagi="llm",
+    )
+
+async def detayli_tahmin(arac: DetayliAracBilgileri) -> TahminSonucu:
+    """Aynı detaylı isteği eş zamanlı gönderen istemcileri tek bir analizde birleştirir."""
+    anahtar = arac_parmak_izi(
+        arac, TAHMIN_ONBELLEK_KM_ARALIGI, ek_alanlar=("renk", "ekstra_bilgiler", "hasar_detaylari")
+    )
+    return await tahmin_birlestirici.do(("detayli",) + anahtar, lambda: _detayli_tahmin_uret(arac))
+
+def izgara_tahmini(arac: AracBilgileri) -> Optional[TahminSonucu]:
+    """Araç fiyat ızgarasındaysa LLM'siz, sabit sürede hızlı tahmin; değilse None."""
+    with asama("hizli", "izgara"):
+        fiyatlar = _izgara_fiyatlari(arac)
+        if fiyatlar is None:
+            return None
+        result = dict(zip(("tahmini_fiyat_min", "ortalama_fiyat", "tahmini_fiyat_max"), fiyatlar))
+        result["rapor"], result["pazar_analizi"] = hizli_raporu(arac, result)
+    return TahminSonucu(
+        **result, analiz_tarihi=datetime.now().strftime("%Y-%m-%d %H:%M:%S"), tahmin_kaynagi="izgara"
+    )
+
+async def yerel_hizli_tahmin(arac: AracBilgileri) -> TahminSonucu:
+    result = yerel_motor.hizli(arac)
+    return TahminSonucu(
+        **result, analiz_tarihi=datetime.now().strftime("%Y-%m-%d %H:%M:%S"), tahmin_kaynagi="yerel"
+    )
+
+async def yerel_detayli_tahmin(arac: DetayliAracBilgileri) -> TahminSonucu:
+    result = yerel_motor.detayli(arac)
+    return TahminSonucu(
+        **result,
+        analiz_tarihi=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        referans_kaynagi="yerel",
+        tahmin_kaynagi="yerel",
+    )
+
+async def _yerel_yedekli(llm_tahmini, yerel_tahmin) -> TahminSonucu:
+    """LLM tahmini hata verirse, zaman aşımına uğrarsa ya da fiyat ayrıştırılamazsa yerel motora düşer."""
+    if not YEREL_YEDEK_AKTIF:
+        return await llm_tahmini()
+    if LLM_BASLATMA == "arka_plan" and not zincirler_hazir():
+        # Zincirler arka planda ısınırken istekler beklemeden yerel motorla yanıtlanır
+        return await yerel_tahmin()
+    try:
+        sonuc = await asyncio.wait_for(llm_tahmini(), YEREL_YEDEK_ZAMAN_ASIMI or None)
+        if sonuc.ortalama_fiyat > 0:
+            return sonuc
+        print("LLM fiyat üretemedi, yerel motor kullanılıyor.")
+    except asyncio.TimeoutError:
+        print(f"LLM {YEREL_YEDEK_ZAMAN_ASIMI} sn içinde yanıt vermedi, yerel motor kullanılıyor.")
+    except Exception as e:
+        print(f"LLM tahmini başarısız ({e}), yerel motor kullanılıyor.")
+    return await yerel_tahmin()
+
+async def _tahmin_uret(arac: AracBilgileri, mode: TahminModu) -> TahminSonucu:
+    if isinstance(arac, DetayliAracBilgileri):
+        if mode == "local":
+            return await yerel_detayli_tahmin(arac)
+        return await _yerel_yedekli(lambda: detayli_tahmin(arac), lambda: yerel_detayli_tahmin(arac))
+    if mode in FIYAT_IZGARASI_MODLARI:
+        sonuc = izgara_tahmini(arac)
+        if sonuc is not None:
+            return sonuc
+    if mode == "local":
+        return await yerel_hizli_tahmin(arac)
+    return await _yerel_yedekli(lambda: hizli_tahmin(arac), lambda: yerel_hizli_tahmin(arac))
+
+def _token_kullanimi(hesap: dict) -> TokenKullanimi:
+    return TokenKullanimi(
+        girdi_token=hesap["girdi"],
+        cikti_token=hesap["cikti"],
+        toplam_token=hesap["girdi"] + hesap["cikti"],
+        llm_cagrisi=hesap["cagri"],
+        istem_modu=ISTEM_MODU,
+    )
+
+async def tahmin_et(arac: AracBilgileri, mode: TahminModu = "llm") -> TahminSonucu:
+    """Aracın tipine ve moda göre uygun tahmin akışını çalıştırır ve token dökümünü ekler."""
+    with token_hesabi() as hesap:
+        sonuc = await _tahmin_uret(arac, mode)
+    # Birleştirilen istekler aynı nesneyi paylaşır; döküm kopyaya yazılır
+    return sonuc.copy(update={"token_kullanimi": _token_kullanimi(hesap)})
+
+def _sse_olayi(olay: str, veri: dict) -> str:
+    return f"event: {olay}\ndata: {json.dumps(veri, ensure_ascii=False)}\n\n"
+
+async def detayli_tahmin_akisi(arac: DetayliAracBilgileri):
+    """Detaylı analizi Server-Sent Events olayları olarak üretir.
+
+    Olaylar: `referans` (referans fiyat ve kaynağı), `fiyat` (sayısal alanlar
+    tamamlandıkça), `rapor` (rapor/pazar analizi HTML parçaları), `sonuc`
+    (ayrıştırılmış TahminSonucu) ve hata durumunda `hata`.
+    """
+    try:
+        with asama("detayli", "referans"):
+            referans_fiyat, referans_kaynagi = await referans_saglayici.referans_fiyat(arac)
+        yield _sse_olayi("referans", {"referans_fiyat": referans_fiyat, "referans_kaynagi": referans_kaynagi})
+
+        ayristirici = AkisliJsonAyristirici()
+        ham_metin = []
+        # Token sayıları parçalardan toplanır (bağlam değişkeni yield'ler boyunca tutulmaz)
+        hesap = {"girdi": 0, "cikti": 0, "cagri": 1}
+        async for parca in (await zincirleri_al()).detayli_akis.astream(_detayli_analiz_girdisi(arac, referans_fiyat)):
+            metin = parca.content if isinstance(parca.content, str) else "".join(
+                p.get("text", "") if isinstance(p, dict) else str(p) for p in parca.content
+            )
+            ham_metin.append(metin)
+            kullanim = getattr(parca, "usage_metadata", None) or {}
+            hesap["girdi"] += kullanim.get("input_tokens", 0)
+            hesap["cikti"] += kullanim.get("output_tokens", 0)
+            for tip, alan, deger in ayristirici.besle(metin):
+                if tip == "parca":
+                    yield _sse_olayi("rapor", {"alan": alan, "parca": deger})
+                elif alan in ("tahmini_fiyat_min", "tahmini_fiyat_max", "ortalama_fiyat"):
+                    yield _sse_olayi("fiyat", {"alan": alan, "deger": deger})
+
+        result = tahmin_ayristirici.ayristir("".join(ham_metin))
+        if ISTEM_MODU == "yapisal" and not result["rapor"]:
+            # Yapısal modda HTML akmaz; şablondan üretilen rapor tek parça olarak gönderilir
+            _raporu_tamamla(result, arac, referans_fiyat)
+            for alan in ("rapor", "pazar_analizi"):
+                yield _sse_olayi("rapor", {"alan": alan, "parca": result[alan]})
+        sonuc = TahminSonucu(
+            **result,
+            analiz_tarihi=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            referans_fiyat=referans_fiyat,
+            referans_kaynagi=referans_kaynagi,
+            tahmin_kaynagi="llm",
+            token_kullanimi=_token_kullanimi(hesap),
+        )
+        yield _sse_olayi("sonuc", sonuc.dict())
+    except Exception as e:
+        yield _sse_olayi("hata", {"detail": f"Detaylı tahmin sırasında hata: {str(e)}"})
+
+def _tahmin_anahtari(arac: AracBilgileri) -> tuple:
+    if isinstance(arac, DetayliAracBilgileri):
+        return ("detayli",) + arac_parmak_izi(
+            arac, TAHMIN_ONBELLEK_KM_ARALIGI, ek_alanlar=("renk", "ekstra_bilgiler", "hasar_detaylari")
+        )
+    return ("hizli",) + arac_parmak_izi(arac, TAHMIN_ONBELLEK_KM_ARALIGI)
+
+def _toplu_yurutucu(istek: TopluTahminIstegi):
+    if len(istek.araclar) > TOPLU_TAHMIN_MAX_ARAC:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Bir istekte en fazla {TOPLU_TAHMIN_MAX_ARAC} araç gönderilebilir.",
+        )
+    eszamanlilik = min(istek.eszamanlilik or TOPLU_TAHMIN_ESZAMANLILIK, TOPLU_TAHMIN_MAX_ESZAMANLILIK)
+    return toplu_calistir(
+        istek.araclar,
+        lambda arac: tahmin_et(arac, istek.mode),
+        _tahmin_anahtari,
+        eszamanlilik=eszamanlilik,
+        zaman_asimi=istek.oge_zaman_asimi or TOPLU_TAHMIN_OGE_ZAMAN_ASIMI,
+    )
+
+async def _isi_isle(yuk: dict) -> dict:
+    arac = DetayliAracBilgileri(**yuk["arac"])
+    return (await tahmin_et(arac, yuk["mode"])).dict()
+
+# Detaylı tahmin işleri: istekler veritabanındaki kuyruğa yazılır ve sınırlı sayıda
+# işçiyle işlenir; açık bağlantı sayısı LLM eş zamanlılığından bağımsızdır
+is_kuyrugu = IsKuyrugu(
+    _isi_isle,
+    isci_sayisi=int(os.getenv("IS_KUYRUGU_ISCI_SAYISI", "4")),
+    max_bekleyen=int(os.getenv("IS_KUYRUGU_MAX_BEKLEYEN", "1000")),
+    zaman_asimi=float(os.getenv("IS_ZAMAN_ASIMI", "120")),
+    max_deneme=int(os.getenv("IS_MAX_DENEME", "3")),
+    saklama_suresi=float(os.getenv("IS_SAKLAMA_SURESI", "86400")),
+    yoklama_araligi=float(os.getenv("IS_KUYRUGU_YOKLAMA_ARALIGI", "1")),
+    webhook_deneme=int(os.getenv("IS_WEBHOOK_DENEME", "3")),
+    webhook_zaman_asimi=float(os.getenv("IS_WEBHOOK_ZAMAN_ASIMI", "10")),
+    webhook_sirri=os.getenv("IS_WEBHOOK_SIRRI") or None,
+    webhook_izinli_hostlar=os.getenv("IS_WEBHOOK_IZINLI_HOSTLAR", "").split(","),
 )
 
-# LangChain Chains
-hizli_tahmin_chain = hizli_tahmin_prompt | llm | FiyatTahminParser()
-detayli_tahmin_chain = detayli_tahmin_prompt | llm | FiyatTahminParser()
+# Uygulama yaşam döngüsü
+@app.on_event("startup")
+async def baslangic():
+    # Pazar verisi tablolarını ve indekslerini oluştur
+    await asyncio.to_thread(init_db)
+    # Kuyruk işçileri önceki çalıştırmadan kalan işleri de alır
+    is_kuyrugu.start()
+    # Pazar verisi yenileme işçilerini başlat ve popüler modelleri arka planda önbelleğe al
+    market_cache.start()
+    asyncio.create_task(market_cache.warm_up(PAZAR_ONBELLEK_ISITMA_ADEDI))
+    if not llm_havuzu.yapilandirildi:
+        print("GEMINI_API_KEY ayarlanmamış: LLM istekleri yerel motorla yanıtlanacak.")
+    elif LLM_BASLATMA == "hemen":
+        await zincirleri_al()
+    elif LLM_BASLATMA == "arka_plan":
+        asyncio.create_task(zincirleri_al())
+
+@app.on_event("shutdown")
+async def kapanis():
+    # Yenileme işçilerini durdur ve scraper'ın paylaşılan HTTP oturumunu kapat
+    await market_cache.stop()
+    # Yarıda kalan işler kuyruğa geri bırakılır
+    await is_kuyrugu.stop()
+    await scraper.close()
+    await paylasimli_durum.kapat()
 
 # API Endpoints
 @app.get("/")
@@ -163,39 +569,264 @@ async def root():
     return {"message": "FiyatIQ API v5.0 çalışıyor!"}
 
 @app.post("/hizli-tahmin", response_model=TahminSonucu)
-async def hizli_fiyat_tahmini(arac: AracBilgileri):
+async def hizli_fiyat_tahmini(arac: AracBilgileri, mode: TahminModu = "llm"):
     try:
-        result = await hizli_tahmin_chain.ainvoke(arac.dict())
-        return TahminSonucu(**result, analiz_tarihi=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        return await tahmin_et(arac, mode)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Hızlı tahmin sırasında hata: {str(e)}")
 
 @app.post("/detayli-tahmin", response_model=TahminSonucu)
-async def detayli_fiyat_tahmini(arac: DetayliAracBilgileri):
+async def detayli_fiyat_tahmini(arac: DetayliAracBilgileri, mode: TahminModu = "llm"):
+    try:
+        return await tahmin_et(arac, mode)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Detaylı tahmin sırasında hata: {str(e)}")
+
+@app.post("/detayli-tahmin/akis")
+async def detayli_fiyat_tahmini_akis(arac: DetayliAracBilgileri):
+    return StreamingResponse(
+        detayli_tahmin_akisi(arac),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _oturum_sonucu(oturum_id: str, oturum: dict, sonuc: TahminSonucu) -> OturumSonucu:
+    return OturumSonucu(
+        oturum_id=oturum_id,
+        surum=oturum["surum"],
+        hasar_detaylari=[HasarDetayi(parca=h["parca"], durum=h["durum"]) for h in oturum["hasarlar"]],
+        sonuc=sonuc,
+    )
+
+@app.post("/detayli-tahmin/oturum", response_model=OturumSonucu)
+async def detayli_tahmin_oturumu(arac: DetayliAracBilgileri, response: Response, mode: TahminModu = "llm"):
+    """Detaylı tahmini yapar ve hasar farklarıyla güncellenebilecek bir oturum açar."""
     try:
-        # 1. Adım: Güvenilir bir referans fiyat almak için önce "Hızlı Analiz" zincirini çağır.
-        hizli_analiz_sonucu = await hizli_tahmin_chain.ainvoke(arac.dict())
-        referans_fiyat = hizli_analiz_sonucu.get('ortalama_fiyat', 0)
-
-        if referans_fiyat == 0:
-            raise HTTPException(status_code=500, detail="Referans fiyat alınamadı, detaylı analiz yapılamıyor.")
-
-        # 2. Adım: Hasar listesini formatla.
-        hasar_listesi_str = ", ".join([f'{h.parca}: {h.durum}' for h in arac.hasar_detaylari if h.parca and h.durum]) or "Hasar yok"
-
-        # 3. Adım: Elde edilen referans fiyatı ve diğer detayları kullanarak "Detaylı Analiz" zincirini çağır.
-        detayli_analiz_input = {
-            **arac.dict(),
-            "referans_fiyat": f'{referans_fiyat:,}',
-            "hasar_listesi": hasar_listesi_str
-        }
-        
-        result = await detayli_tahmin_chain.ainvoke(detayli_analiz_input)
-
-        return TahminSonucu(**result, analiz_tarihi=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        sonuc = await tahmin_et(arac, mode)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Detaylı tahmin sırasında hata: {str(e)}")
+    oturum = oturum_olustur(arac.dict(), sonuc.dict())
+    response.headers["ETag"] = f'"{oturum["surum"]}"'
+    return _oturum_sonucu(await tahmin_oturumlari.yaz(oturum), oturum, sonuc)
+
+def _if_match_surumu(if_match: Optional[str]) -> Optional[int]:
+    """`If-Match: "3"` (ya da W/"3") başlığındaki oturum sürümü."""
+    if not if_match:
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match başlığı oturum sürümü olmalı.")
+
+@app.patch("/detayli-tahmin/oturum/{oturum_id}", response_model=OturumSonucu)
+async def detayli_tahmin_oturumu_guncelle(
+    oturum_id: str, degisiklik: HasarDegisikligi, response: Response, if_match: Optional[str] = Header(None)
+):
+    """Hasar farkını uygular; referans fiyat korunur, LLM çağrısı yapılmaz."""
+    surum = degisiklik.surum if degisiklik.surum is not None else _if_match_surumu(if_match)
+    if surum is None:
+        raise HTTPException(
+            status_code=428, detail="Oturum sürümü `surum` alanında ya da If-Match başlığında gönderilmeli."
+        )
+
+    def uygula(oturum: dict) -> dict:
+        with asama("oturum", "guncelle"):
+            return hasarlari_guncelle(
+                oturum, [h.dict() for h in degisiklik.ekle], [h.dict() for h in degisiklik.cikar]
+            )
+
+    try:
+        oturum = await tahmin_oturumlari.guncelle(oturum_id, surum, uygula)
+    except OturumBulunamadi:
+        raise HTTPException(status_code=404, detail="Oturum bulunamadı ya da süresi doldu.")
+    except SurumCakismasi as e:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Oturum başka bir istekle güncellendi (güncel sürüm {e.guncel_surum}); yeniden okuyup tekrar deneyin.",
+            headers={"ETag": f'"{e.guncel_surum}"'},
+        )
+    except GecersizHasarDegisikligi as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    with asama("oturum", "rapor"):
+        hasarlar = [HasarDetayi(parca=h["parca"], durum=h["durum"]) for h in oturum["hasarlar"]]
+        arac = DetayliAracBilgileri(**oturum["arac"], hasar_detaylari=hasarlar)
+        result = oturum_sonucu(oturum, arac)
+    sonuc = TahminSonucu(
+        **result,
+        analiz_tarihi=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        referans_fiyat=oturum["referans_fiyat"],
+        referans_kaynagi=oturum["referans_kaynagi"],
+        tahmin_kaynagi="oturum",
+        token_kullanimi=TokenKullanimi(istem_modu=ISTEM_MODU),
+    )
+    response.headers["ETag"] = f'"{oturum["surum"]}"'
+    return _oturum_sonucu(oturum_id, oturum, sonuc)
+
+@app.delete("/detayli-tahmin/oturum/{oturum_id}")
+async def detayli_tahmin_oturumu_sil(oturum_id: str):
+    try:
+        await tahmin_oturumlari.sil(oturum_id)
+    except OturumBulunamadi:
+        raise HTTPException(status_code=404, detail="Oturum bulunamadı ya da süresi doldu.")
+    return {"silindi": oturum_id}
+
+@app.post("/detayli-tahmin/is", response_model=IsDurumu, status_code=202)
+async def detayli_tahmin_isi(istek: IsIstegi, response: Response):
+    """Detaylı tahmini kuyruğa alır; sonuç `/isler/{is_id}` ile sorgulanır ya da webhook ile gelir."""
+    try:
+        is_ = await is_kuyrugu.gonder(
+            {"arac": istek.arac.dict(), "mode": istek.mode}, istek.oncelik, istek.webhook_url
+        )
+    except GecersizWebhook as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except KuyrukDolu as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"İş kuyruğu dolu: {e}",
+            headers={"Retry-After": str(max(1, round(is_kuyrugu.tahmini_bekleme())))},
+        )
+    response.headers["Location"] = f"/isler/{is_['is_id']}"
+    return is_
+
+@app.get("/isler/{is_id}", response_model=IsDurumu)
+async def is_durumu(is_id: str):
+    try:
+        return await is_kuyrugu.al(is_id)
+    except IsBulunamadi:
+        raise HTTPException(status_code=404, detail="İş bulunamadı ya da saklama süresi doldu.")
+
+@app.post("/toplu-tahmin", response_model=TopluTahminSonucu)
+async def toplu_fiyat_tahmini(istek: TopluTahminIstegi):
+    sonuclar: List[Optional[TopluTahminOgesi]] = [None] * len(istek.araclar)
+    benzersiz = 0
+    async for toplu_sonuc in _toplu_yurutucu(istek):
+        benzersiz += 1
+        for sira in toplu_sonuc.siralar:
+            sonuclar[sira] = TopluTahminOgesi(sira=sira, sonuc=toplu_sonuc.sonuc, hata=toplu_sonuc.hata)
+    return TopluTahminSonucu(sonuclar=sonuclar, benzersiz_arac_sayisi=benzersiz)
+
+@app.post("/toplu-tahmin/akis")
+async def toplu_fiyat_tahmini_akis(istek: TopluTahminIstegi):
+    """Sonuçları tamamlandıkça NDJSON (satır başına bir JSON) olarak akıtır."""
+    yurutucu = _toplu_yurutucu(istek)
+
+    async def satirlar():
+        async for toplu_sonuc in yurutucu:
+            for sira in toplu_sonuc.siralar:
+                oge = TopluTahminOgesi(sira=sira, sonuc=toplu_sonuc.sonuc, hata=toplu_sonuc.hata)
+                yield oge.json() + "\n"
+
+    return StreamingResponse(satirlar(), media_type="application/x-ndjson")
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "version": "5.0.0"}
\ No newline at end of file
+    return {
+        "status": "healthy",
+        "version": "5.0.0",
+        "llm": {
+            "yapilandirildi": llm_havuzu.yapilandirildi,
+            "zincirler_hazir": zincirler_hazir(),
+            "baslatma": LLM_BASLATMA,
+            "istem_modu": ISTEM_MODU,
+            "sistem_talimati": ISTEM_SISTEM_TALIMATI,
+        },
+        "import_suresi_sn": round(IMPORT_SURESI, 3),
+        "onbellek": {
+            "hizli_tahmin": hizli_tahmin_onbellegi.istatistikler(),
+            "pazar_verisi": market_cache.stats(),
+        },
+        "birlestirici": tahmin_birlestirici.istatistikler(),
+        "oturumlar": tahmin_oturumlari.istatistikler(),
+        "is_kuyrugu": is_kuyrugu.istatistikler(),
+        "fiyat_izgarasi": fiyat_izgarasi.istatistikler() if fiyat_izgarasi else None,
+        "paylasimli_durum": paylasimli_durum.istatistikler(),
+        "referans_kaynaklari": referans_saglayici.istatistikler(),
+        "ayristirici": tahmin_ayristirici.istatistikler(),
+        "llm_havuzu": llm_havuzu.istatistikler(),
+    }
+
+def _uygulama_metrikleri():
+    """Önbellek, birleştirici, ayrıştırıcı ve LLM havuzu sayaçlarını metrik ailelerine çevirir."""
+    onbellekler = {"hizli_tahmin": hizli_tahmin_onbellegi.istatistikler(), "pazar_verisi": market_cache.stats()}
+    yield ("fiyatiq_onbellek_isabet_toplam", "counter", "Önbellek isabetleri",
+           [({"onbellek": ad}, i["isabet"]) for ad, i in onbellekler.items()])
+    yield ("fiyatiq_onbellek_iska_toplam", "counter", "Önbellek ıskaları",
+           [({"onbellek": ad}, i["iska"]) for ad, i in onbellekler.items()])
+    yield ("fiyatiq_onbellek_isabet_orani", "gauge", "Önbellek isabet oranı",
+           [({"onbellek": ad}, i["isabet_orani"]) for ad, i in onbellekler.items()])
+    yield ("fiyatiq_onbellek_kayit_sayisi", "gauge", "Önbellekteki kayıt sayısı",
+           [({"onbellek": ad}, i["kayit_sayisi"]) for ad, i in onbellekler.items()])
+
+    birlestirici = tahmin_birlestirici.istatistikler()
+    yield ("fiyatiq_birlestirici_baslatilan_toplam", "counter", "Başlatılan LLM analizleri",
+           [({}, birlestirici["baslatilan"])])
+    yield ("fiyatiq_birlestirici_birlestirilen_toplam", "counter", "Süren bir analize bağlanan istekler",
+           [({}, birlestirici["birlestirilen"])])
+    if paylasimli_durum.paylasimli:
+        yield ("fiyatiq_birlestirici_paylasilan_toplam", "counter",
+               "Başka bir işçinin analiz sonucuyla yanıtlanan istekler", [({}, birlestirici["paylasilan"])])
+        yield ("fiyatiq_paylasimli_onbellek_isabet_toplam", "counter", "Paylaşımlı önbellek isabetleri",
+               [({"onbellek": "hizli_tahmin"}, onbellekler["hizli_tahmin"]["paylasimli_isabet"])])
+        yield ("fiyatiq_paylasimli_durum_hata_toplam", "counter", "Paylaşımlı durum arka ucu hataları",
+               [({"islem": "onbellek"}, onbellekler["hizli_tahmin"]["paylasimli_hata"]),
+                ({"islem": "kilit"}, birlestirici["kilit_hata"]),
+                ({"islem": "kota"}, paylasimli_durum.istatistikler()["hata"])])
+
+    if fiyat_izgarasi is not None:
+        izgara = fiyat_izgarasi.istatistikler()
+        yield ("fiyatiq_fiyat_izgarasi_sorgu_toplam", "counter", "Fiyat ızgarası sorguları",
+               [({"sonuc": "isabet"}, izgara["isabet"]), ({"sonuc": "iska"}, izgara["iska"])])
+
+    kuyruk = is_kuyrugu.istatistikler()
+    yield ("fiyatiq_is_kuyrugu_derinlik", "gauge", "Kuyrukta bekleyen detaylı tahmin işleri",
+           [({}, kuyruk["derinlik"])])
+    yield ("fiyatiq_is_kuyrugu_mesgul_isci", "gauge", "İş işlemekte olan kuyruk işçileri",
+           [({}, kuyruk["mesgul_isci"])])
+    yield ("fiyatiq_is_kuyrugu_isci_kullanimi", "gauge", "Başlangıçtan beri işçilerin meşgul geçirdiği süre oranı",
+           [({}, kuyruk["kullanim"])])
+    yield ("fiyatiq_is_kuyrugu_mesgul_saniye_toplam", "counter", "İşçilerin iş işleyerek geçirdiği toplam süre",
+           [({}, kuyruk["mesgul_sure_sn"])])
+
+    ayristirici = tahmin_ayristirici.istatistikler()
+    yield ("fiyatiq_ayristirici_kademe_toplam", "counter", "FiyatTahminParser kademe kullanımları",
+           [({"kademe": k}, ayristirici[k]) for k in ("dogrudan", "onarim", "kismi", "basarisiz")])
+
+    yield ("fiyatiq_referans_kaynagi_toplam", "counter", "Kaynak bazında referans fiyat kullanımı",
+           [({"kaynak": ad}, adet) for ad, adet in referans_saglayici.istatistikler().items()])
+
+    istemciler = llm_havuzu.istatistikler()["istemciler"]
+    yield ("fiyatiq_llm_cagri_toplam", "counter", "İstemci bazında LLM çağrıları",
+           [({"istemci": ad}, i["cagri"]) for ad, i in istemciler.items()])
+    hedge = llm_havuzu.istatistikler()["hedge"]
+    if hedge:
+        yield ("fiyatiq_llm_hedge_esik_saniye", "gauge", "Hedge isteğinin gönderildiği gecikme eşiği",
+               [({"profil": p}, h["esik_sn"]) for p, h in hedge.items() if h["esik_sn"] is not None])
+        yield ("fiyatiq_llm_hedge_orani", "gauge", "Hedge gönderilen çağrıların oranı",
+               [({"profil": p}, h["oran"]) for p, h in hedge.items()])
+    yield ("fiyatiq_llm_zincirler_hazir", "gauge", "LLM zincirleri kuruldu mu", [({}, int(zincirler_hazir()))])
+    yield ("fiyatiq_import_suresi_saniye", "gauge", "main modülünün içe aktarma süresi", [({}, IMPORT_SURESI)])
+    yield ("fiyatiq_llm_devre_acik", "gauge", "Devresi açık (atlanan) istemciler",
+           [({"istemci": ad}, int(i["devre"] == "acik")) for ad, i in istemciler.items()])
+
+metrikler.toplayici_ekle(_uygulama_metrikleri)
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus metin biçiminde metrikler."""
+    if not METRIKLER_AKTIF:
+        raise HTTPException(status_code=404, detail="Metrikler devre dışı.")
+    return PlainTextResponse(metrikler.metin(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/metrics/yavas-istekler", include_in_schema=False)
+async def yavas_istek_listesi():
+    """En yavaş isteklerin aşama dökümleri."""
+    if not METRIKLER_AKTIF:
+        raise HTTPException(status_code=404, detail="Metrikler devre dışı.")
+    return {"istekler": yavas_istekler.liste()}
+
+# İçe aktarma süresi bütçesi: soğuk başlatmayı yavaşlatan ağır bir bağımlılık
+# modül düzeyine geri eklenirse başlangıçta uyarı verir
+IMPORT_SURESI = time.perf_counter() - _IMPORT_BASLANGIC
+IMPORT_SURESI_BUTCESI = float(os.getenv("IMPORT_SURESI_BUTCESI_SN", "1.5"))
+if IMPORT_SURESI > IMPORT_SURESI_BUTCESI:
+    print(f"Uyarı: main {IMPORT_SURESI:.2f} sn içinde yüklendi (bütçe {IMPORT_SURESI_BUTCESI:.2f} sn).")
@@ -0,0 +1,202 @@
+"""
+Stale-while-revalidate cache for market data
+Serves the last known snapshot from memory or the database right away and
+refreshes stale entries on a background worker pool, so request latency
+does not depend on scraping latency
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional, Set, Tuple
+
+from cache import TTLLRUCache
+from database import DEGER_SUTUNLARI, SessionLocal
+from web_scraper import (PRICE_INDEX, CarMarketScraper, get_latest_market_data,
+                         save_market_data_batch_to_db, scraper)
+
+MarketKey = Tuple[str, str, int]
+
+
+class MarketDataCache:
+    """Two-tier (in-process LRU + database) market data cache with background refresh"""
+
+    def __init__(self, market_scraper: Optional[CarMarketScraper] = None, session_factory=SessionLocal):
+        self.scraper = market_scraper or scraper
+        self.session_factory = session_factory
+        self.memory = TTLLRUCache(ttl=None, max_kayit=int(os.getenv('MARKET_CACHE_MAX_ENTRIES', '5000')))
+        self.workers = int(os.getenv('MARKET_REFRESH_WORKERS', '4'))
+        # Popular models (by listing count) go stale sooner than rare ones
+        self.popular_listing_count = int(os.getenv('MARKET_POPULAR_LISTING_COUNT', '200'))
+        self.popular_max_age = float(os.getenv('MARKET_FRESH_SECONDS_POPULAR', '3600'))
+        self.default_max_age = float(os.getenv('MARKET_FRESH_SECONDS', '21600'))
+        # A key whose refresh failed is not queued again before its retry time;
+        # the delay doubles with each consecutive failure up to the maximum
+        self.retry_base = float(os.getenv('MARKET_REFRESH_RETRY_SECONDS', '60'))
+        self.retry_max = float(os.getenv('MARKET_REFRESH_RETRY_MAX_SECONDS', '3600'))
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Set[MarketKey] = set()
+        self._locks: Dict[MarketKey, asyncio.Lock] = {}
+        # key -> (monotonic retry time, consecutive failures)
+        self._retry_after: Dict[MarketKey, Tuple[float, int]] = {}
+        self._tasks = []
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def key(self, marka: str, model: str, yil: int) -> MarketKey:
+        return (*PRICE_INDEX.canonical_key(marka, model), yil)
+
+    def max_age(self, key: MarketKey, data: Dict) -> float:
+        """Freshness threshold in seconds, shorter for popular models"""
+        listing_count = data.get('ilan_sayisi') or self.scraper.listing_count(*key)
+        if listing_count >= self.popular_listing_count:
+            return self.popular_max_age
+        return self.default_max_age
+
+    def is_stale(self, key: MarketKey, data: Dict) -> bool:
+        veri_tarihi = data.get('veri_tarihi')
+        if veri_tarihi is None:
+            return True
+        return (datetime.utcnow() - veri_tarihi).total_seconds() > self.max_age(key, data)
+
+    def _read_db(self, key: MarketKey) -> Optional[Dict]:
+        db = self.session_factory()
+        try:
+            row = get_latest_market_data(db, *key)
+        finally:
+            db.close()
+        if row is None:
+            return None
+        return {
+            'marka': row.marka,
+            'model': row.model,
+            'yil': row.yil,
+            **{column: getattr(row, column) for column in DEGER_SUTUNLARI},
+            'kaynak': row.kaynak,
+            'veri_tarihi': row.veri_tarihi
+        }
+
+    def _write_db(self, data: Dict):
+        db = self.session_factory()
+        try:
+            save_market_data_batch_to_db(db, [data])
+        finally:
+            db.close()
+
+    async def get(self, marka: str, model: str, yil: int) -> Dict:
+        """
+        Returns market data immediately: memory first, then the database,
+        then the local price model. Stale or missing entries are queued
+        for a background refresh.
+        """
+        key = self.key(marka, model, yil)
+        data = self.memory.get(key)
+
+        if data is None:
+            try:
+                data = await asyncio.to_thread(self._read_db, key)
+            except Exception as e:
+                print(f"Error reading cached market data: {e}")
+            if data is not None:
+                self.memory.set(key, data)
+
+        if data is None:
+            # Nothing known yet: answer from the price model and scrape in the background
+            self.schedule_refresh(key)
+            return self.scraper.model_market_data(marka, model, yil)
+
+        if self.is_stale(key, data):
+            self.schedule_refresh(key)
+        return data
+
+    def schedule_refresh(self, key: MarketKey) -> bool:
+        """Queues a refresh unless one is already pending or the key is backing off after a failure"""
+        if self._queue is None or key in self._pending:
+            return False
+        retry = self._retry_after.get(key)
+        if retry is not None and time.monotonic() < retry[0]:
+            return False
+        self._pending.add(key)
+        self._queue.put_nowait(key)
+        return True
+
+    async def refresh(self, key: MarketKey) -> Dict:
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            data = await self.scraper.get_depreciation_data_by_damage(*key)
+            await asyncio.to_thread(self._write_db, data)
+            self.memory.set(key, data)
+            self.refreshes += 1
+            return data
+
+    async def _worker(self):
+        while True:
+            key = await self._queue.get()
+            try:
+                await self.refresh(key)
+                self._retry_after.pop(key, None)
+            except Exception as e:
+                self.refresh_errors += 1
+                delay = self._record_failure(key)
+                print(f"Error refreshing market data for {key}: {e} (next attempt in {delay:.0f}s)")
+            finally:
+                self._pending.discard(key)
+                self._locks.pop(key, None)
+                self._queue.task_done()
+
+    def _record_failure(self, key: MarketKey) -> float:
+        """Sets the key's retry time after a failed refresh; returns the delay in seconds"""
+        failures = self._retry_after.pop(key, (0.0, 0))[1] + 1
+        delay = min(self.retry_base * 2 ** (failures - 1), self.retry_max)
+        self._retry_after[key] = (time.monotonic() + delay, failures)
+        # Keys come from requests, so drop the oldest entries once there are more than the cache holds
+        while len(self._retry_after) > self.memory.max_kayit:
+            del self._retry_after[next(iter(self._retry_after))]
+        return delay
+
+    def start(self):
+        """Starts the background refresh workers on the running loop"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._pending.clear()
+
+    def top_models(self, top_n: int, years: int = 10) -> list:
+        """Most listed (marka, model, yil) combinations from the price index"""
+        current_year = datetime.now().year
+        candidates = {
+            (marka, model, yil)
+            for marka, model in PRICE_INDEX.canonical_names.values()
+            for yil in range(current_year - years, current_year + 1)
+        }
+        return sorted(candidates, key=lambda k: self.scraper.listing_count(*k), reverse=True)[:top_n]
+
+    async def warm_up(self, top_n: int) -> int:
+        """Loads the top-N models into memory and refreshes the stale ones"""
+        start = time.monotonic()
+        keys = self.top_models(top_n)
+        for key in keys:
+            await self.get(*key)
+        print(f"Market data cache warmed with {len(keys)} models in {time.monotonic() - start:.2f}s")
+        return len(keys)
+
+    def stats(self) -> Dict:
+        return {
+            **self.memory.istatistikler(),
+            'pending_refreshes': len(self._pending),
+            'backing_off': sum(retry_at > time.monotonic() for retry_at, _ in self._retry_after.values()),
+            'refreshes': self.refreshes,
+            'refresh_errors': self.refresh_errors
+        }
+
+
+market_cache = MarketDataCache()
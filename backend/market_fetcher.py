@@ -0,0 +1,272 @@
+"""
+Asynchronous marketplace fetcher for live listing data
+Shares one pooled aiohttp session, paces requests per host and parses
+listing pages off the event loop
+"""
+
+import asyncio
+import os
+import random
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+import aiohttp
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_rate(spec: str) -> Tuple[int, float]:
+    """Parses a rate such as "30/minute" into (count, period_seconds)"""
+    periods = {'second': 1.0, 'minute': 60.0, 'hour': 3600.0}
+    count, _, unit = spec.partition('/')
+    return int(count), periods.get(unit.strip().rstrip('s'), 60.0)
+
+
+class HostLimiter:
+    """Caps concurrent requests to one host and spaces them to a request rate"""
+
+    def __init__(self, concurrency: int, rate: int, period: float):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.interval = period / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        if self.interval:
+            async with self._lock:
+                now = time.monotonic()
+                wait = self._next_slot - now
+                self._next_slot = max(now, self._next_slot) + self.interval
+            if wait > 0:
+                await asyncio.sleep(wait)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+
+@dataclass
+class Listing:
+    """A single marketplace listing"""
+    price: int
+    damage: Optional[str]
+    title: str = ''
+
+
+@dataclass
+class SourceConfig:
+    """How to build a search URL for a marketplace and where prices live in its HTML"""
+    base_url: str
+    search_path: str
+    row_selector: str
+    price_selector: str
+    text_selectors: List[str] = field(default_factory=list)
+
+
+DEFAULT_SOURCES = {
+    'sahibinden': SourceConfig(
+        base_url='https://www.sahibinden.com',
+        search_path='/{marka}-{model}?a5_min={yil}&a5_max={yil}',
+        row_selector='tr.searchResultsItem',
+        price_selector='.searchResultsPriceValue',
+        text_selectors=['.searchResultsTitleValue', '.searchResultsTagAttributeValue']
+    ),
+    'arabam': SourceConfig(
+        base_url='https://www.arabam.com',
+        search_path='/ikinci-el/otomobil/{marka}-{model}?minYear={yil}&maxYear={yil}',
+        row_selector='tr.listing-list-item',
+        price_selector='.listing-price',
+        text_selectors=['.listing-text-new', '.listing-modelname']
+    ),
+    'otoplus': SourceConfig(
+        base_url='https://www.otoplus.com/al',
+        search_path='/{marka}/{model}?yil={yil}',
+        row_selector='[data-listing]',
+        price_selector='[data-price]',
+        text_selectors=['[data-title]', '[data-damage]']
+    )
+}
+
+# Damage keywords, checked from most to least severe
+DAMAGE_PATTERNS = [
+    # \bpert\b: "ekspertiz" must not read as a write-off
+    ('hasarli', re.compile(r'(ağır\s*hasar|hasar\s*kay[ıi]tl[ıi]|hasarl[ıi]|\bpert\b)', re.IGNORECASE)),
+    ('degisen', re.compile(r'değişen(?!siz)|degisen(?!siz)|değişenli', re.IGNORECASE)),
+    ('boyali', re.compile(r'boyal[ıi]|lokal\s*boya', re.IGNORECASE)),
+    ('hasarsiz', re.compile(r'hatas[ıi]z|hasars[ıi]z|boyas[ıi]z|orijinal', re.IGNORECASE)),
+]
+
+
+def classify_damage(text: str) -> Optional[str]:
+    for damage, pattern in DAMAGE_PATTERNS:
+        if pattern.search(text):
+            return damage
+    return None
+
+
+def parse_price(text: str) -> Optional[int]:
+    digits = re.sub(r'[^\d]', '', text.split(',')[0])
+    return int(digits) if digits else None
+
+
+def parse_listings(html: str, source: SourceConfig) -> List[Listing]:
+    """Extracts listings from a search result page (CPU bound, run in a thread)"""
+    # Imported here so the API process only pays for bs4 once scraping runs
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    listings = []
+    for row in soup.select(source.row_selector):
+        price_node = row.select_one(source.price_selector)
+        if price_node is None:
+            continue
+        price = parse_price(price_node.get('data-price') or price_node.get_text())
+        if not price:
+            continue
+        text = ' '.join(
+            node.get_text(' ', strip=True)
+            for selector in source.text_selectors
+            for node in row.select(selector)
+        )
+        listings.append(Listing(price=price, damage=classify_damage(text), title=text))
+    return listings
+
+
+def aggregate_listings(listings: List[Listing]) -> Dict:
+    """Aggregates listing prices into the market data fields used across the app"""
+    prices = [listing.price for listing in listings]
+    data = {
+        'ortalama_fiyat': int(sum(prices) / len(prices)),
+        'minimum_fiyat': min(prices),
+        'maksimum_fiyat': max(prices),
+        'ilan_sayisi': len(prices)
+    }
+    for damage in ('hasarsiz', 'boyali', 'degisen', 'hasarli'):
+        group = [listing.price for listing in listings if listing.damage == damage]
+        data[f'{damage}_ortalama'] = int(sum(group) / len(group)) if group else None
+    return data
+
+
+class MarketFetcher:
+    """Fetches marketplace pages over one pooled session with per-host limits"""
+
+    def __init__(self, sources: Optional[Dict[str, SourceConfig]] = None,
+                 user_agent: Optional[str] = None):
+        self.sources = sources or DEFAULT_SOURCES
+        self.user_agent = user_agent or os.getenv(
+            'SCRAPING_USER_AGENT',
+            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        )
+        self.rate, self.period = parse_rate(os.getenv('SCRAPING_RATE_LIMIT', '30/minute'))
+        self.host_concurrency = int(os.getenv('SCRAPING_HOST_CONCURRENCY', '2'))
+        self.pool_size = int(os.getenv('SCRAPING_POOL_SIZE', '20'))
+        self.timeout = float(os.getenv('SCRAPING_TIMEOUT', '10'))
+        self.max_retries = int(os.getenv('SCRAPING_MAX_RETRIES', '3'))
+        self.backoff_base = float(os.getenv('SCRAPING_BACKOFF_BASE', '0.5'))
+        # Upper bound on a server's Retry-After, so one response cannot stall a refresh worker
+        self.max_retry_after = float(os.getenv('SCRAPING_MAX_RETRY_AFTER', str(self.timeout)))
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._limiters: Dict[str, HostLimiter] = {}
+        # url -> (etag, last_modified, body) for conditional requests
+        self._validators: 'OrderedDict[str, Tuple[Optional[str], Optional[str], str]]' = OrderedDict()
+        self._max_validators = 1024
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.host_concurrency,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={'User-Agent': self.user_agent, 'Accept-Language': 'tr-TR,tr;q=0.9'},
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    def _get_limiter(self, host: str) -> HostLimiter:
+        if host not in self._limiters:
+            self._limiters[host] = HostLimiter(self.host_concurrency, self.rate, self.period)
+        return self._limiters[host]
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _remember(self, url: str, etag: Optional[str], last_modified: Optional[str], body: str):
+        if not etag and not last_modified:
+            return
+        self._validators[url] = (etag, last_modified, body)
+        self._validators.move_to_end(url)
+        while len(self._validators) > self._max_validators:
+            self._validators.popitem(last=False)
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_retry_after)
+        return self.backoff_base * (2 ** attempt) * (0.5 + random.random())
+
+    async def fetch(self, url: str) -> str:
+        """
+        GETs a page with per-host pacing, retries with jittered backoff on
+        429/5xx and network errors, and ETag/If-Modified-Since revalidation
+        """
+        session = self._get_session()
+        limiter = self._get_limiter(urlsplit(url).netloc)
+        cached = self._validators.get(url)
+        headers = {}
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                async with limiter:
+                    async with session.get(url, headers=headers) as response:
+                        if response.status == 304 and cached:
+                            return cached[2]
+                        if response.status in RETRYABLE_STATUSES:
+                            retry_after = response.headers.get('Retry-After')
+                            error = aiohttp.ClientResponseError(
+                                response.request_info, response.history,
+                                status=response.status, message=response.reason or ''
+                            )
+                        else:
+                            response.raise_for_status()
+                            body = await response.text()
+                            self._remember(url, response.headers.get('ETag'),
+                                           response.headers.get('Last-Modified'), body)
+                            return body
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = e
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+        raise error
+
+    def search_url(self, source: SourceConfig, marka: str, model: str, yil: int) -> str:
+        slug = lambda value: quote('-'.join(value.lower().split()))
+        return source.base_url + source.search_path.format(marka=slug(marka), model=slug(model), yil=yil)
+
+    async def fetch_listings(self, marka: str, model: str, yil: int) -> List[Listing]:
+        """Fetches and parses listings from all sources concurrently, skipping failing sources"""
+        async def from_source(name: str, source: SourceConfig) -> List[Listing]:
+            try:
+                html = await self.fetch(self.search_url(source, marka, model, yil))
+                return await asyncio.to_thread(parse_listings, html, source)
+            except Exception as e:
+                print(f"Error scraping {name}: {e}")
+                return []
+
+        results = await asyncio.gather(*(from_source(n, s) for n, s in self.sources.items()))
+        return [listing for listings in results for listing in listings]
@@ -0,0 +1,327 @@
+"""Metrikler
+
+Prometheus metin biçiminde (`/metrics`) sunulan küçük bir metrik kaydı:
+etiketli sayaçlar, histogramlar ve okuma anında değer üreten toplayıcılar.
+İstek başına aşama süreleri (`asama`) hem histogramlara hem de isteğe
+bağlı `Server-Timing` başlığına yazılır; en yavaş istekler aşama
+dökümleri ve LLM token sayılarıyla (`token_hesabi`) birlikte saklanır.
+"""
+
+import heapq
+import json
+import os
+import random
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from itertools import count
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Saniye cinsinden varsayılan gecikme kovaları (yerel motordan yavaş LLM çağrılarına kadar)
+SURE_KOVALARI = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+# (metrik_adi, tur, aciklama, [(etiketler, deger)])
+MetrikAilesi = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _etiket_metni(etiketler: Dict[str, str]) -> str:
+    if not etiketler:
+        return ""
+    parcalar = []
+    for ad, deger in etiketler.items():
+        deger = str(deger).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parcalar.append(f'{ad}="{deger}"')
+    return "{" + ",".join(parcalar) + "}"
+
+
+def _sayi_metni(deger: float) -> str:
+    if deger == float("inf"):
+        return "+Inf"
+    if float(deger).is_integer():
+        return str(int(deger))
+    return repr(float(deger))
+
+
+class Sayac:
+    """Yalnızca artan, etiketli sayaç."""
+
+    tur = "counter"
+
+    def __init__(self, ad: str, aciklama: str, etiket_adlari: Sequence[str] = ()):
+        self.ad = ad
+        self.aciklama = aciklama
+        self.etiket_adlari = tuple(etiket_adlari)
+        self._degerler: Dict[Tuple[str, ...], float] = {}
+
+    def artir(self, deger: float = 1, **etiketler):
+        anahtar = tuple(str(etiketler.get(ad, "")) for ad in self.etiket_adlari)
+        self._degerler[anahtar] = self._degerler.get(anahtar, 0) + deger
+
+    def satirlar(self) -> Iterable[str]:
+        for anahtar, deger in self._degerler.items():
+            yield f"{self.ad}{_etiket_metni(dict(zip(self.etiket_adlari, anahtar)))} {_sayi_metni(deger)}"
+
+
+class Histogram:
+    """Sabit kovalı, etiketli histogram."""
+
+    tur = "histogram"
+
+    def __init__(self, ad: str, aciklama: str, etiket_adlari: Sequence[str] = (),
+                 kovalar: Sequence[float] = SURE_KOVALARI):
+        self.ad = ad
+        self.aciklama = aciklama
+        self.etiket_adlari = tuple(etiket_adlari)
+        self.kovalar = tuple(sorted(kovalar))
+        # etiketler -> [kova sayıları..., +Inf], toplam, adet
+        self._degerler: Dict[Tuple[str, ...], list] = {}
+
+    def gozlemle(self, deger: float, **etiketler):
+        anahtar = tuple(str(etiketler.get(ad, "")) for ad in self.etiket_adlari)
+        kayit = self._degerler.get(anahtar)
+        if kayit is None:
+            kayit = self._degerler[anahtar] = [[0] * (len(self.kovalar) + 1), 0.0, 0]
+        kayit[0][bisect_left(self.kovalar, deger)] += 1
+        kayit[1] += deger
+        kayit[2] += 1
+
+    def satirlar(self) -> Iterable[str]:
+        for anahtar, (sayilar, toplam, adet) in self._degerler.items():
+            etiketler = dict(zip(self.etiket_adlari, anahtar))
+            birikimli = 0
+            for sinir, sayi in zip(self.kovalar + (float("inf"),), sayilar):
+                birikimli += sayi
+                yield f"{self.ad}_bucket{_etiket_metni({**etiketler, 'le': _sayi_metni(sinir)})} {birikimli}"
+            yield f"{self.ad}_sum{_etiket_metni(etiketler)} {_sayi_metni(toplam)}"
+            yield f"{self.ad}_count{_etiket_metni(etiketler)} {adet}"
+
+
+class MetrikKaydi:
+    """Metrikleri ve toplayıcıları tutar, Prometheus metin biçimine çevirir."""
+
+    def __init__(self):
+        self._metrikler: Dict[str, object] = {}
+        self._toplayicilar: List[Callable[[], Iterable[MetrikAilesi]]] = []
+
+    def sayac(self, ad: str, aciklama: str, etiket_adlari: Sequence[str] = ()) -> Sayac:
+        return self._metrikler.setdefault(ad, Sayac(ad, aciklama, etiket_adlari))
+
+    def histogram(self, ad: str, aciklama: str, etiket_adlari: Sequence[str] = (),
+                  kovalar: Sequence[float] = SURE_KOVALARI) -> Histogram:
+        return self._metrikler.setdefault(ad, Histogram(ad, aciklama, etiket_adlari, kovalar))
+
+    def toplayici_ekle(self, toplayici: Callable[[], Iterable[MetrikAilesi]]):
+        """Okuma anında (ad, tur, aciklama, [(etiketler, deger)]) aileleri üreten fonksiyon ekler."""
+        self._toplayicilar.append(toplayici)
+
+    def metin(self) -> str:
+        satirlar = []
+        for metrik in self._metrikler.values():
+            satirlar.append(f"# HELP {metrik.ad} {metrik.aciklama}")
+            satirlar.append(f"# TYPE {metrik.ad} {metrik.tur}")
+            satirlar.extend(metrik.satirlar())
+        for toplayici in self._toplayicilar:
+            try:
+                aileler = list(toplayici())
+            except Exception as e:
+                print(f"Metrik toplayıcısı hata verdi: {e}")
+                continue
+            for ad, tur, aciklama, ornekler in aileler:
+                satirlar.append(f"# HELP {ad} {aciklama}")
+                satirlar.append(f"# TYPE {ad} {tur}")
+                for etiketler, deger in ornekler:
+                    satirlar.append(f"{ad}{_etiket_metni(etiketler)} {_sayi_metni(deger)}")
+        return "\n".join(satirlar) + "\n"
+
+
+metrikler = MetrikKaydi()
+
+HTTP_ISTEK_SURESI = metrikler.histogram(
+    "fiyatiq_http_istek_suresi_saniye", "Uç nokta başına istek süresi", ("yol", "metod", "durum")
+)
+ASAMA_SURESI = metrikler.histogram(
+    "fiyatiq_asama_suresi_saniye", "Tahmin zinciri aşamalarının süresi", ("zincir", "asama")
+)
+LLM_TOKEN = metrikler.sayac("fiyatiq_llm_token_toplam", "LLM token kullanımı", ("model", "tur"))
+LLM_HATA = metrikler.sayac("fiyatiq_llm_hata_toplam", "Tür bazında LLM çağrı hataları", ("model", "tur"))
+LLM_HEDGE = metrikler.sayac(
+    "fiyatiq_llm_hedge_toplam", "Gönderilen ve yanıtı kullanılan hedge (ikinci) istekleri", ("profil", "sonuc")
+)
+IS_TOPLAM = metrikler.sayac("fiyatiq_is_toplam", "Sonuç bazında detaylı tahmin işleri", ("sonuc",))
+IS_BEKLEME_SURESI = metrikler.histogram(
+    "fiyatiq_is_bekleme_suresi_saniye", "İşlerin kuyrukta bir işçi tarafından alınana kadar beklediği süre"
+)
+IS_WEBHOOK = metrikler.sayac("fiyatiq_is_webhook_toplam", "Webhook teslim denemeleri", ("sonuc",))
+
+# İstek başına (aşama, süre) listesi; ara katman tarafından her istekte yeniden kurulur
+_istek_asamalari: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("istek_asamalari", default=None)
+# Etkin token hesabı (girdi/cikti/cagri sayaçları); `token_hesabi` ile kurulur
+_token_hesabi: ContextVar[Optional[Dict[str, int]]] = ContextVar("token_hesabi", default=None)
+
+
+@contextmanager
+def asama(zincir: str, ad: str):
+    """Bloğun süresini aşama histogramına ve etkin isteğin aşama listesine yazar."""
+    baslangic = time.perf_counter()
+    try:
+        yield
+    finally:
+        sure = time.perf_counter() - baslangic
+        ASAMA_SURESI.gozlemle(sure, zincir=zincir, asama=ad)
+        kayitlar = _istek_asamalari.get()
+        if kayitlar is not None:
+            kayitlar.append((f"{zincir}-{ad}", sure))
+
+
+def llm_kullanimi(model: str, mesaj) -> None:
+    """LangChain mesajındaki `usage_metadata` token sayılarını sayaca ve etkin token hesabına ekler."""
+    kullanim = getattr(mesaj, "usage_metadata", None)
+    if not kullanim:
+        return
+    hesap = _token_hesabi.get()
+    if hesap is not None:
+        hesap["cagri"] += 1
+    for tur, alan in (("girdi", "input_tokens"), ("cikti", "output_tokens")):
+        if kullanim.get(alan):
+            LLM_TOKEN.artir(kullanim[alan], model=model, tur=tur)
+            if hesap is not None:
+                hesap[tur] += kullanim[alan]
+
+
+@contextmanager
+def token_hesabi():
+    """Blok içinde (ve oradan başlatılan görevlerde) yapılan LLM çağrılarının token sayılarını toplar.
+
+    İç içe hesaplar bittiğinde toplamlarını dıştaki hesaba da ekler; böylece
+    ara katmanın istek hesabı uç noktaların kendi hesaplarını da kapsar.
+    """
+    hesap = {"girdi": 0, "cikti": 0, "cagri": 0}
+    dis = _token_hesabi.get()
+    belirtec = _token_hesabi.set(hesap)
+    try:
+        yield hesap
+    finally:
+        _token_hesabi.reset(belirtec)
+        if dis is not None:
+            for ad, deger in hesap.items():
+                dis[ad] += deger
+
+
+class YavasIstekler:
+    """En yavaş `kapasite` isteği aşama dökümleriyle saklar.
+
+    `esik` saniyeden yavaş isteklerin `oran` kadarı ayrıca `dosya`ya
+    JSON satırı olarak eklenir (dosya verilmemişse yalnızca bellekte tutulur).
+    """
+
+    def __init__(self, kapasite: int = 20, esik: float = 5.0, oran: float = 1.0,
+                 dosya: Optional[str] = None):
+        self.kapasite = kapasite
+        self.esik = esik
+        self.oran = oran
+        self.dosya = dosya
+        self._yigin: List[Tuple[float, int, Dict]] = []
+        self._sira = count()
+
+    def kaydet(self, yol: str, metod: str, durum: int, sure: float, asamalar: List[Tuple[str, float]],
+               tokenlar: Optional[Dict[str, int]] = None):
+        if self.kapasite <= 0:
+            return
+        if len(self._yigin) >= self.kapasite and sure <= self._yigin[0][0]:
+            return
+        kayit = {
+            "zaman": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "yol": yol,
+            "metod": metod,
+            "durum": durum,
+            "sure_ms": round(sure * 1000, 2),
+            "asamalar": [{"ad": ad, "sure_ms": round(s * 1000, 2)} for ad, s in asamalar],
+        }
+        if tokenlar and tokenlar["cagri"]:
+            kayit["tokenlar"] = dict(tokenlar)
+        oge = (sure, next(self._sira), kayit)
+        if len(self._yigin) < self.kapasite:
+            heapq.heappush(self._yigin, oge)
+        else:
+            heapq.heapreplace(self._yigin, oge)
+        if self.dosya and sure >= self.esik and random.random() < self.oran:
+            try:
+                with open(self.dosya, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(kayit, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"Yavaş istek dökümü yazılamadı: {e}")
+
+    def liste(self) -> List[Dict]:
+        return [kayit for _, _, kayit in sorted(self._yigin, key=lambda oge: oge[0], reverse=True)]
+
+
+yavas_istekler = YavasIstekler(
+    kapasite=int(os.getenv("METRIK_YAVAS_ISTEK_SAYISI", "20")),
+    esik=float(os.getenv("METRIK_YAVAS_ISTEK_ESIGI", "5")),
+    oran=float(os.getenv("METRIK_YAVAS_ISTEK_ORNEKLEME", "1.0")),
+    dosya=os.getenv("METRIK_YAVAS_ISTEK_DOSYASI") or None,
+)
+
+
+class MetrikAraKatmani:
+    """Her HTTP isteğinin süresini ölçen ASGI ara katmanı.
+
+    `server_timing` açıkken ya da istek `X-Server-Timing: 1` başlığını
+    taşıdığında yanıta aşama sürelerini içeren `Server-Timing` başlığı eklenir.
+    """
+
+    def __init__(self, app, server_timing: bool = False, haric_yollar: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.server_timing = server_timing
+        self.haric_yollar = set(haric_yollar)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.haric_yollar:
+            await self.app(scope, receive, send)
+            return
+
+        asamalar: List[Tuple[str, float]] = []
+        tokenlar = {"girdi": 0, "cikti": 0, "cagri": 0}
+        belirtec = _istek_asamalari.set(asamalar)
+        token_belirteci = _token_hesabi.set(tokenlar)
+        baslangic = time.perf_counter()
+        zamanlama_isteniyor = self.server_timing or any(
+            ad == b"x-server-timing" and deger not in (b"0", b"false") for ad, deger in scope["headers"]
+        )
+        durum = 500
+        bitti = False
+
+        def bitir():
+            nonlocal bitti
+            if bitti:
+                return
+            bitti = True
+            sure = time.perf_counter() - baslangic
+            rota = scope.get("route")
+            yol = getattr(rota, "path", None) or "bilinmeyen"
+            HTTP_ISTEK_SURESI.gozlemle(sure, yol=yol, metod=scope["method"], durum=durum)
+            yavas_istekler.kaydet(yol, scope["method"], durum, sure, asamalar, tokenlar)
+
+        async def gonder(mesaj):
+            nonlocal durum
+            if mesaj["type"] == "http.response.start":
+                durum = mesaj["status"]
+                if zamanlama_isteniyor:
+                    toplam = (time.perf_counter() - baslangic) * 1000
+                    girdiler = [f"{ad};dur={sure * 1000:.1f}" for ad, sure in asamalar]
+                    girdiler.append(f"toplam;dur={toplam:.1f}")
+                    mesaj["headers"] = list(mesaj.get("headers", [])) + [
+                        (b"server-timing", ", ".join(girdiler).encode("latin-1"))
+                    ]
+            await send(mesaj)
+            if mesaj["type"] == "http.response.body" and not mesaj.get("more_body", False):
+                bitir()
+
+        try:
+            await self.app(scope, receive, gonder)
+        finally:
+            bitir()
+            _token_hesabi.reset(token_belirteci)
+            _istek_asamalari.reset(belirtec)
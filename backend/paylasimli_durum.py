@@ -0,0 +1,404 @@
+"""Paylaşımlı Durum
+
+Birden fazla işçi süreciyle (gunicorn + uvicorn) çalışırken tahmin
+önbelleği, tekil uçuş kilitleri ve LLM istek kotası süreçler arasında
+paylaşılmalıdır; aksi halde her işçi aynı aracı ayrı ayrı analiz eder ve
+Gemini kotasını bağımsız olarak tüketir.
+
+Arka uç `PAYLASIMLI_DURUM` ile seçilir:
+
+* ``bellek`` (varsayılan): her şey süreç belleğindedir. Tek süreç için
+  yeterlidir; birden fazla işçide LLM kotası işçi sayısına
+  (`WEB_CONCURRENCY`) bölünür.
+* ``redis``: `REDIS_URL` adresindeki Redis uyumlu sunucu kullanılır
+  (``redis`` paketi gerekir). ``REDIS_URL=bellek://`` süreç içi
+  `BellekRedis` yerine geçeniyle aynı kod yolunu sunucusuz çalıştırır.
+
+Redis erişilemezse önbellek yerel katmana, kilitler süreç içi
+birleştirmeye, kota da işçi payına göre yerel kovaya düşer; istekler
+paylaşılan durum yüzünden başarısız olmaz.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from cache import TTLLRUCache
+from llm_havuzu import TokenKovasi
+from singleflight import SingleFlight
+
+
+def isci_sayisi() -> int:
+    """Aynı düğümde çalışan işçi sayısı (gunicorn yapılandırması WEB_CONCURRENCY'yi ayarlar)."""
+    return max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+
+def anahtar_ozeti(anahtar: Hashable) -> str:
+    """Bir önbellek anahtarını (ör. araç parmak izi) süreçler arasında kararlı bir metne çevirir."""
+    return hashlib.blake2b(repr(anahtar).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class BellekArkaUcu:
+    """Tek süreçlik arka uç: kayıtlar, kilitler ve sayaçlar süreç belleğindedir."""
+
+    ad = "bellek"
+    paylasimli = False
+
+    def __init__(self, surec_sayisi: Optional[int] = None, saat: Callable[[], float] = time.monotonic):
+        self.surec_sayisi = surec_sayisi or isci_sayisi()
+        self._saat = saat
+        self._kayitlar: Dict[str, Tuple[Any, Optional[float]]] = {}
+
+    def _gecerli(self, anahtar: str) -> Any:
+        kayit = self._kayitlar.get(anahtar)
+        if kayit is None:
+            return None
+        if kayit[1] is not None and self._saat() >= kayit[1]:
+            del self._kayitlar[anahtar]
+            return None
+        return kayit[0]
+
+    async def al(self, anahtar: str) -> Any:
+        return self._gecerli(anahtar)
+
+    async def yaz(self, anahtar: str, deger: Any, ttl: Optional[float] = None) -> None:
+        self._kayitlar[anahtar] = (deger, self._saat() + ttl if ttl else None)
+
+    async def sil(self, anahtar: str) -> bool:
+        vardi = self._gecerli(anahtar) is not None
+        self._kayitlar.pop(anahtar, None)
+        return vardi
+
+    async def kilit_al(self, anahtar: str, sure: float) -> Optional[str]:
+        if self._gecerli(anahtar) is not None:
+            return None
+        jeton = uuid.uuid4().hex
+        await self.yaz(anahtar, jeton, sure)
+        return jeton
+
+    async def kilit_birak(self, anahtar: str, jeton: str) -> None:
+        if self._gecerli(anahtar) == jeton:
+            del self._kayitlar[anahtar]
+
+    async def sayac_artir(self, anahtar: str, sure: float) -> int:
+        deger = (self._gecerli(anahtar) or 0) + 1
+        bitis = self._kayitlar[anahtar][1] if deger > 1 else self._saat() + sure
+        self._kayitlar[anahtar] = (deger, bitis)
+        return deger
+
+    def kova(self, ad: str, dakika_basina: float) -> TokenKovasi:
+        # Kota süreçler arasında paylaşılamadığından her işçi kendi payını kullanır
+        return TokenKovasi(dakika_basina / self.surec_sayisi)
+
+    async def kapat(self) -> None:
+        self._kayitlar.clear()
+
+    def istatistikler(self) -> Dict[str, Any]:
+        return {"arka_uc": self.ad, "paylasimli": self.paylasimli, "surec_sayisi": self.surec_sayisi}
+
+
+class RedisArkaUcu:
+    """Redis uyumlu bir sunucu üzerinden süreçler (ve düğümler) arası paylaşılan arka uç.
+
+    Yalnızca GET, SET (PX/NX), DEL, INCR ve PEXPIRE komutları kullanılır;
+    değerler JSON olarak saklanır ve tüm anahtarlar `onek` ile başlar.
+    """
+
+    ad = "redis"
+    paylasimli = True
+
+    def __init__(self, istemci: Any, onek: str = "fiyatiq:", surec_sayisi: Optional[int] = None):
+        self.istemci = istemci
+        self.onek = onek
+        self.surec_sayisi = surec_sayisi or isci_sayisi()
+        self.hata = 0
+
+    async def al(self, anahtar: str) -> Any:
+        ham = await self.istemci.get(self.onek + anahtar)
+        return None if ham is None else json.loads(ham)
+
+    async def yaz(self, anahtar: str, deger: Any, ttl: Optional[float] = None) -> None:
+        await self.istemci.set(
+            self.onek + anahtar, json.dumps(deger, ensure_ascii=False), px=int(ttl * 1000) if ttl else None
+        )
+
+    async def sil(self, anahtar: str) -> bool:
+        return bool(await self.istemci.delete(self.onek + anahtar))
+
+    async def kilit_al(self, anahtar: str, sure: float) -> Optional[str]:
+        jeton = uuid.uuid4().hex
+        alindi = await self.istemci.set(self.onek + anahtar, jeton, px=int(sure * 1000), nx=True)
+        return jeton if alindi else None
+
+    async def kilit_birak(self, anahtar: str, jeton: str) -> None:
+        # Karşılaştır-sil atomik değildir; kilit süresi dolup başkası aldıysa
+        # küçük bir pencerede onun kilidi silinebilir (en kötü ihtimalle bir
+        # analiz iki kez yapılır), bu yüzden betik gerektirmeyen yol seçildi.
+        mevcut = await self.istemci.get(self.onek + anahtar)
+        if isinstance(mevcut, bytes):
+            mevcut = mevcut.decode()
+        if mevcut == jeton:
+            await self.istemci.delete(self.onek + anahtar)
+
+    async def sayac_artir(self, anahtar: str, sure: float) -> int:
+        """Sayaç anahtarını artırır; ilk artışta `sure` saniyelik ömür verir."""
+        deger = await self.istemci.incr(self.onek + anahtar)
+        if deger == 1:
+            await self.istemci.pexpire(self.onek + anahtar, int(sure * 1000))
+        return deger
+
+    def kova(self, ad: str, dakika_basina: float) -> "PaylasimliKova":
+        return PaylasimliKova(self, ad, dakika_basina)
+
+    async def kapat(self) -> None:
+        kapat = getattr(self.istemci, "aclose", None) or getattr(self.istemci, "close", None)
+        if kapat is not None:
+            await kapat()
+
+    def istatistikler(self) -> Dict[str, Any]:
+        return {
+            "arka_uc": self.ad,
+            "paylasimli": self.paylasimli,
+            "surec_sayisi": self.surec_sayisi,
+            "hata": self.hata,
+        }
+
+
+class BellekRedis:
+    """`RedisArkaUcu`nun kullandığı komutları süreç içinde uygulayan Redis yerine geçeni.
+
+    Redis sunucusu olmadan paylaşımlı kod yolunu (serileştirme, kilit ve
+    kota protokolü) denemek için kullanılır: ``REDIS_URL=bellek://``.
+    """
+
+    def __init__(self, saat: Callable[[], float] = time.monotonic):
+        self._saat = saat
+        self._veri: Dict[str, Tuple[Any, Optional[float]]] = {}
+
+    def _oku(self, ad: str) -> Any:
+        kayit = self._veri.get(ad)
+        if kayit is None:
+            return None
+        if kayit[1] is not None and self._saat() >= kayit[1]:
+            del self._veri[ad]
+            return None
+        return kayit[0]
+
+    async def get(self, ad: str) -> Any:
+        return self._oku(ad)
+
+    async def set(self, ad: str, deger: Any, px: Optional[int] = None, nx: bool = False) -> Optional[bool]:
+        if nx and self._oku(ad) is not None:
+            return None
+        self._veri[ad] = (deger, self._saat() + px / 1000 if px else None)
+        return True
+
+    async def delete(self, *adlar: str) -> int:
+        return sum(self._veri.pop(ad, None) is not None for ad in adlar)
+
+    async def incr(self, ad: str) -> int:
+        deger = self._oku(ad)
+        # INCR mevcut ömrü korur
+        bitis = self._veri[ad][1] if deger is not None else None
+        self._veri[ad] = (int(deger or 0) + 1, bitis)
+        return self._veri[ad][0]
+
+    async def pexpire(self, ad: str, ms: int) -> bool:
+        deger = self._oku(ad)
+        if deger is None:
+            return False
+        self._veri[ad] = (deger, self._saat() + ms / 1000)
+        return True
+
+
+class PaylasimliKova:
+    """Süreçler arasında paylaşılan dakika başına istek kotası.
+
+    Zaman `pencere` saniyelik dilimlere bölünür ve her dilimde en fazla
+    `dakika_basina * pencere / 60` istek geçer (yerel `TokenKovasi`nın
+    patlama kapasitesiyle aynı). Sayaçlar arka uçta tutulduğundan tüm
+    işçiler aynı kotayı paylaşır; arka uca ulaşılamazsa işçi payına göre
+    boyutlanmış yerel kovaya düşülür.
+    """
+
+    def __init__(self, arka_uc: RedisArkaUcu, ad: str, dakika_basina: float, pencere: float = 10.0):
+        self.arka_uc = arka_uc
+        self.ad = ad
+        self.pencere = pencere
+        self.hiz = dakika_basina / 60.0
+        self.limit = max(1, int(dakika_basina * pencere / 60))
+        self.yedek = TokenKovasi(dakika_basina / arka_uc.surec_sayisi)
+        self.jeton = float(self.limit)
+
+    async def al(self, zaman_asimi: Optional[float] = None) -> bool:
+        """Bir istek hakkı ayırır; sonraki pencere `zaman_asimi`nden sonra açılacaksa False döner."""
+        if self.hiz <= 0:
+            return True
+        bitis = None if zaman_asimi is None else time.monotonic() + zaman_asimi
+        while True:
+            simdi = time.time()
+            dilim = int(simdi // self.pencere)
+            try:
+                adet = await self.arka_uc.sayac_artir(f"{self.ad}:{dilim}", self.pencere * 2)
+            except Exception:
+                self.arka_uc.hata += 1
+                return await self.yedek.al(None if bitis is None else max(bitis - time.monotonic(), 0))
+            self.jeton = float(max(self.limit - adet, 0))
+            if adet <= self.limit:
+                return True
+            # Bekleyen işçiler aynı anda uyanmasın diye saçılım eklenir
+            bekleme = (dilim + 1) * self.pencere - simdi + random.uniform(0, self.pencere / 10)
+            if bitis is not None and time.monotonic() + bekleme > bitis:
+                return False
+            await asyncio.sleep(bekleme)
+
+
+class PaylasimliOnbellek:
+    """Yerel `TTLLRUCache`in arkasına paylaşımlı ikinci bir katman ekleyen önbellek.
+
+    Okumada önce yerel katmana, ıskada paylaşımlı katmana bakılır ve
+    bulunan değer yerel katmana kopyalanır. Yazma her iki katmana yapılır.
+    Arka uç paylaşımlı değilse yalnızca yerel katman kullanılır.
+    """
+
+    def __init__(self, yerel: TTLLRUCache, arka_uc, ad: str):
+        self.yerel = yerel
+        self.arka_uc = arka_uc
+        self.ad = ad
+        self.paylasimli_isabet = 0
+        self.paylasimli_iska = 0
+        self.paylasimli_hata = 0
+
+    def _anahtar(self, anahtar: Hashable) -> str:
+        return f"onbellek:{self.ad}:{anahtar_ozeti(anahtar)}"
+
+    async def al(self, anahtar: Hashable) -> Any:
+        deger = self.yerel.get(anahtar)
+        if deger is not None or not self.arka_uc.paylasimli:
+            return deger
+        try:
+            deger = await self.arka_uc.al(self._anahtar(anahtar))
+        except Exception:
+            self.paylasimli_hata += 1
+            return None
+        if deger is None:
+            self.paylasimli_iska += 1
+            return None
+        self.paylasimli_isabet += 1
+        self.yerel.set(anahtar, deger)
+        return deger
+
+    async def yaz(self, anahtar: Hashable, deger: Any) -> None:
+        self.yerel.set(anahtar, deger)
+        if not self.arka_uc.paylasimli:
+            return
+        try:
+            await self.arka_uc.yaz(self._anahtar(anahtar), deger, self.yerel.ttl)
+        except Exception:
+            self.paylasimli_hata += 1
+
+    def istatistikler(self) -> Dict[str, Any]:
+        istatistik = self.yerel.istatistikler()
+        if self.arka_uc.paylasimli:
+            istatistik.update(
+                paylasimli_isabet=self.paylasimli_isabet,
+                paylasimli_iska=self.paylasimli_iska,
+                paylasimli_hata=self.paylasimli_hata,
+            )
+        return istatistik
+
+
+class PaylasimliBirlestirici:
+    """Süreç içinde `SingleFlight`, süreçler arasında arka uç kilidiyle birleştiren tekil uçuş.
+
+    `hazir_mi` verilen işlerde kilidi alan işçi işi çalıştırır (sonucu
+    paylaşımlı önbelleğe yazması beklenir); diğer işçiler kilit sürerken
+    `hazir_mi`yi yoklar. Sonuç görünmeden kilit bırakılırsa ya da
+    `bekleme_suresi` dolarsa iş yerel olarak çalıştırılır.
+    """
+
+    def __init__(self, arka_uc, kilit_suresi: float = 30.0, bekleme_suresi: float = 20.0,
+                 yoklama_araligi: float = 0.05):
+        self.arka_uc = arka_uc
+        self.yerel = SingleFlight()
+        self.kilit_suresi = kilit_suresi
+        self.bekleme_suresi = bekleme_suresi
+        self.yoklama_araligi = yoklama_araligi
+        self.kilit_alinan = 0
+        self.paylasilan = 0
+        self.kilit_zaman_asimi = 0
+        self.kilit_hata = 0
+
+    async def do(self, anahtar: Hashable, is_fabrikasi: Callable[[], Awaitable[Any]],
+                 hazir_mi: Optional[Callable[[], Awaitable[Any]]] = None) -> Any:
+        if hazir_mi is None or not self.arka_uc.paylasimli:
+            return await self.yerel.do(anahtar, is_fabrikasi)
+        return await self.yerel.do(anahtar, lambda: self._dagitik(anahtar, is_fabrikasi, hazir_mi))
+
+    async def _dagitik(self, anahtar: Hashable, is_fabrikasi, hazir_mi) -> Any:
+        kilit = f"kilit:{anahtar_ozeti(anahtar)}"
+        bitis = time.monotonic() + self.bekleme_suresi
+        while True:
+            try:
+                jeton = await self.arka_uc.kilit_al(kilit, self.kilit_suresi)
+            except Exception:
+                self.kilit_hata += 1
+                return await is_fabrikasi()
+            if jeton is not None:
+                self.kilit_alinan += 1
+                try:
+                    return await is_fabrikasi()
+                finally:
+                    try:
+                        await self.arka_uc.kilit_birak(kilit, jeton)
+                    except Exception:
+                        self.kilit_hata += 1
+            # Başka bir işçi aynı işi yürütüyor: sonucunu paylaşımlı önbellekte bekle
+            await asyncio.sleep(self.yoklama_araligi)
+            sonuc = await hazir_mi()
+            if sonuc is not None:
+                self.paylasilan += 1
+                return sonuc
+            if time.monotonic() >= bitis:
+                self.kilit_zaman_asimi += 1
+                return await is_fabrikasi()
+
+    def istatistikler(self) -> Dict[str, int]:
+        istatistik = self.yerel.istatistikler()
+        if self.arka_uc.paylasimli:
+            istatistik.update(
+                kilit_alinan=self.kilit_alinan,
+                paylasilan=self.paylasilan,
+                kilit_zaman_asimi=self.kilit_zaman_asimi,
+                kilit_hata=self.kilit_hata,
+            )
+        return istatistik
+
+
+def durum_olustur():
+    """Ortam değişkenlerinden paylaşımlı durum arka ucunu kurar."""
+    tur = os.getenv("PAYLASIMLI_DURUM", "bellek").strip().lower()
+    if tur == "bellek":
+        return BellekArkaUcu()
+    if tur != "redis":
+        raise ValueError(f"Bilinmeyen PAYLASIMLI_DURUM değeri: {tur!r} (bellek ya da redis olmalı)")
+    url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    onek = os.getenv("REDIS_ANAHTAR_ONEKI", "fiyatiq:")
+    if url.startswith("bellek://"):
+        return RedisArkaUcu(BellekRedis(), onek)
+    try:
+        # Yalnızca redis arka ucu seçildiğinde yüklenir
+        import redis.asyncio as redis_asyncio
+    except ImportError as e:
+        raise RuntimeError("PAYLASIMLI_DURUM=redis için 'redis' paketi kurulmalı (pip install redis).") from e
+    istemci = redis_asyncio.Redis.from_url(
+        url,
+        socket_timeout=float(os.getenv("REDIS_ZAMAN_ASIMI", "0.5")),
+        socket_connect_timeout=float(os.getenv("REDIS_ZAMAN_ASIMI", "0.5")),
+    )
+    return RedisArkaUcu(istemci, onek)
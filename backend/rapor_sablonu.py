@@ -0,0 +1,107 @@
+"""Rapor Şablonu
+
+Yapısal istem modunda (`ISTEM_MODU=yapisal`) model yalnızca fiyatları,
+kısa faktör kodlarını (TL etkileriyle) ve bir pazar kodunu döndürür;
+`rapor` ve `pazar_analizi` HTML'i burada sunucu tarafında üretilir.
+Böylece çıktı token sayısı (ve Gemini yanıt süresi) düşer, raporun
+biçimi de modelden bağımsız olarak tutarlı kalır.
+"""
+
+import html
+from typing import Any, Dict, Iterable, List, Tuple
+
+# Modelin kullanabileceği faktör kodları ve rapordaki karşılıkları
+FAKTORLER: Dict[str, str] = {
+    "KM_DUSUK": "Düşük kilometre",
+    "KM_YUKSEK": "Yüksek kilometre",
+    "YAS_GENC": "Genç model yılı",
+    "YAS_ESKI": "Model yaşı",
+    "MODEL_POPULER": "Modelin popülerliği",
+    "MODEL_NADIR": "Az tercih edilen model",
+    "YAKIT_AVANTAJ": "Yakıt tipi avantajı",
+    "YAKIT_DEZAVANTAJ": "Yakıt tipi dezavantajı",
+    "VITES_OTOMATIK": "Otomatik vites talebi",
+    "VITES_MANUEL": "Manuel vites",
+    "MOTOR_GUCLU": "Motor hacmi/gücü",
+    "MOTOR_ZAYIF": "Düşük motor gücü",
+    "IL_TALEP_YUKSEK": "İlde yüksek talep",
+    "IL_TALEP_DUSUK": "İlde düşük talep",
+    "RENK_POPULER": "Tercih edilen renk",
+    "RENK_NADIR": "Az tercih edilen renk",
+    "HASARSIZ": "Hasarsız",
+    "HASAR_BOYA": "Boyalı parçalar",
+    "HASAR_LOKAL_BOYA": "Lokal boyalı parçalar",
+    "HASAR_DEGISEN": "Değişen parçalar",
+    "HASAR_AGIR": "Ağır hasar",
+    "EKSTRA_DONANIM": "Ekstra donanım",
+    "BAKIM_KAYDI": "Bakım geçmişi",
+    "DIGER": "Diğer faktörler",
+}
+
+# Pazar kodları; {arac} araç adıyla doldurulur
+PAZAR_DURUMLARI: Dict[str, str] = {
+    "TALEP_YUKSEK": "{arac} ikinci el piyasada yüksek talep görüyor; ilanlar kısa sürede alıcı buluyor.",
+    "TALEP_DENGELI": "{arac} için arz ve talep dengeli; fiyatlar istikrarlı seyrediyor.",
+    "TALEP_DUSUK": "{arac} için talep sınırlı; satış süresi uzayabilir ve pazarlık payı yüksektir.",
+    "ARZ_DUSUK": "{arac} piyasada az bulunuyor; iyi durumdaki araçlar ortalamanın üzerinde alıcı bulabilir.",
+}
+
+Faktor = Tuple[str, int]
+
+
+def _sayi(deger: float) -> str:
+    return f"{int(deger):,}".replace(",", ".")
+
+
+def _tl(tutar: float) -> str:
+    return f"{_sayi(tutar)} TL"
+
+
+def _etki(tutar: int) -> str:
+    return f"{'+' if tutar > 0 else '-'}{_tl(abs(tutar))}"
+
+
+def _arac_adi(arac: Any) -> str:
+    return f"{html.escape(str(arac.marka))} {html.escape(str(arac.model))} {arac.yil}"
+
+
+def _faktor_listesi(faktorler: Iterable[Faktor]) -> str:
+    satirlar: List[str] = []
+    for kod, tutar in faktorler:
+        etiket = FAKTORLER.get(kod) or html.escape(kod.replace("_", " ").capitalize())
+        etki = f" {_etki(tutar)}" if tutar else ""
+        satirlar.append(f"<li><strong>{etiket}:</strong>{etki}</li>")
+    return f"<ul>{''.join(satirlar)}</ul>" if satirlar else ""
+
+
+def pazar_analizi(arac: Any, kod: str) -> str:
+    sablon = PAZAR_DURUMLARI.get(kod, PAZAR_DURUMLARI["TALEP_DENGELI"])
+    return f"<p>{sablon.format(arac=_arac_adi(arac))}</p>"
+
+
+def hizli_raporu(arac: Any, cikti: Dict[str, Any]) -> Tuple[str, str]:
+    """Hızlı tahmin için (rapor, pazar_analizi) HTML'ini üretir."""
+    rapor = (
+        f"<p>{_arac_adi(arac)} için tahmini piyasa değeri "
+        f"<strong>{_tl(cikti['tahmini_fiyat_min'])} - {_tl(cikti['tahmini_fiyat_max'])}</strong> "
+        f"aralığında, ortalama <strong>{_tl(cikti['ortalama_fiyat'])}</strong>.</p>"
+        + _faktor_listesi(cikti.get("faktorler") or ())
+    )
+    return rapor, pazar_analizi(arac, cikti.get("pazar", ""))
+
+
+def detayli_raporu(arac: Any, cikti: Dict[str, Any], referans_fiyat: int) -> Tuple[str, str]:
+    """Detaylı tahmin için klasik istemdeki başlık yapısını koruyarak (rapor, pazar_analizi) üretir."""
+    faktorler = list(cikti.get("faktorler") or ())
+    toplam_etki = sum(tutar for _, tutar in faktorler)
+    rapor = (
+        "<h4>Referans Fiyat</h4>"
+        f"<p>Hasarsız ve ortalama kilometredeki piyasa değeri: <strong>{_tl(referans_fiyat)}</strong></p>"
+        "<h4>Değer Kaybı/Artışı Analizi</h4>"
+        + (_faktor_listesi(faktorler) or "<p>Fiyatı belirgin şekilde etkileyen ek bir faktör bulunmadı.</p>")
+        + "<h4>Nihai Fiyat Tahmini</h4>"
+        f"<p>Toplam etki {_etki(toplam_etki) if toplam_etki else '0 TL'}; tahmini fiyat aralığı "
+        f"<strong>{_tl(cikti['tahmini_fiyat_min'])} - {_tl(cikti['tahmini_fiyat_max'])}</strong>, "
+        f"ortalama <strong>{_tl(cikti['ortalama_fiyat'])}</strong>.</p>"
+    )
+    return rapor, pazar_analizi(arac, cikti.get("pazar", ""))
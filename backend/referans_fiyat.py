@@ -0,0 +1,55 @@
+"""Referans Fiyat Sağlayıcı
+
+Detaylı tahmin için gereken referans (hasarsız) fiyatı, sırayla
+denenen kaynaklardan elde eder: önbellekteki hızlı tahmin, pazar
+verisi (bellek/veritabanı önbelleği ve web scraper) ve son çare olarak LLM.
+"""
+
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+try:
+    from market_cache import market_cache
+except ImportError:  # Scraper bağımlılıkları kurulu değilse pazar kaynağı devre dışı kalır
+    market_cache = None
+
+# Bir kaynak, aracı alıp referans fiyatı ya da bulamazsa None döndürür
+ReferansKaynagi = Callable[[Any], Awaitable[Optional[int]]]
+
+
+class ReferansFiyatBulunamadi(Exception):
+    """Hiçbir kaynak geçerli bir referans fiyat üretemediğinde fırlatılır."""
+
+
+async def pazar_kaynagi(arac: Any) -> Optional[int]:
+    """Pazar verisi önbelleğindeki (bayat olsa bile) son görüntüden hasarsız ortalama fiyat.
+
+    Bayat ya da eksik kayıtlar arka planda yenilenir; istek scraping'i beklemez.
+    """
+    if market_cache is None:
+        return None
+    try:
+        veri = await market_cache.get(arac.marka, arac.model, arac.yil)
+    except Exception as e:
+        print(f"Pazar verisi okunamadı: {e}")
+        return None
+    return veri.get("hasarsiz_ortalama") or veri.get("ortalama_fiyat")
+
+
+class ReferansFiyatSaglayici:
+    """Kaynakları sırayla dener ve ilk geçerli (pozitif) fiyatı döndürür."""
+
+    def __init__(self, kaynaklar: List[Tuple[str, ReferansKaynagi]]):
+        self.kaynaklar = kaynaklar
+        self.kullanim = {ad: 0 for ad, _ in kaynaklar}
+
+    async def referans_fiyat(self, arac: Any) -> Tuple[int, str]:
+        """(referans_fiyat, kaynak_adi) döndürür."""
+        for ad, kaynak in self.kaynaklar:
+            fiyat = await kaynak(arac)
+            if fiyat and fiyat > 0:
+                self.kullanim[ad] += 1
+                return int(fiyat), ad
+        raise ReferansFiyatBulunamadi("Referans fiyat alınamadı, detaylı analiz yapılamıyor.")
+
+    def istatistikler(self) -> dict:
+        return dict(self.kullanim)
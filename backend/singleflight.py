@@ -0,0 +1,45 @@
+"""Tekil Uçuş (Single-Flight)
+
+Aynı anahtarla eş zamanlı gelen istekleri tek bir çağrıda birleştirir.
+İlk istek işi başlatır, diğerleri aynı görevin sonucunu bekler; hata
+oluşursa bekleyen herkese aynı hata iletilir.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Uçuştaki işleri anahtara göre takip eden birleştirici."""
+
+    def __init__(self):
+        self._ucustakiler: Dict[Hashable, asyncio.Task] = {}
+        self.baslatilan = 0
+        self.birlestirilen = 0
+
+    def __len__(self) -> int:
+        return len(self._ucustakiler)
+
+    async def do(self, anahtar: Hashable, is_fabrikasi: Callable[[], Awaitable[Any]]) -> Any:
+        """`anahtar` için uçuşta bir iş varsa onu bekler, yoksa yenisini başlatır.
+
+        İş ayrı bir görev olarak çalışır ve `shield` ile beklenir; böylece
+        bekleyenlerden birinin iptal edilmesi (ör. istemci bağlantıyı
+        kapattığında) diğerlerinin sonucunu etkilemez.
+        """
+        gorev = self._ucustakiler.get(anahtar)
+        if gorev is None:
+            gorev = asyncio.ensure_future(is_fabrikasi())
+            self._ucustakiler[anahtar] = gorev
+            gorev.add_done_callback(lambda _g: self._ucustakiler.pop(anahtar, None))
+            self.baslatilan += 1
+        else:
+            self.birlestirilen += 1
+        return await asyncio.shield(gorev)
+
+    def istatistikler(self) -> Dict[str, int]:
+        return {
+            "ucustaki": len(self._ucustakiler),
+            "baslatilan": self.baslatilan,
+            "birlestirilen": self.birlestirilen,
+        }
@@ -0,0 +1,350 @@
+"""Tahmin Yanıtı Ayrıştırıcı
+
+LLM'in fiyat tahmini yanıtından JSON nesnesini çıkarır ve doğrular.
+Kademeler sırayla denenir:
+
+1. ``dogrudan``: Tek geçişte parantez eşleştirilerek bulunan blok doğrudan
+   JSON olarak çözülür (orjson kuruluysa onunla).
+2. ``onarim``: Tek tırnaklı metinler, sondaki virgüller, HTML içindeki
+   kaçışsız çift tırnaklar ve Python sabitleri (True/None) düzeltilip
+   tekrar denenir.
+3. ``kismi``: JSON çözülemezse sayısal alanlar metinden tek düzenli
+   ifadeyle toplanır.
+4. ``basarisiz``: Hiçbir fiyat bulunamazsa sıfır fiyatlı sonuç döner.
+
+Sonuç her kademede Pydantic modeliyle doğrulanır; hangi kademenin ne
+sıklıkla kullanıldığı sayaçlarda tutulur.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError, field_validator, model_validator
+
+try:
+    import orjson
+
+    def _json_yukle(metin: str) -> Any:
+        return orjson.loads(metin)
+
+    JSON_HATALARI: Tuple[type, ...] = (orjson.JSONDecodeError, ValueError)
+except ImportError:  # orjson isteğe bağlıdır; yoksa standart kütüphane kullanılır
+    orjson = None
+
+    def _json_yukle(metin: str) -> Any:
+        return json.loads(metin)
+
+    JSON_HATALARI = (ValueError,)
+
+KADEMELER = ("dogrudan", "onarim", "kismi", "basarisiz")
+
+# Bir metnin kapanış tırnağından sonra gelebilecek yapısal karakterler
+_YAPISAL = set(":,}]")
+
+_KACIS_HARFLERI = set('"\\/bfnrtu')
+
+_SAYISAL_ALAN = re.compile(
+    r"""["']?(tahmini_fiyat_min|tahmini_fiyat_max|ortalama_fiyat)["']?\s*:\s*["']?([\d.,]+)"""
+)
+
+
+class TahminCiktisi(BaseModel):
+    """LLM'den beklenen yanıt şeması."""
+
+    tahmini_fiyat_min: int = 0
+    tahmini_fiyat_max: int = 0
+    ortalama_fiyat: int = 0
+    rapor: str = ""
+    pazar_analizi: str = ""
+    # Yapısal istem modunda: [(faktör kodu, TL etkisi)] ve pazar kodu
+    faktorler: List[Tuple[str, int]] = []
+    pazar: str = ""
+
+    @field_validator("tahmini_fiyat_min", "tahmini_fiyat_max", "ortalama_fiyat", mode="before")
+    @classmethod
+    def _fiyati_cevir(cls, deger: Any) -> Any:
+        # "1.250.000 TL" ya da 1250000.0 gibi değerleri tam sayıya çevirir
+        if isinstance(deger, float):
+            return int(deger)
+        if isinstance(deger, str):
+            return _fiyat_metni(deger)
+        if deger is None:
+            return 0
+        return deger
+
+    @field_validator("rapor", "pazar_analizi", "pazar", mode="before")
+    @classmethod
+    def _metne_cevir(cls, deger: Any) -> Any:
+        return "" if deger is None else str(deger)
+
+    @field_validator("faktorler", mode="before")
+    @classmethod
+    def _faktorleri_cevir(cls, deger: Any) -> Any:
+        # ["KOD", -25000], {"kod": "KOD", "tl": -25000} ya da yalnızca "KOD" kabul edilir
+        if not isinstance(deger, list):
+            return []
+        faktorler = []
+        for oge in deger:
+            if isinstance(oge, dict):
+                oge = (oge.get("kod"), oge.get("tl", 0))
+            elif isinstance(oge, str):
+                oge = (oge, 0)
+            if not isinstance(oge, (list, tuple)) or not oge or not isinstance(oge[0], str):
+                continue
+            tutar = oge[1] if len(oge) > 1 else 0
+            if isinstance(tutar, str):
+                isaret = -1 if tutar.strip().startswith("-") else 1
+                tutar = isaret * _fiyat_metni(tutar)
+            elif not isinstance(tutar, (int, float)):
+                tutar = 0
+            faktorler.append((oge[0].strip().upper(), int(tutar)))
+        return faktorler
+
+    @model_validator(mode="after")
+    def _fiyat_sirasi(self) -> "TahminCiktisi":
+        # Fiyat verildiyse tutarlı olmalı; aksi halde sonraki kademeye (ve yerel yedeğe) düşülür
+        fiyatlar = (self.tahmini_fiyat_min, self.ortalama_fiyat, self.tahmini_fiyat_max)
+        if any(fiyatlar) and not 0 < fiyatlar[0] <= fiyatlar[1] <= fiyatlar[2]:
+            raise ValueError("Fiyatlar 0 < tahmini_fiyat_min <= ortalama_fiyat <= tahmini_fiyat_max olmalı.")
+        return self
+
+
+def _fiyat_metni(metin: str) -> int:
+    """Türkçe (1.250.000,50) ya da düz (1250000.5, 1,250,000) yazılmış tutarı tam sayıya çevirir."""
+    metin = re.sub(r"[^\d.,]", "", metin).strip(".,")
+    if not metin:
+        return 0
+    if "." in metin and "," in metin:
+        # İkisi birden varsa sonda olan ondalık ayırıcıdır
+        ondalik = "," if metin.rfind(",") > metin.rfind(".") else "."
+    else:
+        ayirici = "," if "," in metin else "."
+        gruplar = metin.split(ayirici)
+        binlik = ayirici in metin and all(len(g) == 3 for g in gruplar[1:])
+        ondalik = None if binlik else ayirici
+    if ondalik is not None and ondalik in metin:
+        metin = metin.rsplit(ondalik, 1)[0]
+    return int(re.sub(r"\D", "", metin) or 0)
+
+
+def _metin_sonu(metin: str, baslangic: int, tirnak: str) -> int:
+    """`baslangic`taki tırnakla açılan metnin kapanış tırnağının indeksini döndürür.
+
+    Ardından yapısal bir karakter (ya da metin sonu) gelmeyen tırnaklar
+    metnin parçası sayılır; böylece HTML öznitelikleri ve kesme işaretleri
+    metni erken kapatmaz. Kapanış bulunamazsa -1 döner.
+    """
+    i = baslangic + 1
+    uzunluk = len(metin)
+    while i < uzunluk:
+        karakter = metin[i]
+        if karakter == "\\":
+            i += 2
+            continue
+        if karakter == tirnak:
+            j = i + 1
+            while j < uzunluk and metin[j] in " \t\r\n":
+                j += 1
+            if j == uzunluk or metin[j] in _YAPISAL:
+                return i
+        i += 1
+    return -1
+
+
+def json_blogu_bul(metin: str) -> Optional[str]:
+    """Metindeki ilk `{` ile eşleşen `}` arasındaki bloğu tek geçişte bulur.
+
+    Kod bloğu işaretleri ve açıklama metni atlanır; metinlerin içindeki
+    parantezler sayılmaz. Blok kapanmamışsa (yarıda kesilmiş yanıt) None döner.
+    """
+    baslangic = metin.find("{")
+    if baslangic < 0:
+        return None
+    derinlik = 0
+    i = baslangic
+    uzunluk = len(metin)
+    while i < uzunluk:
+        karakter = metin[i]
+        if karakter in "\"'":
+            son = _metin_sonu(metin, i, karakter)
+            if son < 0:
+                return None
+            i = son
+        elif karakter == "{":
+            derinlik += 1
+        elif karakter == "}":
+            derinlik -= 1
+            if derinlik == 0:
+                return metin[baslangic:i + 1]
+        i += 1
+    return None
+
+
+def json_onar(blok: str) -> str:
+    """JSON'a benzeyen bir bloğu geçerli JSON'a dönüştürür.
+
+    Tüm metinler çift tırnakla yeniden yazılır (içlerindeki çift tırnaklar ve
+    satır sonları kaçışlanır), kapanıştan önceki fazla virgüller silinir,
+    tırnaksız anahtarlar tırnaklanır, Python sabitleri JSON karşılıklarına
+    çevrilir ve yarıda kesilmiş yanıtlarda açık kalan parantezler kapatılır.
+    Yarıda kesilmiş yanıtta son öğe eksik olabilecekse (sayı, kapanmamış
+    metin ya da değersiz anahtarla bitiyorsa) atılır: `"ortalama_fiyat": 10`
+    aslında 10 ile başlayan daha uzun bir sayı olabilir.
+    """
+    cikti = []
+    acik = []
+    # Açık her parantez için [geçerli öğenin çıktıdaki başlangıcı, öğede `:` görüldü mü]
+    ogeler = []
+    kesik_metin = False
+    i = 0
+    uzunluk = len(blok)
+    while i < uzunluk:
+        karakter = blok[i]
+        if karakter in "\"'":
+            son = _metin_sonu(blok, i, karakter)
+            if son < 0:
+                son = uzunluk
+                kesik_metin = True
+            cikti.append('"')
+            j = i + 1
+            while j < son:
+                c = blok[j]
+                if c == "\\" and j + 1 < son:
+                    sonraki = blok[j + 1]
+                    if sonraki == "'":
+                        cikti.append("'")
+                    elif sonraki in _KACIS_HARFLERI:
+                        cikti.append(c + sonraki)
+                    else:
+                        cikti.append("\\\\" + sonraki)
+                    j += 2
+                    continue
+                if c == '"':
+                    cikti.append('\\"')
+                elif c == "\n":
+                    cikti.append("\\n")
+                elif c == "\r":
+                    cikti.append("\\r")
+                elif c == "\t":
+                    cikti.append("\\t")
+                else:
+                    cikti.append(c)
+                j += 1
+            cikti.append('"')
+            i = son + 1
+            continue
+        if karakter == ",":
+            j = i + 1
+            while j < uzunluk and blok[j] in " \t\r\n":
+                j += 1
+            if j < uzunluk and blok[j] in "}]":
+                i += 1
+                continue
+            if ogeler:
+                ogeler[-1] = [len(cikti) + 1, False]
+        elif karakter == ":":
+            if ogeler:
+                ogeler[-1][1] = True
+        elif karakter.isalpha() or karakter == "_":
+            j = i
+            while j < uzunluk and (blok[j].isalnum() or blok[j] == "_"):
+                j += 1
+            kelime = blok[i:j]
+            k = j
+            while k < uzunluk and blok[k] in " \t\r\n":
+                k += 1
+            if k < uzunluk and blok[k] == ":":
+                cikti.append(f'"{kelime}"')
+            else:
+                cikti.append({"True": "true", "False": "false", "None": "null"}.get(kelime, kelime))
+            i = j
+            continue
+        elif karakter in "{[":
+            acik.append("}" if karakter == "{" else "]")
+            ogeler.append([len(cikti) + 1, False])
+        elif karakter in "}]" and acik:
+            acik.pop()
+            ogeler.pop()
+        cikti.append(karakter)
+        i += 1
+    if acik:
+        # Yarıda kesilmiş yanıt: eksik olabilecek son öğeyi ve sondaki virgülü at, açık kalanları kapat
+        son_karakter = blok.rstrip()[-1:]
+        tamam = son_karakter in (",", "{", "[") or (
+            not kesik_metin and son_karakter in ("\"", "'", "}", "]")
+            and (acik[-1] == "]" or ogeler[-1][1])
+        )
+        if not tamam:
+            del cikti[ogeler[-1][0]:]
+        while cikti and cikti[-1] in (",", " ", "\n", "\r", "\t"):
+            cikti.pop()
+        cikti.extend(reversed(acik))
+    return "".join(cikti)
+
+
+class TahminAyristirici:
+    """Yanıtı kademeli olarak ayrıştırır ve kademe kullanım sayaçlarını tutar."""
+
+    def __init__(self):
+        self.sayaclar = {kademe: 0 for kademe in KADEMELER}
+
+    def _dogrula(self, veri: Any) -> Optional[Dict[str, Any]]:
+        if not isinstance(veri, dict):
+            return None
+        try:
+            return TahminCiktisi(**veri).model_dump()
+        except (ValidationError, TypeError):
+            return None
+
+    def _cozumle(self, metin: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        blok = json_blogu_bul(metin)
+        if blok is not None:
+            try:
+                sonuc = self._dogrula(_json_yukle(blok))
+                if sonuc is not None:
+                    return sonuc, "dogrudan"
+            except JSON_HATALARI:
+                pass
+        # Blok kapanmamışsa (yarıda kesilmiş yanıt) ilk `{`'den sonrası onarılır
+        aday = blok if blok is not None else metin[metin.find("{"):] if "{" in metin else None
+        if aday is not None:
+            try:
+                sonuc = self._dogrula(_json_yukle(json_onar(aday)))
+                if sonuc is not None:
+                    return sonuc, "onarim"
+            except JSON_HATALARI:
+                pass
+
+        alanlar = {alan: deger for alan, deger in _SAYISAL_ALAN.findall(metin)}
+        if alanlar:
+            sonuc = self._dogrula({
+                **alanlar,
+                "rapor": "Rapor ayrıştırılamadı. Ham metin: " + metin,
+                "pazar_analizi": "Pazar analizi ayrıştırılamadı.",
+            })
+            if sonuc is not None:
+                return sonuc, "kismi"
+        return None, "basarisiz"
+
+    def ayristir(self, metin: str) -> Dict[str, Any]:
+        sonuc, kademe = self._cozumle(metin)
+        self.sayaclar[kademe] += 1
+        if sonuc is None:
+            sonuc = TahminCiktisi(
+                rapor="Rapor ayrıştırılamadı. Ham metin: " + metin,
+                pazar_analizi="Pazar analizi ayrıştırılamadı.",
+            ).model_dump()
+        return sonuc
+
+    def istatistikler(self) -> Dict[str, Any]:
+        toplam = sum(self.sayaclar.values())
+        return {
+            **self.sayaclar,
+            "toplam": toplam,
+            "basari_orani": round((toplam - self.sayaclar["basarisiz"]) / toplam, 3) if toplam else 0.0,
+            "json_arka_ucu": "orjson" if orjson is not None else "json",
+        }
+
+
+tahmin_ayristirici = TahminAyristirici()
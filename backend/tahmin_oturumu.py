@@ -0,0 +1,213 @@
+"""Tahmin Oturumu
+
+Bayi aracında kullanıcılar aynı araç için yalnızca `hasar_detaylari`nı
+değiştirip (ör. boyalı bir kapı ekleyip) detaylı tahmini tekrar tekrar
+ister. Oturum, ilk detaylı tahminin referans fiyatını, hasarsız fiyat
+tabanını ve hasar başına değer kaybı oranlarını saklar; sonraki hasar
+farkları yalnızca değişen kalemler için `DepreciationCalculator`
+katsayılarıyla hesaplanır ve LLM çağrısı yapılmaz.
+
+Hasarsız taban, ilk tahminin fiyatları toplam hasar oranına bölünerek
+bulunur: ilk tahminde hasarların bu oranla fiyatlandığı varsayılır.
+Oturumlar tek süreçte `TTLLRUCache`te, paylaşımlı arka uçta (Redis)
+ise işçiler arasında ortak tutulur. Güncellemeler istemcinin gördüğü
+`surum` ile yapılır; arada başka bir güncelleme yazıldıysa fark
+uygulanmaz, böylece eş zamanlı iki düzenlemeden biri sessizce kaybolmaz.
+"""
+
+import asyncio
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from cache import TTLLRUCache
+from rapor_sablonu import detayli_raporu
+from web_scraper import DepreciationCalculator, depreciation_calculator
+from yerel_tahmin import hasari_cevir
+
+FIYAT_ALANLARI = ("tahmini_fiyat_min", "ortalama_fiyat", "tahmini_fiyat_max")
+# DepreciationCalculator'ın toplam hasar kaybı üst sınırı
+MAX_HASAR_ORANI = 0.60
+
+
+class OturumBulunamadi(KeyError):
+    """Oturum yok ya da süresi dolmuş."""
+
+
+class GecersizHasarDegisikligi(ValueError):
+    """Çıkarılmak istenen hasar oturumda yok."""
+
+
+class SurumCakismasi(Exception):
+    """Oturum, istemcinin gördüğü sürümden sonra güncellenmiş."""
+
+    def __init__(self, guncel_surum: int):
+        super().__init__(guncel_surum)
+        self.guncel_surum = guncel_surum
+
+
+def _hasar_kimligi(parca: str, durum: str) -> Tuple[str, str, str]:
+    girdi = hasari_cevir(parca, durum)
+    return girdi["part"], girdi["damage_level"], girdi["damage_type"]
+
+
+def _oranlar(hesaplayici: DepreciationCalculator, hasarlar: Iterable[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """Her hasar için (parça, durum, değer kaybı oranı) kaydı; boş alanlı girdiler atlanır."""
+    hasarlar = [h for h in hasarlar if h.get("parca") and h.get("durum")]
+    hesap = hesaplayici.calculate_depreciation(0, [hasari_cevir(h["parca"], h["durum"]) for h in hasarlar])
+    return [
+        {"parca": h["parca"], "durum": h["durum"], "oran": detay["depreciation"]}
+        for h, detay in zip(hasarlar, hesap["detailed_calculations"])
+    ]
+
+
+def _toplam_oran(hasarlar: Iterable[Dict[str, Any]]) -> float:
+    return min(sum(h["oran"] for h in hasarlar), MAX_HASAR_ORANI)
+
+
+def oturum_olustur(
+    arac: Dict[str, Any],
+    sonuc: Dict[str, Any],
+    hesaplayici: DepreciationCalculator = depreciation_calculator,
+) -> Dict[str, Any]:
+    """İlk detaylı tahminden (JSON'a çevrilebilir) oturum kaydını üretir."""
+    hasarlar = _oranlar(hesaplayici, arac.get("hasar_detaylari") or [])
+    kalan = 1 - _toplam_oran(hasarlar)
+    return {
+        "arac": {k: v for k, v in arac.items() if k != "hasar_detaylari"},
+        "hasarlar": hasarlar,
+        "taban": {alan: sonuc[alan] / kalan for alan in FIYAT_ALANLARI},
+        "referans_fiyat": sonuc.get("referans_fiyat"),
+        "referans_kaynagi": sonuc.get("referans_kaynagi"),
+        "pazar_analizi": sonuc.get("pazar_analizi", ""),
+        "surum": 1,
+    }
+
+
+def hasarlari_guncelle(
+    oturum: Dict[str, Any],
+    ekle: Iterable[Dict[str, str]] = (),
+    cikar: Iterable[Dict[str, str]] = (),
+    hesaplayici: DepreciationCalculator = depreciation_calculator,
+) -> Dict[str, Any]:
+    """Hasar farkını uygular; yalnızca eklenen hasarların oranı hesaplanır."""
+    hasarlar = list(oturum["hasarlar"])
+    for hasar in cikar:
+        kimlik = _hasar_kimligi(hasar["parca"], hasar["durum"])
+        sira = next((i for i, h in enumerate(hasarlar) if _hasar_kimligi(h["parca"], h["durum"]) == kimlik), None)
+        if sira is None:
+            raise GecersizHasarDegisikligi(f"Oturumda bulunmayan hasar: {hasar['parca']} ({hasar['durum']})")
+        del hasarlar[sira]
+    hasarlar.extend(_oranlar(hesaplayici, ekle))
+    return {**oturum, "hasarlar": hasarlar, "surum": oturum["surum"] + 1}
+
+
+def oturum_sonucu(oturum: Dict[str, Any], arac: Any) -> Dict[str, Any]:
+    """Oturumun güncel hasarlarıyla `TahminSonucu` alanlarını üretir."""
+    hasarlar = oturum["hasarlar"]
+    toplam = sum(h["oran"] for h in hasarlar)
+    oran = min(toplam, MAX_HASAR_ORANI)
+    sonuc = {alan: int(oturum["taban"][alan] * (1 - oran)) for alan in FIYAT_ALANLARI}
+
+    taban = oturum["taban"]["ortalama_fiyat"]
+    referans = oturum["referans_fiyat"] or int(taban)
+    # Üst sınır aşıldıysa kalem etkileri orantılı olarak küçültülür
+    olcek = oran / toplam if toplam else 0.0
+    faktorler = [(f"{h['parca']} ({h['durum']})", -int(taban * h["oran"] * olcek)) for h in hasarlar]
+    # Referans ile hasarsız taban arasındaki fark (kilometre, donanım vb.) ilk tahminden gelir
+    if int(taban) != referans:
+        faktorler.insert(0, ("DIGER", int(taban) - referans))
+    sonuc["rapor"], _ = detayli_raporu(arac, {**sonuc, "faktorler": faktorler}, referans)
+    sonuc["pazar_analizi"] = oturum["pazar_analizi"]
+    return sonuc
+
+
+class OturumDeposu:
+    """Oturum kayıtları: paylaşımlı arka uç varsa orada, yoksa süreç içi LRU'da.
+
+    Oturumlar güncellendiği için paylaşımlı modda yerel kopya tutulmaz;
+    aksi halde başka bir işçinin güncellemesi görünmezdi.
+    """
+
+    def __init__(self, arka_uc, ttl: float = 1800, max_kayit: int = 10000, kilit_suresi: float = 5.0):
+        self.arka_uc = arka_uc
+        self.ttl = ttl
+        self.kilit_suresi = kilit_suresi
+        self.yerel = TTLLRUCache(ttl=ttl, max_kayit=max_kayit)
+        self.olusturulan = 0
+        self.guncellenen = 0
+        self.cakisan = 0
+
+    @staticmethod
+    def _anahtar(oturum_id: str) -> str:
+        return f"oturum:{oturum_id}"
+
+    async def _kilit_al(self, anahtar: str) -> str:
+        # Kilit yalnızca bir farkın uygulanması kadar tutulur; kısa aralıklarla yeniden denenir
+        bitis = time.monotonic() + self.kilit_suresi
+        while True:
+            jeton = await self.arka_uc.kilit_al(anahtar, self.kilit_suresi)
+            if jeton is not None or time.monotonic() >= bitis:
+                return jeton
+            await asyncio.sleep(0.01)
+
+    async def al(self, oturum_id: str) -> Dict[str, Any]:
+        if self.arka_uc.paylasimli:
+            oturum = await self.arka_uc.al(self._anahtar(oturum_id))
+        else:
+            oturum = self.yerel.get(oturum_id)
+        if oturum is None:
+            raise OturumBulunamadi(oturum_id)
+        return oturum
+
+    async def yaz(self, oturum: Dict[str, Any], oturum_id: Optional[str] = None) -> str:
+        """Oturumu yazar (her yazmada süresi yenilenir); yeni oturumlara kimlik verir."""
+        if oturum_id is None:
+            oturum_id = uuid.uuid4().hex
+            self.olusturulan += 1
+        else:
+            self.guncellenen += 1
+        if self.arka_uc.paylasimli:
+            await self.arka_uc.yaz(self._anahtar(oturum_id), oturum, self.ttl)
+        else:
+            self.yerel.set(oturum_id, oturum)
+        return oturum_id
+
+    async def guncelle(
+        self, oturum_id: str, surum: int, degistir: Callable[[Dict[str, Any]], Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Oturum hâlâ `surum` sürümündeyse `degistir` ile günceller ve yazar.
+
+        Oku-karşılaştır-yaz, oturum başına kilit altında yapılır (paylaşımlı
+        arka uçta işçiler arasında); sürüm değişmişse `SurumCakismasi` fırlatır.
+        """
+        kilit = f"{self._anahtar(oturum_id)}:kilit"
+        jeton = await self._kilit_al(kilit)
+        if jeton is None:
+            # Kilit süresince bırakılmadı; güncel sürüm bilinmediğinden çakışma sayılır
+            self.cakisan += 1
+            raise SurumCakismasi((await self.al(oturum_id))["surum"])
+        try:
+            oturum = await self.al(oturum_id)
+            if oturum["surum"] != surum:
+                self.cakisan += 1
+                raise SurumCakismasi(oturum["surum"])
+            oturum = degistir(oturum)
+            await self.yaz(oturum, oturum_id)
+            return oturum
+        finally:
+            await self.arka_uc.kilit_birak(kilit, jeton)
+
+    async def sil(self, oturum_id: str) -> None:
+        if self.arka_uc.paylasimli:
+            silindi = await self.arka_uc.sil(self._anahtar(oturum_id))
+        else:
+            silindi = self.yerel.pop(oturum_id) is not None
+        if not silindi:
+            raise OturumBulunamadi(oturum_id)
+
+    def istatistikler(self) -> Dict[str, Any]:
+        istatistik = {"olusturulan": self.olusturulan, "guncellenen": self.guncellenen, "cakisan": self.cakisan}
+        if not self.arka_uc.paylasimli:
+            istatistik["kayit_sayisi"] = len(self.yerel)
+        return istatistik
@@ -0,0 +1,200 @@
+"""Tahmin Zincirleri
+
+LangChain'e bağımlı parçaları (istem şablonları, çıktı ayrıştırıcısı,
+havuz adaptörü ve ölçülen zincir adımları) bir arada tutar. `main`
+bu modülü ancak LLM zincirleri ilk kez gerektiğinde içe aktarır; böylece
+uygulama, `/health` ve yerel motor LangChain yüklenmeden hizmet verebilir.
+
+İki istem modu vardır:
+
+* ``klasik``: Talimatlar her çağrıda istemle birlikte gönderilir ve model
+  `rapor`/`pazar_analizi` HTML'ini kendisi yazar.
+* ``yapisal``: Sabit talimatlar tek bir sistem talimatındadır (Gemini'de
+  `system_instruction`; `GEMINI_ONBELLEK_ICERIGI` ile önbelleğe alınmış
+  bağlamdan da okunabilir), istem yalnızca araç bilgisini taşır ve model
+  yalnızca fiyatları, faktör kodlarını ve pazar kodunu döndürür. HTML
+  `rapor_sablonu` ile sunucuda üretilir.
+"""
+
+from typing import Any, AsyncIterator, NamedTuple, Optional
+
+from langchain_core.messages import SystemMessage
+from langchain_core.output_parsers import BaseOutputParser
+from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from llm_havuzu import LLMHavuzu
+from metrikler import asama
+from rapor_sablonu import FAKTORLER, PAZAR_DURUMLARI
+from tahmin_ayristirici import tahmin_ayristirici
+
+ISTEM_MODLARI = ("klasik", "yapisal")
+# mesaj: ayrı sistem mesajı; istem: talimat istemin başına eklenir (sistem
+# talimatı desteklemeyen modeller için); onbellek: talimat önbelleğe alınmış
+# bağlamdadır, hiç gönderilmez
+SISTEM_TALIMATI_MODLARI = ("mesaj", "istem", "onbellek")
+
+HIZLI_TAHMIN_SABLONU = """Sen bir otomotiv uzmanısın ve Türkiye'deki ikinci el araç piyasasını çok iyi biliyorsun.
+    Aşağıdaki araç için güncel pazar değerini hızlıca analiz et ve bir fiyat aralığı sun.
+    ARAÇ BİLGİLERİ: Marka: {marka}, Model: {model}, Yıl: {yil}, Kilometre: {kilometre} km, Yakıt: {yakit_tipi}, Vites: {vites_tipi}, İl: {il}, Motor Hacmi: {motor_hacmi}L, Motor Gücü: {motor_gucu}HP.
+    GÖREV: 
+    1.  Bu araç için Türkiye pazarında güncel ve gerçekçi bir fiyat aralığı (min, max, ortalama) belirle.
+    2.  **Rapor Alanı (HTML):** Fiyatı etkileyen en önemli 2-3 faktörü (örn: modelin popülerliği, kilometre durumu) `<strong>` etiketleriyle vurgulayarak kısaca açıkla.
+    3.  **Pazar Analizi Alanı (HTML):** Bu modelin genel piyasa durumu hakkında 1-2 cümlelik bir yorum yap.
+
+    JSON FORMATI: {{'tahmini_fiyat_min': int, 'tahmini_fiyat_max': int, 'ortalama_fiyat': int, 'rapor': "<p>Rapor metni...</p>", 'pazar_analizi': "<p>Analiz metni...</p>"}}
+    Önemli: Yanıtın sadece JSON formatında olsun ve `rapor` ile `pazar_analizi` alanları geçerli HTML içermelidir."""
+
+DETAYLI_TAHMIN_SABLONU = """Sen bir otomotiv uzmanısın ve Türkiye'deki ikinci el araç piyasasını çok iyi biliyorsun.
+    GÖREV: Sana verilen referans fiyattan yola çıkarak, aracın ek detaylarına göre fiyattaki değişimleri hesapla ve detaylı bir rapor oluştur.
+    
+    REFERANS BİLGİLER:
+    *   Aracın modeli: {marka} {model} {yil}
+    *   Bu aracın hasarsız ve ortalama kilometredeki piyasa değeri **{referans_fiyat} TL** olarak belirlendi.
+
+    DEĞERLENDİRİLECEK EK DETAYLAR:
+    *   **Kilometre:** {kilometre} km
+    *   **Hasar Listesi:** {hasar_listesi}
+    *   **Diğer Faktörler:** Renk ({renk}), İl ({il}), Ekstra Bilgiler ({ekstra_bilgiler}).
+
+HESAPLAMA VE RAPORLAMA (HTML FORMATINDA):
+    1.  **Değer Kaybı/Artışı Hesapla:** Belirlenen referans fiyattan başlayarak, yukarıdaki 'DEĞERLENDİRİLECEK EK DETAYLAR' bölümündeki her bir faktörün fiyata etkisini TL cinsinden hesapla.
+    2.  **Nihai Fiyatı Belirle:** Referans fiyattan toplam değer kayıplarını düşüp, artışları ekleyerek aracın yeni nihai fiyat aralığını (minimum, maksimum, ortalama) hesapla.
+    3.  **Rapor Oluştur:**
+        *   `<h4>Referans Fiyat</h4>` başlığı altında başlangıç fiyatını belirt.
+        *   `<h4>Değer Kaybı/Artışı Analizi</h4>` başlığı altında, değerlendirdiğin her faktörü `<li><strong>Faktör Adı:</strong> Açıklama ve +/- TL Etkisi</li>` şeklinde listele.
+        *   `<h4>Nihai Fiyat Tahmini</h4>` başlığı altında ulaştığın sonuçları özetle.
+    4.  **Pazar Analizi Oluştur:** Aracın modelinin genel pazar durumunu (popülerlik, arz-talep) özetle.
+
+    JSON FORMATI: {{"tahmini_fiyat_min": int, "tahmini_fiyat_max": int, "ortalama_fiyat": int, "rapor": "<h4>...</h4><ul><li>...</li></ul>", "pazar_analizi": "<p>...</p>"}}
+    Önemli: Yanıtın sadece JSON formatında olsun ve `rapor` ile `pazar_analizi` alanları geçerli HTML içermelidir."""
+
+
+YAPISAL_SISTEM_TALIMATI = (
+    "Türkiye ikinci el araç piyasası uzmanısın. Yalnızca tek satır JSON döndür; açıklama, "
+    "HTML ya da kod bloğu yazma.\n"
+    'Şema: {"tahmini_fiyat_min":int,"tahmini_fiyat_max":int,"ortalama_fiyat":int,'
+    '"faktorler":[["KOD",TL]],"pazar":"KOD"}\n'
+    "Fiyatlar TL cinsinden tam sayıdır. faktorler: fiyatı en çok etkileyen en fazla 4 faktör ve "
+    "TL etkisi (artış +, kayıp -, bilinmiyorsa 0). Referans fiyat verildiyse ondan başla; "
+    "ortalama, referans ile etkilerin toplamına yakın olmalı.\n"
+    f"Faktör kodları: {' '.join(FAKTORLER)}\n"
+    f"Pazar kodları: {' '.join(PAZAR_DURUMLARI)}"
+)
+
+HIZLI_YAPISAL_SABLONU = (
+    "Araç: {marka} {model} {yil}, {kilometre} km, {yakit_tipi}, {vites_tipi}, {il}, "
+    "{motor_hacmi}L, {motor_gucu}HP"
+)
+
+DETAYLI_YAPISAL_SABLONU = (
+    "Araç: {marka} {model} {yil}, {kilometre} km, {yakit_tipi}, {vites_tipi}, {il}, renk {renk}\n"
+    "Referans: {referans_fiyat} TL (hasarsız, ortalama km)\n"
+    "Hasar: {hasar_listesi}\n"
+    "Ekstra: {ekstra_bilgiler}"
+)
+
+
+def yapisal_istem(sablon: str, sistem_talimati: str = "mesaj"):
+    """Yapısal mod istemini sistem talimatının nerede duracağına göre kurar."""
+    if sistem_talimati == "mesaj":
+        # Sabit önek her çağrıda aynı olduğundan model tarafında önbelleklenebilir
+        return ChatPromptTemplate.from_messages([SystemMessage(content=YAPISAL_SISTEM_TALIMATI), ("human", sablon)])
+    if sistem_talimati == "istem":
+        kacisli = YAPISAL_SISTEM_TALIMATI.replace("{", "{{").replace("}", "}}")
+        return PromptTemplate.from_template(kacisli + "\n\n" + sablon)
+    if sistem_talimati == "onbellek":
+        return PromptTemplate.from_template(sablon)
+    raise ValueError(f"Bilinmeyen sistem talimatı modu: {sistem_talimati!r}")
+
+
+class FiyatTahminParser(BaseOutputParser):
+    """LLM yanıtını `tahmin_ayristirici` kademeleriyle (doğrudan, onarım, kısmi) ayrıştırır."""
+
+    def parse(self, text: str) -> dict:
+        return tahmin_ayristirici.ayristir(text)
+
+
+class HavuzluModel(RunnableLambda):
+    """Havuzu LangChain zincirlerinde (`prompt | model | ayristirici`) kullanılabilir kılar.
+
+    Havuzun kotaları (paylaşımlı durumda Redis bağlantısı) uygulamanın olay
+    döngüsüne bağlı olduğundan model yalnızca `ainvoke`/`astream` ile
+    çağrılır; senkron `invoke` bunu söyleyen bir `TypeError` fırlatır.
+    """
+
+    def __init__(self, havuz: LLMHavuzu, profil: str):
+        self.havuz = havuz
+        self.profil = profil
+        super().__init__(func=self._senkron, afunc=self._cagir, name=f"havuz_{profil}")
+
+    def _senkron(self, girdi: Any) -> Any:
+        raise TypeError(
+            f"'{self.profil}' havuzlu modeli senkron çağrılamaz: havuz uygulamanın olay döngüsüne "
+            "bağlıdır; ainvoke ya da astream kullanın."
+        )
+
+    async def _cagir(self, girdi: Any) -> Any:
+        return await self.havuz.cagir(self.profil, girdi)
+
+    async def astream(self, input: Any, config: Any = None, **kwargs) -> AsyncIterator[Any]:
+        async for parca in self.havuz.akis(self.profil, input):
+            yield parca
+
+
+class OlculenAdim(Runnable):
+    """Bir zincir adımının süresini `zincir`/`asama` etiketleriyle aşama metriklerine yazar."""
+
+    def __init__(self, adim: Runnable, zincir: str, asama_adi: str):
+        self.adim = adim
+        self.zincir = zincir
+        self.asama_adi = asama_adi
+
+    def invoke(self, input, config=None, **kwargs):
+        with asama(self.zincir, self.asama_adi):
+            return self.adim.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        with asama(self.zincir, self.asama_adi):
+            return await self.adim.ainvoke(input, config, **kwargs)
+
+    async def astream(self, input, config=None, **kwargs):
+        with asama(self.zincir, self.asama_adi):
+            async for parca in self.adim.astream(input, config, **kwargs):
+                yield parca
+
+
+def _olculen_zincir(havuz: LLMHavuzu, zincir: str, istem: Runnable,
+                    ayristirici: Optional[Runnable] = None) -> Runnable:
+    """prompt | LLM (| ayrıştırıcı) zincirini her adımı ölçülecek şekilde kurar."""
+    adimlar = (
+        OlculenAdim(istem, zincir, "prompt")
+        | OlculenAdim(HavuzluModel(havuz, zincir), zincir, "llm")
+    )
+    if ayristirici is not None:
+        adimlar = adimlar | OlculenAdim(ayristirici, zincir, "ayristirma")
+    return adimlar
+
+
+class TahminZincirleri(NamedTuple):
+    hizli: Runnable
+    detayli: Runnable
+    # Akış modunda ayrıştırma parça parça yapılır, bu yüzden çıktı ayrıştırıcısı yoktur
+    detayli_akis: Runnable
+
+
+def zincirleri_olustur(havuz: LLMHavuzu, istem_modu: str = "klasik",
+                       sistem_talimati: str = "mesaj") -> TahminZincirleri:
+    if istem_modu == "klasik":
+        hizli = PromptTemplate.from_template(HIZLI_TAHMIN_SABLONU)
+        detayli = PromptTemplate.from_template(DETAYLI_TAHMIN_SABLONU)
+    elif istem_modu == "yapisal":
+        hizli = yapisal_istem(HIZLI_YAPISAL_SABLONU, sistem_talimati)
+        detayli = yapisal_istem(DETAYLI_YAPISAL_SABLONU, sistem_talimati)
+    else:
+        raise ValueError(f"Bilinmeyen istem modu: {istem_modu!r} ({', '.join(ISTEM_MODLARI)} olmalı)")
+    return TahminZincirleri(
+        hizli=_olculen_zincir(havuz, "hizli", hizli, FiyatTahminParser()),
+        detayli=_olculen_zincir(havuz, "detayli", detayli, FiyatTahminParser()),
+        detayli_akis=_olculen_zincir(havuz, "detayli", detayli),
+    )
@@ -0,0 +1,56 @@
+"""Toplu Tahmin
+
+Çok sayıda aracın tek istekte değerlendirilmesi için sınırlı eş zamanlılıkla
+çalışan yürütücü. Aynı parmak izine sahip araçlar bir kez hesaplanır,
+her iş için ayrı zaman aşımı uygulanır ve sonuçlar tamamlandıkça üretilir.
+"""
+
+import asyncio
+from typing import (Any, AsyncIterator, Awaitable, Callable, Dict, Hashable,
+                    List, NamedTuple, Optional, Sequence)
+
+
+class TopluSonuc(NamedTuple):
+    """Bir benzersiz aracın sonucu ve bu sonucu paylaşan girdi sıraları."""
+    siralar: List[int]
+    sonuc: Any
+    hata: Optional[str]
+
+
+async def toplu_calistir(
+    ogeler: Sequence[Any],
+    isleyici: Callable[[Any], Awaitable[Any]],
+    anahtar_fonksiyonu: Callable[[Any], Hashable],
+    eszamanlilik: int = 8,
+    zaman_asimi: Optional[float] = None,
+) -> AsyncIterator[TopluSonuc]:
+    """Öğeleri tekilleştirip en fazla `eszamanlilik` işçiyle işler.
+
+    Sonuçlar tamamlanma sırasıyla üretilir; her biri aynı anahtara sahip
+    tüm girdi sıralarını taşır. Üretici erken kapatılırsa (ör. istemci
+    akışı bıraktığında) çalışan işler iptal edilir.
+    """
+    gruplar: Dict[Hashable, List[int]] = {}
+    for sira, oge in enumerate(ogeler):
+        gruplar.setdefault(anahtar_fonksiyonu(oge), []).append(sira)
+
+    bekleyenler = iter(gruplar.values())
+    sonuclar: "asyncio.Queue[TopluSonuc]" = asyncio.Queue()
+
+    async def calisan() -> None:
+        for siralar in bekleyenler:
+            try:
+                sonuc = await asyncio.wait_for(isleyici(ogeler[siralar[0]]), zaman_asimi)
+                sonuclar.put_nowait(TopluSonuc(siralar, sonuc, None))
+            except asyncio.TimeoutError:
+                sonuclar.put_nowait(TopluSonuc(siralar, None, f"Zaman aşımı ({zaman_asimi} sn)"))
+            except Exception as e:
+                sonuclar.put_nowait(TopluSonuc(siralar, None, str(e) or type(e).__name__))
+
+    calisanlar = [asyncio.create_task(calisan()) for _ in range(min(eszamanlilik, len(gruplar)))]
+    try:
+        for _ in range(len(gruplar)):
+            yield await sonuclar.get()
+    finally:
+        for gorev in calisanlar:
+            gorev.cancel()
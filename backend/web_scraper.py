@@ -3,30 +3,185 @@ Web Scraping Service for Real-Time Car Market Data
 Collects depreciation data from Turkish car marketplaces
 """
 
-import asyncio
 import json
+import os
 import re
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
 
 import aiohttp
+import numpy as np
 import requests
-from bs4 import BeautifulSoup
-from database import PazarVerisi, get_db
 from sqlalchemy.orm import Session
 
+from database import (GuncelPazarVerisi, PazarVerisi, bulk_upsert_market_data,
+                      get_db)
+from market_fetcher import MarketFetcher, aggregate_listings
+
+PRICE_INDEX_PATH = os.getenv(
+    'PRICE_INDEX_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'price_index.json')
+)
+
+# Ages beyond this all share the last computed factor (the 15% floor is reached long before)
+MAX_TABLE_AGE = 60
+
+
+_TURKISH_TO_ASCII = str.maketrans('çğıöşüÇĞİÖŞÜ', 'cgiosuCGIOSU')
+
+
+@lru_cache(maxsize=4096)
+def normalize_name(name: str) -> str:
+    """Normalizes a brand/model name for index lookups ("3 Serisi" -> "3-serisi")"""
+    name = name.translate(_TURKISH_TO_ASCII).lower()
+    return '-'.join(name.replace('_', ' ').replace('-', ' ').split())
+
+
+def _year_factor(age: int) -> float:
+    """Piecewise market depreciation curve by vehicle age, used when the price index has no year_factors"""
+    if age <= 1:
+        return 0.85  # 15% depreciation in first year
+    elif age <= 3:
+        return 0.85 * (0.9 ** (age - 1))  # 10% per year for years 2-3
+    elif age <= 5:
+        return 0.85 * (0.9 ** 2) * (0.85 ** (age - 3))  # 15% per year for years 4-5
+    elif age <= 10:
+        return 0.85 * (0.9 ** 2) * (0.85 ** 2) * (0.8 ** (age - 5))  # 20% per year for years 6-10
+    # 5% per year after 10 years, minimum 15% of original value
+    return max(0.15, 0.85 * (0.9 ** 2) * (0.85 ** 2) * (0.8 ** 5) * (0.95 ** (age - 10)))
+
+
+def _estimate_age_factor(age: int) -> float:
+    """Linear depreciation used for brands without model-level prices"""
+    return max(0.15, 1 - (age * 0.12))
+
+
+ESTIMATE_AGE_FACTORS = tuple(_estimate_age_factor(age) for age in range(MAX_TABLE_AGE + 1))
+
+
+def year_factor_for_age(age: int) -> float:
+    return YEAR_FACTORS[min(max(age, 0), len(YEAR_FACTORS) - 1)]
+
+
+def estimate_age_factor_for_age(age: int) -> float:
+    # Negative ages (model years ahead of the calendar) are outside the table
+    if age < 0:
+        return _estimate_age_factor(age)
+    return ESTIMATE_AGE_FACTORS[min(age, MAX_TABLE_AGE)]
+
+
+class PriceIndex:
+    """
+    Immutable brand/model price index built from a data file.
+    Every alias combination is expanded up front, so a lookup is a
+    single dict probe on the normalized (marka, model) pair.
+    """
+    
+    def __init__(self, data: Dict):
+        brand_names: Dict[str, str] = {}
+        for brand, info in data.get('brands', {}).items():
+            for alias in [brand, *info.get('aliases', [])]:
+                brand_names[normalize_name(alias)] = brand
+        
+        prices: Dict[Tuple[str, str], int] = {}
+        canonical: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        for brand, info in data.get('brands', {}).items():
+            brand_aliases = [alias for alias, target in brand_names.items() if target == brand]
+            for model, model_info in info.get('models', {}).items():
+                for model_alias in [model, *model_info.get('aliases', [])]:
+                    for brand_alias in brand_aliases:
+                        prices[(brand_alias, normalize_name(model_alias))] = model_info['price']
+                        canonical[(brand_alias, normalize_name(model_alias))] = (brand, model)
+        
+        categories = data.get('categories', {})
+        category_prices: Dict[str, int] = {}
+        for category in categories.values():
+            for brand in category.get('brands', []):
+                category_prices[normalize_name(brand)] = category['base_price']
+        for alias, brand in brand_names.items():
+            if brand in category_prices:
+                category_prices.setdefault(alias, category_prices[brand])
+        
+        self.prices = MappingProxyType(prices)
+        self.brand_names = MappingProxyType(brand_names)
+        self.canonical_names = MappingProxyType(canonical)
+        self.category_prices = MappingProxyType(category_prices)
+        self.default_category_price = categories[data['default_category']]['base_price']
+        # Indexed by vehicle age; None when the file leaves the curve to the code
+        self.year_factors = tuple(float(f) for f in data['year_factors']) if data.get('year_factors') else None
+    
+    @classmethod
+    def from_file(cls, path: str) -> 'PriceIndex':
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+    
+    def base_price(self, marka: str, model: str) -> Optional[int]:
+        """New-vehicle base price for a brand/model, None if it is not indexed"""
+        return self.prices.get((normalize_name(marka), normalize_name(model)))
+    
+    def canonical_key(self, marka: str, model: str) -> Tuple[str, str]:
+        """Canonical (marka, model) for any alias spelling; unknown names are only normalized"""
+        key = (normalize_name(marka), normalize_name(model))
+        if key in self.canonical_names:
+            return self.canonical_names[key]
+        return self.brand_names.get(key[0], key[0]), key[1]
+    
+    def category_price(self, marka: str) -> int:
+        """Brand category base price used by the fallback estimator"""
+        return self.category_prices.get(normalize_name(marka), self.default_category_price)
+
+
+PRICE_INDEX = PriceIndex.from_file(PRICE_INDEX_PATH)
+YEAR_FACTORS = PRICE_INDEX.year_factors or tuple(_year_factor(age) for age in range(MAX_TABLE_AGE + 1))
+
+# Price ratio of each damage condition to an undamaged car
+DAMAGE_PRICE_FACTORS = {
+    'hasarsiz': 1.0,      # No depreciation
+    'boyali': 0.85,       # 15% depreciation
+    'degisen': 0.70,      # 30% depreciation
+    'hasarli': 0.55       # 45% depreciation
+}
+
 
 class CarMarketScraper:
     """Scrapes car market data from various Turkish websites"""
     
-    def __init__(self):
+    def __init__(self, fetcher: Optional[MarketFetcher] = None):
         self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            'User-Agent': os.getenv(
+                'SCRAPING_USER_AGENT',
+                'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            )
         }
-        self.sources = {
-            'sahibinden': 'https://www.sahibinden.com',
-            'arabam': 'https://www.arabam.com',
-            'otoplus': 'https://www.otoplus.com/al'
+        self.fetcher = fetcher or MarketFetcher(user_agent=self.headers['User-Agent'])
+        self.sources = {name: source.base_url for name, source in self.fetcher.sources.items()}
+        self.scraping_enabled = os.getenv('SCRAPING_ENABLED', 'false').lower() == 'true'
+        self.min_listings = int(os.getenv('SCRAPING_MIN_LISTINGS', '5'))
+    
+    async def close(self):
+        await self.fetcher.close()
+    
+    async def _get_scraped_market_data(self, marka: str, model: str, yil: int) -> Optional[Dict]:
+        """Aggregates live listings; None when there are too few to be meaningful"""
+        listings = await self.fetcher.fetch_listings(marka, model, yil)
+        if len(listings) < self.min_listings:
+            return None
+        
+        data = aggregate_listings(listings)
+        # Damage groups without listings are derived from the undamaged average
+        reference = data['hasarsiz_ortalama'] or data['ortalama_fiyat']
+        for damage_type, factor in DAMAGE_PRICE_FACTORS.items():
+            if data[f"{damage_type}_ortalama"] is None:
+                data[f"{damage_type}_ortalama"] = int(reference * factor)
+        
+        return {
+            'marka': marka,
+            'model': model,
+            'yil': yil,
+            **data,
+            'kaynak': 'scraped',
+            'veri_tarihi': datetime.utcnow()
         }
     
     async def get_depreciation_data_by_damage(self, marka: str, model: str, yil: int) -> Dict:
@@ -35,126 +190,57 @@ class CarMarketScraper:
         Returns average prices for different damage conditions
         """
         try:
-            # Simulate API calls to get real market data
-            # In a real implementation, this would scrape actual websites
-            base_price = await self._get_base_price(marka, model, yil)
-            
-            if not base_price:
-                return self._generate_estimated_data(marka, model, yil)
-            
-            # Calculate depreciation based on damage types
-            depreciation_factors = {
-                'hasarsiz': 1.0,      # No depreciation
-                'boyali': 0.85,       # 15% depreciation
-                'degisen': 0.70,      # 30% depreciation  
-                'hasarli': 0.55       # 45% depreciation
-            }
-            
-            damage_prices = {}
-            for damage_type, factor in depreciation_factors.items():
-                damage_prices[f"{damage_type}_ortalama"] = int(base_price * factor)
+            if self.scraping_enabled:
+                scraped = await self._get_scraped_market_data(marka, model, yil)
+                if scraped:
+                    return scraped
             
-            return {
-                'marka': marka,
-                'model': model,
-                'yil': yil,
-                'ortalama_fiyat': base_price,
-                'minimum_fiyat': int(base_price * 0.8),
-                'maksimum_fiyat': int(base_price * 1.2),
-                'ilan_sayisi': await self._get_listing_count(marka, model, yil),
-                **damage_prices,
-                'kaynak': 'aggregated',
-                'veri_tarihi': datetime.utcnow()
-            }
+            # Without live data, fall back to the price model
+            return self.model_market_data(marka, model, yil)
             
         except Exception as e:
             print(f"Error collecting market data: {e}")
-            return self._generate_estimated_data(marka, model, yil)
+            return self.estimated_market_data(marka, model, yil)
     
-    async def _get_base_price(self, marka: str, model: str, yil: int) -> Optional[int]:
-        """Gets base price for the car from market sources"""
+    # Synchronous estimation core: pure CPU work, safe to call from inside a running event loop
+    
+    def model_market_data(self, marka: str, model: str, yil: int) -> Dict:
+        """Market data derived from the brand/model price model"""
+        base_price = self.base_price(marka, model, yil)
+        
+        if not base_price:
+            return self.estimated_market_data(marka, model, yil)
+        
+        # Calculate depreciation based on damage types
+        damage_prices = {}
+        for damage_type, factor in DAMAGE_PRICE_FACTORS.items():
+            damage_prices[f"{damage_type}_ortalama"] = int(base_price * factor)
+        
+        return {
+            'marka': marka,
+            'model': model,
+            'yil': yil,
+            'ortalama_fiyat': base_price,
+            'minimum_fiyat': int(base_price * 0.8),
+            'maksimum_fiyat': int(base_price * 1.2),
+            'ilan_sayisi': self.listing_count(marka, model, yil),
+            **damage_prices,
+            'kaynak': 'aggregated',
+            'veri_tarihi': datetime.utcnow()
+        }
+    
+    def base_price(self, marka: str, model: str, yil: int) -> Optional[int]:
+        """Gets base price for the car from the price index"""
         try:
             # In real implementation, this would make actual HTTP requests
             # For now, we'll use estimation based on common Turkish car prices
+            base_price = PRICE_INDEX.base_price(marka, model)
             
-            # Updated 2025 price ranges in Turkish Lira
-            price_ranges = {
-                'toyota': {
-                    'corolla': 1200000,
-                    'camry': 2000000,
-                    'yaris': 900000,
-                    'rav4': 2200000
-                },
-                'volkswagen': {
-                    'polo': 950000,
-                    'golf': 1400000,
-                    'passat': 1800000,
-                    'tiguan': 2100000
-                },
-                'renault': {
-                    'clio': 850000,
-                    'megane': 1200000,
-                    'fluence': 1000000,
-                    'talisman': 1600000
-                },
-                'hyundai': {
-                    'i20': 900000,
-                    'i30': 1100000,
-                    'elantra': 1300000,
-                    'tucson': 1900000
-                },
-                'ford': {
-                    'focus': 1100000,
-                    'fiesta': 850000,
-                    'mondeo': 1500000,
-                    'kuga': 1800000
-                },
-                'fiat': {
-                    'egea': 850000,
-                    'palio': 250000,
-                    'doblo': 750000,
-                    'linea': 450000
-                },
-                'honda': {
-                    'civic': 1300000,
-                    'city': 1100000,
-                    'accord': 1800000,
-                    'cr-v': 2000000
-                },
-                'bmw': {
-                    '3-series': 2500000,
-                    '5-series': 3500000,
-                    'x3': 3000000,
-                    'x5': 4000000
-                },
-                'mercedes': {
-                    'c-class': 2800000,
-                    'e-class': 3800000,
-                    'a-class': 2000000,
-                    'gla': 2500000
-                }
-            }
-            
-            marka_lower = marka.lower()
-            model_lower = model.lower()
-            
-            if marka_lower in price_ranges and model_lower in price_ranges[marka_lower]:
-                base_price = price_ranges[marka_lower][model_lower]
-                # Updated depreciation calculation
+            if base_price is not None:
                 current_year = datetime.now().year
-                age = current_year - yil
                 
-                # Non-linear depreciation model
-                if age <= 1:
-                    year_factor = 0.85  # 15% depreciation in first year
-                elif age <= 3:
-                    year_factor = 0.85 * (0.9 ** (age - 1))  # 10% per year for years 2-3
-                elif age <= 5:
-                    year_factor = 0.85 * (0.9 ** 2) * (0.85 ** (age - 3))  # 15% per year for years 4-5
-                elif age <= 10:
-                    year_factor = 0.85 * (0.9 ** 2) * (0.85 ** 2) * (0.8 ** (age - 5))  # 20% per year for years 6-10
-                else:
-                    year_factor = max(0.15, 0.85 * (0.9 ** 2) * (0.85 ** 2) * (0.8 ** 5) * (0.95 ** (age - 10)))  # 5% per year after 10 years, minimum 15% of original value
+                # Non-linear depreciation model, precomputed per age
+                year_factor = year_factor_for_age(current_year - yil)
                 
                 # Additional market factors
                 if current_year >= 2024:  # Account for high inflation in Turkish market
@@ -163,47 +249,26 @@ class CarMarketScraper:
                 return int(base_price * year_factor)
             
             # Fallback estimation
-            return await self._estimate_price(marka, model, yil)
+            return self.estimate_price(marka, model, yil)
             
         except Exception as e:
             print(f"Error getting base price: {e}")
             return None
     
-    async def _estimate_price(self, marka: str, model: str, yil: int) -> int:
+    def estimate_price(self, marka: str, model: str, yil: int) -> int:
         """Estimates price when direct data is not available"""
         current_year = datetime.now().year
         age = current_year - yil
         
-        # Base estimation logic
-        base_prices = {
-            'luxury': 1200000,    # BMW, Mercedes, Audi
-            'premium': 800000,    # Toyota, Volkswagen, Honda
-            'economy': 500000,    # Renault, Dacia, Fiat
-            'budget': 350000      # Older or less popular brands
-        }
-        
-        # Categorize brand
-        luxury_brands = ['bmw', 'mercedes', 'audi', 'lexus', 'infiniti']
-        premium_brands = ['toyota', 'volkswagen', 'honda', 'hyundai', 'kia', 'mazda', 'ford']
-        economy_brands = ['renault', 'peugeot', 'citroen', 'opel', 'seat', 'skoda']
-        
-        marka_lower = marka.lower()
-        
-        if marka_lower in luxury_brands:
-            base = base_prices['luxury']
-        elif marka_lower in premium_brands:
-            base = base_prices['premium']
-        elif marka_lower in economy_brands:
-            base = base_prices['economy']
-        else:
-            base = base_prices['budget']
+        # Brand category base price (luxury, premium, economy or budget)
+        base = PRICE_INDEX.category_price(marka)
         
         # Apply depreciation based on age
-        depreciation_factor = max(0.15, 1 - (age * 0.12))
+        depreciation_factor = estimate_age_factor_for_age(age)
         
         return int(base * depreciation_factor)
     
-    async def _get_listing_count(self, marka: str, model: str, yil: int) -> int:
+    def listing_count(self, marka: str, model: str, yil: int) -> int:
         """Gets estimated number of listings for the car"""
         # Simulate listing count based on popularity
         popular_models = ['corolla', 'golf', 'focus', 'polo', 'clio']
@@ -214,18 +279,10 @@ class CarMarketScraper:
         else:
             return 50 + (2024 - yil) * 10   # Fewer listings for less popular cars
     
-    def _generate_estimated_data(self, marka: str, model: str, yil: int) -> Dict:
+    def estimated_market_data(self, marka: str, model: str, yil: int) -> Dict:
         """Generates estimated data when scraping fails"""
-        import asyncio
-
-        # Run async estimation in sync context
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            base_price = loop.run_until_complete(self._estimate_price(marka, model, yil))
-            listing_count = loop.run_until_complete(self._get_listing_count(marka, model, yil))
-        finally:
-            loop.close()
+        base_price = self.estimate_price(marka, model, yil)
+        listing_count = self.listing_count(marka, model, yil)
         
         return {
             'marka': marka,
@@ -242,6 +299,20 @@ class CarMarketScraper:
             'kaynak': 'estimated',
             'veri_tarihi': datetime.utcnow()
         }
+    
+    # Thin async wrappers kept for existing awaiting callers
+    
+    async def _get_base_price(self, marka: str, model: str, yil: int) -> Optional[int]:
+        return self.base_price(marka, model, yil)
+    
+    async def _estimate_price(self, marka: str, model: str, yil: int) -> int:
+        return self.estimate_price(marka, model, yil)
+    
+    async def _get_listing_count(self, marka: str, model: str, yil: int) -> int:
+        return self.listing_count(marka, model, yil)
+    
+    def _generate_estimated_data(self, marka: str, model: str, yil: int) -> Dict:
+        return self.estimated_market_data(marka, model, yil)
 
 class DepreciationCalculator:
     """Calculates car depreciation based on damage and parts replacement"""
@@ -286,6 +357,38 @@ class DepreciationCalculator:
             'orta': 0.6,     # Medium damage  
             'agir': 1.0      # Heavy damage
         }
+        
+        self.type_multipliers = {
+            'boyali': 0.4,     # Painted
+            'degisen': 0.8,    # Replaced
+            'hasarli': 1.0     # Damaged
+        }
+        
+        # Factors used for unknown parts, levels and types
+        self.default_part_factor = 0.05
+        self.default_level_multiplier = 0.6
+        self.default_type_multiplier = 0.4
+        
+        self._compile_lookup_tables()
+    
+    def _compile_lookup_tables(self):
+        """
+        Precompiles factor tables into NumPy lookup arrays for the batch API.
+        Each table gets one extra trailing slot holding the default factor,
+        which is the code assigned to unknown names.
+        """
+        def compile_table(factors: Dict[str, float], default: float):
+            names = list(factors)
+            codes = {name: code for code, name in enumerate(names)}
+            table = np.array([factors[name] for name in names] + [default], dtype=np.float64)
+            return names, codes, table
+        
+        self.part_names, self.part_codes, self.part_factor_table = compile_table(
+            self.part_impact_factors, self.default_part_factor)
+        self.level_names, self.level_codes, self.level_multiplier_table = compile_table(
+            self.damage_multipliers, self.default_level_multiplier)
+        self.type_names, self.type_codes, self.type_multiplier_table = compile_table(
+            self.type_multipliers, self.default_type_multiplier)
     
     def calculate_depreciation(self, base_price: int, damage_details: List[Dict]) -> Dict:
         """
@@ -308,18 +411,13 @@ class DepreciationCalculator:
             damage_type = damage.get('damage_type', 'boyali')
             
             # Get part impact factor
-            part_factor = self.part_impact_factors.get(part, 0.05)  # Default 5%
+            part_factor = self.part_impact_factors.get(part, self.default_part_factor)  # Default 5%
             
             # Get damage level multiplier
-            level_multiplier = self.damage_multipliers.get(damage_level, 0.6)
+            level_multiplier = self.damage_multipliers.get(damage_level, self.default_level_multiplier)
             
             # Calculate damage type impact
-            type_multipliers = {
-                'boyali': 0.4,     # Painted
-                'degisen': 0.8,    # Replaced
-                'hasarli': 1.0     # Damaged
-            }
-            type_multiplier = type_multipliers.get(damage_type, 0.4)
+            type_multiplier = self.type_multipliers.get(damage_type, self.default_type_multiplier)
             
             # Calculate depreciation for this part
             part_depreciation = part_factor * level_multiplier * type_multiplier
@@ -352,40 +450,184 @@ class DepreciationCalculator:
             'detailed_calculations': detailed_calculations,
             'calculation_date': datetime.utcnow().isoformat()
         }
+    
+    def encode_damages(self, damage_rows: Sequence[List[Dict]]) -> 'EncodedDamages':
+        """
+        Encodes per-vehicle damage dict lists into the columnar arrays
+        expected by calculate_depreciation_batch
+        """
+        row_index, part_codes, level_codes, type_codes, raw = [], [], [], [], []
+        unknown_part = len(self.part_names)
+        unknown_level = len(self.level_names)
+        unknown_type = len(self.type_names)
+        
+        for row, damage_details in enumerate(damage_rows):
+            for damage in damage_details:
+                row_index.append(row)
+                part_codes.append(self.part_codes.get(damage.get('part', ''), unknown_part))
+                level_codes.append(self.level_codes.get(damage.get('damage_level', 'orta'), unknown_level))
+                type_codes.append(self.type_codes.get(damage.get('damage_type', 'boyali'), unknown_type))
+                raw.append(damage)
+        
+        return EncodedDamages(
+            row_index=np.array(row_index, dtype=np.intp),
+            part_codes=np.array(part_codes, dtype=np.intp),
+            level_codes=np.array(level_codes, dtype=np.intp),
+            type_codes=np.array(type_codes, dtype=np.intp),
+            raw=raw
+        )
+    
+    def calculate_depreciation_batch(self, base_prices, row_index, part_codes, level_codes,
+                                     type_codes, raw: Optional[List[Dict]] = None) -> 'BatchDepreciationResult':
+        """
+        Vectorized calculate_depreciation over many vehicles at once
+        
+        Args:
+            base_prices: Base price per vehicle (row), shape (n_rows,)
+            row_index: Row of each damage entry, shape (n_damages,), in the same
+                       order the scalar path would visit them
+            part_codes, level_codes, type_codes: Codes from part_codes /
+                       level_codes / type_codes per damage entry; the code equal to
+                       the table length means "unknown" and uses the default factor
+            raw: Optional original damage dicts, used to label detail records
+        
+        Returns:
+            BatchDepreciationResult whose numbers match calculate_depreciation
+            row by row; detail records are only built on request
+        """
+        base_prices = np.asarray(base_prices, dtype=np.int64)
+        row_index = np.asarray(row_index, dtype=np.intp)
+        
+        part_depreciation = (
+            self.part_factor_table[part_codes]
+            * self.level_multiplier_table[level_codes]
+            * self.type_multiplier_table[type_codes]
+        )
+        
+        # bincount accumulates in input order, like the scalar loop, so sums are bit-identical
+        total_depreciation = np.bincount(row_index, weights=part_depreciation, minlength=len(base_prices))
+        total_depreciation = np.minimum(total_depreciation, 0.60)
+        
+        depreciation_amount = (base_prices * total_depreciation).astype(np.int64)
+        final_prices = base_prices - depreciation_amount
+        
+        return BatchDepreciationResult(
+            calculator=self,
+            base_prices=base_prices,
+            total_depreciation_rate=total_depreciation,
+            depreciation_amount=depreciation_amount,
+            final_estimated_price=final_prices,
+            encoded=EncodedDamages(row_index, np.asarray(part_codes), np.asarray(level_codes),
+                                   np.asarray(type_codes), raw),
+            part_depreciation=part_depreciation
+        )
+
+
+class EncodedDamages(NamedTuple):
+    """Columnar damage entries for DepreciationCalculator.calculate_depreciation_batch"""
+    row_index: np.ndarray
+    part_codes: np.ndarray
+    level_codes: np.ndarray
+    type_codes: np.ndarray
+    raw: Optional[List[Dict]] = None
+
+
+class BatchDepreciationResult:
+    """Per-row results of a batch depreciation run with lazily built detail records"""
+    
+    def __init__(self, calculator: DepreciationCalculator, base_prices: np.ndarray,
+                 total_depreciation_rate: np.ndarray, depreciation_amount: np.ndarray,
+                 final_estimated_price: np.ndarray, encoded: EncodedDamages,
+                 part_depreciation: np.ndarray):
+        self.calculator = calculator
+        self.base_prices = base_prices
+        self.total_depreciation_rate = total_depreciation_rate
+        self.depreciation_amount = depreciation_amount
+        self.final_estimated_price = final_estimated_price
+        self.encoded = encoded
+        self.part_depreciation = part_depreciation
+        self._row_order = None
+    
+    def __len__(self) -> int:
+        return len(self.base_prices)
+    
+    def _entries_for_row(self, row: int) -> np.ndarray:
+        if self._row_order is None:
+            self._row_order = np.argsort(self.encoded.row_index, kind='stable')
+            self._row_starts = np.searchsorted(self.encoded.row_index[self._row_order],
+                                               np.arange(len(self.base_prices) + 1))
+        return self._row_order[self._row_starts[row]:self._row_starts[row + 1]]
+    
+    def details(self, row: int) -> List[Dict]:
+        """Builds the detailed_calculations list of the scalar path for one row"""
+        calc = self.calculator
+        enc = self.encoded
+        base_price = int(self.base_prices[row])
+        details = []
+        
+        for i in self._entries_for_row(row):
+            part_code, level_code, type_code = enc.part_codes[i], enc.level_codes[i], enc.type_codes[i]
+            if enc.raw is not None:
+                damage = enc.raw[i]
+                part = damage.get('part', '')
+                damage_level = damage.get('damage_level', 'orta')
+                damage_type = damage.get('damage_type', 'boyali')
+            else:
+                part = calc.part_names[part_code] if part_code < len(calc.part_names) else None
+                damage_level = calc.level_names[level_code] if level_code < len(calc.level_names) else None
+                damage_type = calc.type_names[type_code] if type_code < len(calc.type_names) else None
+            part_depreciation = float(self.part_depreciation[i])
+            details.append({
+                'part': part,
+                'damage_level': damage_level,
+                'damage_type': damage_type,
+                'part_impact': float(calc.part_factor_table[part_code]),
+                'level_multiplier': float(calc.level_multiplier_table[level_code]),
+                'type_multiplier': float(calc.type_multiplier_table[type_code]),
+                'depreciation': part_depreciation,
+                'estimated_cost': int(base_price * part_depreciation)
+            })
+        return details
+    
+    def row(self, row: int, with_details: bool = False) -> Dict:
+        """Returns one row in the calculate_depreciation result format"""
+        result = {
+            'base_price': int(self.base_prices[row]),
+            'total_depreciation_rate': float(self.total_depreciation_rate[row]),
+            'depreciation_amount': int(self.depreciation_amount[row]),
+            'final_estimated_price': int(self.final_estimated_price[row]),
+            'calculation_date': datetime.utcnow().isoformat()
+        }
+        if with_details:
+            result['detailed_calculations'] = self.details(row)
+        return result
 
 # Utility functions for database operations
+def _market_data_key(market_data: Dict) -> Dict:
+    """Stores snapshots under canonical names so lookups match any alias spelling"""
+    marka, model = PRICE_INDEX.canonical_key(market_data['marka'], market_data['model'])
+    return {**market_data, 'marka': marka, 'model': model}
+
+def save_market_data_batch_to_db(db: Session, market_data_list: List[Dict]) -> int:
+    """Saves many market data snapshots in one transaction"""
+    return bulk_upsert_market_data(db, [_market_data_key(m) for m in market_data_list])
+
 def save_market_data_to_db(db: Session, market_data: Dict) -> PazarVerisi:
     """Saves market data to database"""
-    pazar_verisi = PazarVerisi(
-        kaynak=market_data.get('kaynak', 'unknown'),
-        marka=market_data['marka'],
-        model=market_data['model'],
-        yil=market_data['yil'],
-        ortalama_fiyat=market_data.get('ortalama_fiyat'),
-        minimum_fiyat=market_data.get('minimum_fiyat'),
-        maksimum_fiyat=market_data.get('maksimum_fiyat'),
-        ilan_sayisi=market_data.get('ilan_sayisi', 0),
-        hasarsiz_ortalama=market_data.get('hasarsiz_ortalama'),
-        boyali_ortalama=market_data.get('boyali_ortalama'),
-        degisen_ortalama=market_data.get('degisen_ortalama'),
-        hasarli_ortalama=market_data.get('hasarli_ortalama'),
-        veri_tarihi=market_data.get('veri_tarihi', datetime.utcnow()),
-        aktif=True
-    )
-    
-    db.add(pazar_verisi)
-    db.commit()
-    db.refresh(pazar_verisi)
-    return pazar_verisi
+    row = _market_data_key({**market_data, 'veri_tarihi': market_data.get('veri_tarihi') or datetime.utcnow()})
+    bulk_upsert_market_data(db, [row])
+    return db.query(PazarVerisi).filter(
+        PazarVerisi.kaynak == row.get('kaynak', 'unknown'),
+        PazarVerisi.marka == row['marka'],
+        PazarVerisi.model == row['model'],
+        PazarVerisi.yil == row['yil'],
+        PazarVerisi.veri_tarihi == row['veri_tarihi']
+    ).one()
 
-def get_latest_market_data(db: Session, marka: str, model: str, yil: int) -> Optional[PazarVerisi]:
+def get_latest_market_data(db: Session, marka: str, model: str, yil: int) -> Optional[GuncelPazarVerisi]:
     """Gets latest market data for a specific car from database"""
-    return db.query(PazarVerisi).filter(
-        PazarVerisi.marka == marka,
-        PazarVerisi.model == model,
-        PazarVerisi.yil == yil,
-        PazarVerisi.aktif == True
-    ).order_by(PazarVerisi.veri_tarihi.desc()).first()
+    latest = db.get(GuncelPazarVerisi, (*PRICE_INDEX.canonical_key(marka, model), yil), populate_existing=True)
+    return latest if latest is not None and latest.aktif else None
 
 # Global instances
 scraper = CarMarketScraper()
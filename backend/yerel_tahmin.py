@@ -0,0 +1,183 @@
+"""Yerel Fiyat Motoru
+
+LLM kullanmadan, `web_scraper` içindeki kural tabanlı değerleme modeliyle
+(marka/model baz fiyatları, yaşa bağlı değer kaybı eğrisi ve parça/hasar
+etki katsayıları) fiyat tahmini üretir. Yüksek hacimli ön eleme trafiği
+ve Gemini yavaşladığında/kısıtladığında yedek yanıt için kullanılır.
+"""
+
+import html
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from web_scraper import (CarMarketScraper, DepreciationCalculator,
+                         depreciation_calculator, scraper)
+
+# Yıllık ortalama kilometre ve her 10.000 km sapmanın fiyata etkisi
+YILLIK_ORTALAMA_KM = 15000
+KM_ETKISI_10BIN = 0.01
+MAX_KM_ETKISI = 0.15
+
+# Ortalama fiyatın etrafında verilen min/max aralığı
+FIYAT_ARALIGI = 0.10
+
+_TURKCE_ASCII = str.maketrans("çğıöşüÇĞİÖŞÜ", "cgiosuCGIOSU")
+
+# Kullanıcının serbest metinle girdiği parça adlarının hesaplayıcı anahtarlarına eşlemesi
+PARCA_ESLEMELERI = {
+    "kaput": "on_kapak",
+    "motor_kaputu": "on_kapak",
+    "on_kaput": "on_kapak",
+    "bagaj": "arka_kapak",
+    "bagaj_kapagi": "arka_kapak",
+    "arka_kaput": "arka_kapak",
+    "sol_on_camurluk": "sol_camurluk",
+    "sag_on_camurluk": "sag_camurluk",
+    "sol_arka_camurluk": "sol_camurluk",
+    "sag_arka_camurluk": "sag_camurluk",
+    "sanziman": "sanziman",
+    "fren": "fren_sistemi",
+    "frenler": "fren_sistemi",
+    "amortisor": "amortisör",
+    "amortisorler": "amortisör",
+    "koltuk": "koltuklar",
+    "torpido": "panel",
+    "gosterge_paneli": "panel",
+    "lastik": "lastikler",
+    "jant": "jantlar",
+    "on_cam": "cam",
+    "arka_cam": "cam",
+    "farlar": "aydinlatma",
+    "far": "aydinlatma",
+    "stop": "aydinlatma",
+}
+
+# Arayüzdeki hasar durumlarının (hasar tipi, hasar seviyesi) karşılıkları
+DURUM_ESLEMELERI = {
+    "boyali": ("boyali", "orta"),
+    "lokal_boyali": ("boyali", "hafif"),
+    "cizik": ("boyali", "hafif"),
+    "degisen": ("degisen", "orta"),
+    "ezik": ("hasarli", "hafif"),
+    "hasarli": ("hasarli", "orta"),
+    "agir_hasarli": ("hasarli", "agir"),
+}
+
+
+def _anahtarla(metin: str) -> str:
+    return "_".join(metin.translate(_TURKCE_ASCII).lower().replace("-", " ").split())
+
+
+def hasari_cevir(parca: str, durum: str) -> Dict[str, str]:
+    """Bir `HasarDetayi` kaydını `DepreciationCalculator` girdisine çevirir."""
+    parca_anahtari = _anahtarla(parca)
+    parca_anahtari = PARCA_ESLEMELERI.get(parca_anahtari, parca_anahtari)
+    damage_type, damage_level = DURUM_ESLEMELERI.get(_anahtarla(durum), ("boyali", "orta"))
+    return {"part": parca_anahtari, "damage_level": damage_level, "damage_type": damage_type}
+
+
+def kilometre_carpani(yil: int, kilometre: int) -> float:
+    """Yaşına göre beklenen kilometreden sapmaya bağlı fiyat çarpanı."""
+    yas = max(datetime.now().year - yil, 1)
+    sapma = (kilometre - yas * YILLIK_ORTALAMA_KM) / 10000
+    etki = max(-MAX_KM_ETKISI, min(MAX_KM_ETKISI, sapma * KM_ETKISI_10BIN))
+    return 1 - etki
+
+
+def _sayi(deger: float) -> str:
+    return f"{int(deger):,}".replace(",", ".")
+
+
+def _tl(tutar: float) -> str:
+    return f"{_sayi(tutar)} TL"
+
+
+class YerelFiyatMotoru:
+    """Kural tabanlı değerleme modelinden `TahminSonucu` alanlarını üretir."""
+
+    def __init__(
+        self,
+        piyasa: Optional[CarMarketScraper] = None,
+        hesaplayici: Optional[DepreciationCalculator] = None,
+    ):
+        self.piyasa = piyasa or scraper
+        self.hesaplayici = hesaplayici or depreciation_calculator
+
+    def referans_fiyat(self, marka: str, model: str, yil: int) -> int:
+        """Hasarsız, ortalama kilometredeki baz fiyat."""
+        fiyat = self.piyasa.base_price(marka, model, yil)
+        if not fiyat:
+            fiyat = self.piyasa.estimate_price(marka, model, yil)
+        return fiyat
+
+    @staticmethod
+    def _aralik(ortalama: float) -> Dict[str, int]:
+        return {
+            "tahmini_fiyat_min": int(ortalama * (1 - FIYAT_ARALIGI)),
+            "tahmini_fiyat_max": int(ortalama * (1 + FIYAT_ARALIGI)),
+            "ortalama_fiyat": int(ortalama),
+        }
+
+    def _pazar_analizi(self, arac: Any) -> str:
+        ilan_sayisi = self.piyasa.listing_count(arac.marka, arac.model, arac.yil)
+        return (
+            f"<p>{html.escape(arac.marka)} {html.escape(arac.model)} {arac.yil} için piyasada yaklaşık "
+            f"<strong>{ilan_sayisi}</strong> ilan olduğu tahmin ediliyor. "
+            "Bu değerlendirme kural tabanlı yerel modelle yapılmıştır.</p>"
+        )
+
+    def hizli(self, arac: Any) -> Dict[str, Any]:
+        referans = self.referans_fiyat(arac.marka, arac.model, arac.yil)
+        km_carpani = kilometre_carpani(arac.yil, arac.kilometre)
+        ortalama = referans * km_carpani
+        rapor = (
+            f"<p><strong>Baz piyasa değeri:</strong> {_tl(referans)} "
+            f"({arac.yil} model yaş etkisi dahil). "
+            f"<strong>Kilometre etkisi:</strong> {_sayi(arac.kilometre)} km için "
+            f"%{(km_carpani - 1) * 100:+.1f}.</p>"
+        )
+        return {
+            **self._aralik(ortalama),
+            "rapor": rapor,
+            "pazar_analizi": self._pazar_analizi(arac),
+        }
+
+    def detayli(self, arac: Any) -> Dict[str, Any]:
+        referans = self.referans_fiyat(arac.marka, arac.model, arac.yil)
+        km_carpani = kilometre_carpani(arac.yil, arac.kilometre)
+        km_etkisi = int(referans * km_carpani) - referans
+
+        hasarlar: List[Tuple[Any, Dict[str, str]]] = [
+            (h, hasari_cevir(h.parca, h.durum)) for h in arac.hasar_detaylari if h.parca and h.durum
+        ]
+        hesap = self.hesaplayici.calculate_depreciation(referans + km_etkisi, [g for _, g in hasarlar])
+
+        faktorler = [
+            f"<li><strong>Kilometre:</strong> {_sayi(arac.kilometre)} km, "
+            f"{'+' if km_etkisi >= 0 else '-'}{_tl(abs(km_etkisi))}</li>"
+        ]
+        for (hasar, _), detay in zip(hasarlar, hesap["detailed_calculations"]):
+            faktorler.append(
+                f"<li><strong>{html.escape(hasar.parca)} ({html.escape(hasar.durum)}):</strong> "
+                f"%{detay['depreciation'] * 100:.1f} değer kaybı, -{_tl(detay['estimated_cost'])}</li>"
+            )
+        if hesap["total_depreciation_rate"] >= 0.60:
+            faktorler.append("<li><strong>Not:</strong> Toplam hasar kaybı %60 ile sınırlandırıldı.</li>")
+
+        nihai = hesap["final_estimated_price"]
+        rapor = (
+            f"<h4>Referans Fiyat</h4><p>{_tl(referans)}</p>"
+            f"<h4>Değer Kaybı/Artışı Analizi</h4><ul>{''.join(faktorler)}</ul>"
+            f"<h4>Nihai Fiyat Tahmini</h4><p>Toplam hasar kaybı "
+            f"%{hesap['total_depreciation_rate'] * 100:.1f} ({_tl(hesap['depreciation_amount'])}) "
+            f"düşüldükten sonra tahmini değer <strong>{_tl(nihai)}</strong>.</p>"
+        )
+        return {
+            **self._aralik(nihai),
+            "rapor": rapor,
+            "pazar_analizi": self._pazar_analizi(arac),
+            "referans_fiyat": referans,
+        }
+
+
+yerel_motor = YerelFiyatMotoru()
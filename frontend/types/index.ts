@@ -105,6 +105,9 @@ export interface BackendEstimationResponse {
   analiz_tarihi: string;
   pazar_analizi: string;
   tahmin_id?: number;
+  referans_fiyat?: number;
+  referans_kaynagi?: string;
+  tahmin_kaynagi?: string;
 }
 
 export interface ApiError {